@@ -1,18 +1,57 @@
-from flask import Flask, request, jsonify, session, render_template, redirect, url_for,send_from_directory
+from flask import Flask, request, jsonify, session, render_template, redirect, url_for,send_from_directory, g, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from flask.sessions import SecureCookieSessionInterface
+from itsdangerous import URLSafeTimedSerializer
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from sqlalchemy.orm import joinedload, defer, load_only, validates, make_transient_to_detached
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import atexit
+import bisect
+import hashlib
+import heapq
+import json
+import queue
+import math
 import secrets
+import select
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
 import os
+import zlib
 from dotenv import load_dotenv
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 load_dotenv()
 # Initialize Flask app
 # app = Flask(__name__)
 app = Flask(__name__, static_folder=None)
 
 # Vercel-specific configuration
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', secrets.token_hex(16))
+# Session signing keyring: SECRET_KEY signs new cookies, SECRET_KEY_FALLBACKS
+# (comma-separated, newest first) are still accepted so keys can be rotated
+# without logging everyone out. Every worker and instance must share them.
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
+app.config['SECRET_KEY_FALLBACKS'] = [
+    key.strip() for key in os.environ.get('SECRET_KEY_FALLBACKS', '').split(',') if key.strip()
+]
+if not app.config['SECRET_KEY']:
+    print("⚠️ SECRET_KEY is not set, using a random key: sessions will not survive restarts "
+          "or be accepted by other instances")
+    app.config['SECRET_KEY'] = secrets.token_hex(32)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
@@ -28,6 +67,125 @@ db_url = os.getenv('DATABASE_URL') or os.getenv('POSTGRES_URL')
 if db_url and db_url.startswith('postgres://'):
     db_url = db_url.replace('postgres://', 'postgresql://', 1)
 app.config['SQLALCHEMY_DATABASE_URI'] = db_url
+
+# Postgres-only connect args break local SQLite runs (tests, scripts)
+if db_url and db_url.startswith('sqlite'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
+
+@event.listens_for(Engine, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """SQLite only enforces foreign keys (and ON DELETE CASCADE) when asked, per connection"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+# Page sizes for the server-rendered views
+WEB_POSTS_PER_PAGE = 10
+WEB_PROFILE_POSTS_PER_PAGE = 10
+
+# Characters of post content kept in posts.excerpt for list views
+EXCERPT_LENGTH = 200
+
+# Username availability Bloom filter: target false-positive rate, hard memory
+# cap, and how often to pull usernames registered by other workers
+app.config['USERNAME_BLOOM_FP_RATE'] = float(os.environ.get('USERNAME_BLOOM_FP_RATE', 0.01))
+app.config['USERNAME_BLOOM_MAX_BYTES'] = int(os.environ.get('USERNAME_BLOOM_MAX_BYTES', 4 * 1024 * 1024))
+app.config['USERNAME_BLOOM_REFRESH_SECONDS'] = int(os.environ.get('USERNAME_BLOOM_REFRESH_SECONDS', 30))
+# Ids below the refresh watermark read again on each refresh, for rows that
+# commit out of id order (a transaction holding a lower id commits later)
+app.config['USERNAME_BLOOM_REFRESH_OVERLAP'] = int(os.environ.get('USERNAME_BLOOM_REFRESH_OVERLAP', 1000))
+
+# Per-process cache of user rows for authenticated requests (0 disables).
+# Profile updates invalidate this process; other processes see them within the TTL.
+app.config['USER_CACHE_TTL_SECONDS'] = int(os.environ.get('USER_CACHE_TTL_SECONDS', 30))
+app.config['USER_CACHE_MAX_ENTRIES'] = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 10000))
+
+# Post views are counted in memory and written in one UPDATE every interval,
+# or sooner once this many posts have pending views
+app.config['POST_VIEW_FLUSH_SECONDS'] = float(os.environ.get('POST_VIEW_FLUSH_SECONDS', 10))
+app.config['POST_VIEW_MAX_PENDING'] = int(os.environ.get('POST_VIEW_MAX_PENDING', 1000))
+
+# Trending posts: how many are ranked, how fast engagement decays, how far back
+# the periodic rebuild looks, and how often it runs
+app.config['TRENDING_SIZE'] = int(os.environ.get('TRENDING_SIZE', 50))
+app.config['TRENDING_HALF_LIFE_HOURS'] = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 24))
+app.config['TRENDING_WINDOW_DAYS'] = int(os.environ.get('TRENDING_WINDOW_DAYS', 7))
+app.config['TRENDING_RECOMPUTE_SECONDS'] = int(os.environ.get('TRENDING_RECOMPUTE_SECONDS', 300))
+
+# Home timelines: authors with at least this many followers are not fanned out
+# on write, their posts are pulled in when a follower reads the timeline
+app.config['TIMELINE_FANOUT_MAX_FOLLOWERS'] = int(os.environ.get('TIMELINE_FANOUT_MAX_FOLLOWERS', 10000))
+# Recent posts copied into a timeline when following someone
+app.config['TIMELINE_BACKFILL_POSTS'] = int(os.environ.get('TIMELINE_BACKFILL_POSTS', 50))
+
+# Newest posts kept serialized in memory for first pages of /api/posts and the
+# dashboard; capped by count and by approximate size, reloaded periodically
+app.config['RECENT_POSTS_CACHE_SIZE'] = int(os.environ.get('RECENT_POSTS_CACHE_SIZE', 200))
+app.config['RECENT_POSTS_CACHE_MAX_BYTES'] = int(os.environ.get('RECENT_POSTS_CACHE_MAX_BYTES', 4 * 1024 * 1024))
+app.config['RECENT_POSTS_REFRESH_SECONDS'] = int(os.environ.get('RECENT_POSTS_REFRESH_SECONDS', 60))
+
+# Single post reads: served fresh for POST_CACHE_TTL_SECONDS, then served stale
+# while one background refresh runs, up to POST_CACHE_STALE_SECONDS
+app.config['POST_CACHE_TTL_SECONDS'] = float(os.environ.get('POST_CACHE_TTL_SECONDS', 5))
+app.config['POST_CACHE_STALE_SECONDS'] = float(os.environ.get('POST_CACHE_STALE_SECONDS', 60))
+app.config['POST_CACHE_MAX_ENTRIES'] = int(os.environ.get('POST_CACHE_MAX_ENTRIES', 10000))
+
+# Cache invalidation between processes: 'postgres' (LISTEN/NOTIFY), 'file'
+# (one host, shared append-only file), 'off', or 'auto' (postgres when the
+# database is Postgres, otherwise off)
+app.config['INVALIDATION_BUS'] = os.environ.get('INVALIDATION_BUS', 'auto')
+app.config['INVALIDATION_BUS_FILE'] = os.environ.get(
+    'INVALIDATION_BUS_FILE', os.path.join(tempfile.gettempdir(), 'flask_vercel_app_invalidation.log')
+)
+
+# Pagination totals per endpoint: 'exact' (COUNT(*) every request), 'estimate'
+# (planner row estimate on Postgres, exact elsewhere) or 'none' (has_next only).
+# Clients can pick per request with ?count=
+app.config['PAGINATION_COUNT'] = {
+    'get_users': os.environ.get('PAGINATION_COUNT_USERS', 'exact'),
+    'get_posts': os.environ.get('PAGINATION_COUNT_POSTS', 'exact'),
+    'get_user_posts': os.environ.get('PAGINATION_COUNT_USER_POSTS', 'exact'),
+    'search_posts': os.environ.get('PAGINATION_COUNT_SEARCH', 'estimate'),
+}
+
+# Account deletion: posts removed per transaction, and the pause between
+# transactions; accounts with more posts than one chunk are deleted in the background
+app.config['ACCOUNT_DELETE_CHUNK_SIZE'] = int(os.environ.get('ACCOUNT_DELETE_CHUNK_SIZE', 1000))
+app.config['ACCOUNT_DELETE_PAUSE_SECONDS'] = float(os.environ.get('ACCOUNT_DELETE_PAUSE_SECONDS', 0.1))
+
+# Most ids accepted by one ?ids= multi-get (one IN query)
+app.config['MULTI_GET_MAX_IDS'] = int(os.environ.get('MULTI_GET_MAX_IDS', 200))
+
+# Response compression (gzip, deflate, and br when the brotli package is
+# installed) for JSON, HTML and other text. Off by default on Vercel, whose edge
+# already compresses. Bodies under COMPRESSION_MIN_BYTES are sent as-is; bodies
+# over COMPRESSION_STREAM_BYTES are compressed chunk by chunk instead of buffered
+app.config['COMPRESSION_ENABLED'] = os.environ.get(
+    'COMPRESSION_ENABLED', 'false' if os.environ.get('VERCEL') else 'true'
+).lower() == 'true'
+app.config['COMPRESSION_MIN_BYTES'] = int(os.environ.get('COMPRESSION_MIN_BYTES', 500))
+app.config['COMPRESSION_STREAM_BYTES'] = int(os.environ.get('COMPRESSION_STREAM_BYTES', 256 * 1024))
+app.config['COMPRESSION_LEVEL'] = int(os.environ.get('COMPRESSION_LEVEL', 6))
+app.config['COMPRESSION_BROTLI_QUALITY'] = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+
+class KeyringSessionInterface(SecureCookieSessionInterface):
+    """Sign session cookies with SECRET_KEY, accept any key in SECRET_KEY_FALLBACKS"""
+
+    def get_signing_serializer(self, app):
+        if not app.secret_key:
+            return None
+        # itsdangerous signs with the last key and verifies against all of them
+        keys = [*reversed(app.config.get('SECRET_KEY_FALLBACKS') or []), app.secret_key]
+        return URLSafeTimedSerializer(
+            keys,
+            salt=self.salt,
+            serializer=self.serializer,
+            signer_kwargs={'key_derivation': self.key_derivation, 'digest_method': self.digest_method}
+        )
+
+app.session_interface = KeyringSessionInterface()
+
 # Initialize extensions
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
@@ -72,9 +230,17 @@ class User(db.Model):
     email = db.Column(db.String(100), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Maintained by follow/unfollow; decides fan-out on write vs on read
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
-    # Relationship
-    posts = db.relationship('Post', backref='author', lazy=True, cascade='all, delete-orphan')
+    # Usernames are unique regardless of case; also serves case-insensitive lookups
+    __table_args__ = (
+        db.Index('ix_users_username_lower', db.func.lower(username), unique=True),
+    )
+    
+    # Relationship; the database deletes posts with their user (ON DELETE CASCADE),
+    # the ORM never loads them for it
+    posts = db.relationship('Post', backref='author', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -82,15 +248,26 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
-    def to_dict(self, include_email=True):
+    def to_dict(self, include_email=True, fields=None):
+        if fields is not None:
+            # Only touch the requested attributes, the rest may not be loaded
+            return {field: self.field_value(field) for field in fields}
         data = {
             'id': self.id,
             'username': self.username,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'follower_count': self.follower_count or 0
         }
         if include_email:
             data['email'] = self.email
         return data
+    
+    def field_value(self, field):
+        if field == 'created_at':
+            return self.created_at.isoformat() if self.created_at else None
+        if field == 'follower_count':
+            return self.follower_count or 0
+        return getattr(self, field)
 
 class Post(db.Model):
     __tablename__ = 'posts'
@@ -100,20 +277,94 @@ class Post(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    # One character longer than EXCERPT_LENGTH so we can tell when content was cut
+    excerpt = db.Column(db.String(EXCERPT_LENGTH + 1))
+    # Flushed in batches by ViewCounter; add view_counter.pending(id) for the live figure
+    view_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # False when the author had too many followers to fan out to: followers
+    # pull the post at read time for as long as it exists
+    fanned_out = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
+    
+    # Feed orderings; built CONCURRENTLY on Postgres by the migration
+    __table_args__ = (
+        db.Index('ix_posts_created_at_id', created_at.desc(), id),
+        db.Index('ix_posts_user_id_created_at', user_id, created_at.desc()),
+        # Only the posts timelines pull, so the pull side stays small
+        db.Index('ix_posts_pulled_user_id_created_at', user_id, created_at.desc(),
+                 postgresql_where=db.text('NOT fanned_out'), sqlite_where=db.text('NOT fanned_out')),
+    )
+    
+    @validates('content')
+    def update_excerpt(self, key, content):
+        self.excerpt = content[:EXCERPT_LENGTH + 1] if content is not None else None
+        return content
     
-    def to_dict(self, include_author=True):
+    def preview(self, length=EXCERPT_LENGTH):
+        """Start of the content for list views, without loading the content column"""
+        excerpt = self.excerpt or ''
+        if len(excerpt) > length:
+            return excerpt[:length] + '...'
+        return excerpt
+    
+    def to_dict(self, include_author=True, summary=False, fields=None):
+        if fields is not None:
+            # Only touch the requested attributes, the rest may not be loaded
+            return {field: self.field_value(field) for field in fields}
         data = {
             'id': self.id,
             'title': self.title,
-            'content': self.content,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'user_id': self.user_id
+            'user_id': self.user_id,
+            'view_count': (self.view_count or 0) + view_counter.pending(self.id)
         }
+        if summary:
+            data['excerpt'] = self.preview()
+        else:
+            data['content'] = self.content
         if include_author and self.author:
             data['author'] = self.author.username
         return data
+    
+    def field_value(self, field):
+        if field in ('created_at', 'updated_at'):
+            value = getattr(self, field)
+            return value.isoformat() if value else None
+        if field == 'view_count':
+            return (self.view_count or 0) + view_counter.pending(self.id)
+        if field == 'excerpt':
+            return self.preview()
+        if field == 'author':
+            return self.author.username if self.author else None
+        return getattr(self, field)
+
+class Follow(db.Model):
+    __tablename__ = 'follows'
+    
+    follower_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    followed_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Fan-out walks an author's followers
+    __table_args__ = (
+        db.Index('ix_follows_followed_id_follower_id', followed_id, follower_id),
+    )
+
+class TimelineEntry(db.Model):
+    """A post delivered to a follower's home timeline"""
+    __tablename__ = 'timeline_entries'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    # Copy of posts.created_at so a page is one range scan of this index
+    created_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_timeline_entries_user_id_created_at', user_id, created_at.desc(), post_id.desc()),
+        # ON DELETE CASCADE from posts finds a deleted post's rows here
+        db.Index('ix_timeline_entries_post_id', post_id),
+    )
 
 # Database initialization with auto-migration
 with app.app_context():
@@ -136,6 +387,1547 @@ def require_auth():
         return jsonify({"error": "Authentication required"}), 401
     return None
 
+def duplicate_user_error(error):
+    """Map a unique-constraint violation on users to the matching 409 response"""
+    # Postgres names the violated index; SQLite only names the column(s)
+    diag = getattr(error.orig, 'diag', None)
+    detail = (getattr(diag, 'constraint_name', None) or str(error.orig)).lower()
+    if 'email' in detail:
+        return jsonify({"error": "Email already exists"}), 409
+    if 'username' in detail:
+        return jsonify({"error": "Username already exists"}), 409
+    return None
+
+# Pagination
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+def page_args():
+    """?page= and ?per_page= for this request, clamped to valid values"""
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 10, type=int), 50)
+    return max(page, 1), max(per_page, 1)
+
+def count_mode():
+    """?count= for this request, or the endpoint's configured default; None if invalid"""
+    mode = request.args.get('count') or app.config['PAGINATION_COUNT'][request.endpoint]
+    return mode if mode in COUNT_MODES else None
+
+def explain_statement(statement, dialect):
+    """EXPLAIN SQL for a SELECT and its parameters in the form the driver expects"""
+    compiled = statement.order_by(None).compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.params
+    if dialect.positional:
+        # asyncpg binds $1, $2, ... from a sequence, never from a dict
+        params = tuple(params[name] for name in compiled.positiontup)
+    return 'EXPLAIN (FORMAT JSON) ' + str(compiled), params
+
+def estimate_row_count(session, statement):
+    """Planner's row estimate for a SELECT; None when the database has no cheap estimate"""
+    bind = session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return None
+    plan = session.connection().exec_driver_sql(*explain_statement(statement, bind.dialect)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+def pagination_info(page, per_page, total, has_next, mode):
+    """The "pagination" object of list responses; total and pages are None without a count"""
+    pages = None if total is None else math.ceil(total / per_page) if total else 0
+    return {
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "pages": pages,
+        "has_next": has_next,
+        "has_prev": page > 1,
+        "count": mode
+    }
+
+def cached_pagination(page, per_page, total, mode):
+    """Pagination info for a page served from a cache that knows the exact total.
+    The count is free, so exact and estimate both get it; none leaves it out."""
+    has_next = page * per_page < total
+    return pagination_info(page, per_page, None if mode == 'none' else total, has_next, mode)
+
+def paginate_query(query, page, per_page, mode):
+    """One page of an ordered query and its pagination info under the given count mode;
+    page and per_page must already be clamped (page_args)"""
+    if mode == 'exact':
+        result = query.paginate(page=page, per_page=per_page, error_out=False)
+        return result.items, pagination_info(page, per_page, result.total, result.has_next, mode)
+    
+    # One extra row answers has_next without counting
+    items = query.limit(per_page + 1).offset((page - 1) * per_page).all()
+    has_next = len(items) > per_page
+    items = items[:per_page]
+    
+    total = None
+    if mode == 'estimate':
+        if not has_next and (items or page == 1):
+            # Last page: the total is known exactly for free
+            total = (page - 1) * per_page + len(items)
+        else:
+            estimate = estimate_row_count(db.session, query.statement)
+            if estimate is None:
+                mode, total = 'exact', query.order_by(None).count()
+            else:
+                # Never contradict rows we have just seen
+                total = max(estimate, (page - 1) * per_page + len(items) + has_next)
+    return items, pagination_info(page, per_page, total, has_next, mode)
+
+# Multi-get
+def parse_ids(values):
+    """Distinct ids in request order from ?ids=1,2,3 (may be repeated)"""
+    try:
+        ids = [int(part) for value in values for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise ValueError("ids must be comma-separated integers")
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValueError("ids must list at least one id")
+    if len(ids) > app.config['MULTI_GET_MAX_IDS']:
+        raise ValueError(f"At most {app.config['MULTI_GET_MAX_IDS']} ids per request")
+    return ids
+
+def in_request_order(ids, found):
+    """(values of found in the order of ids, ids that were not found)"""
+    return [found[i] for i in ids if found.get(i) is not None], [i for i in ids if found.get(i) is None]
+
+# Sparse fieldsets: what ?fields= may ask for, per resource
+POST_FIELDS = ('id', 'title', 'content', 'excerpt', 'created_at', 'updated_at', 'user_id', 'view_count', 'author')
+USER_FIELDS = ('id', 'username', 'created_at', 'follower_count')
+PROFILE_FIELDS = USER_FIELDS + ('email',)
+
+def parse_fields(value, allowed):
+    """Distinct fields from ?fields=id,title; None (everything) when absent"""
+    if value is None:
+        return None
+    fields = list(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    if not fields or any(field not in allowed for field in fields):
+        raise ValueError(f"fields must be a comma-separated subset of: {', '.join(allowed)}")
+    return fields
+
+def project(data, fields):
+    """Trim an already serialized dict to the requested fields"""
+    return data if fields is None else {field: data.get(field) for field in fields}
+
+def user_load_options(fields=None):
+    return [] if fields is None else [load_only(*(getattr(User, field) for field in fields))]
+
+def post_load_options(fields=None, summary=False, columns=()):
+    """Loader options selecting only the columns the serialized posts need"""
+    if fields is None:
+        return [joinedload(Post.author), defer(Post.content)] if summary else [joinedload(Post.author)]
+    # author needs the foreign key and one column of the joined user
+    needed = [Post.user_id if field == 'author' else getattr(Post, field) for field in fields]
+    options = [load_only(*needed, *columns)]
+    if 'author' in fields:
+        options.append(joinedload(Post.author).load_only(User.username))
+    return options
+
+# Username Availability (Bloom filter)
+class BloomFilter:
+    """Fixed-size Bloom filter: no false negatives, tunable false positives"""
+    
+    def __init__(self, capacity, fp_rate, max_bytes):
+        capacity = max(capacity, 1)
+        bits = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+        self.size = max(8, min(bits, max_bytes * 8))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, key):
+        # Double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+    
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+    
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+    
+    def stats(self):
+        return {
+            'bytes': len(self.bits),
+            'hash_functions': self.hash_count,
+            'items': self.count,
+            'capacity': self.capacity,
+            'estimated_fp_rate': (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+        }
+
+# Per-process filter over lower(username); built on first use and topped up
+# from the database past refreshed_id, the highest id a database read has seen.
+# Local registrations are added directly and never move refreshed_id, so
+# another worker's user with a lower id is still picked up.
+username_filter = {'bloom': None, 'refreshed_id': 0, 'refreshed_at': 0.0}
+username_filter_lock = threading.Lock()
+
+def add_usernames(rows):
+    """Add (id, username) rows read from the database to the username filter"""
+    bloom = username_filter['bloom']
+    for user_id, username in rows:
+        username = username.lower()
+        # Overlapping refreshes see names again; count each once
+        if username not in bloom:
+            bloom.add(username)
+        username_filter['refreshed_id'] = max(username_filter['refreshed_id'], user_id)
+
+def build_username_filter():
+    """Build the filter from scratch, sized for twice the current user count"""
+    user_count = db.session.query(db.func.count(User.id)).scalar()
+    username_filter['bloom'] = BloomFilter(
+        capacity=max(1000, user_count * 2),
+        fp_rate=app.config['USERNAME_BLOOM_FP_RATE'],
+        max_bytes=app.config['USERNAME_BLOOM_MAX_BYTES']
+    )
+    username_filter['refreshed_id'] = 0
+    add_usernames(db.session.query(User.id, User.username).execution_options(yield_per=5000))
+
+def get_username_filter():
+    """Return an up-to-date username filter, refreshing incrementally when due"""
+    with username_filter_lock:
+        bloom = username_filter['bloom']
+        now = time.monotonic()
+        if bloom is None or bloom.count > bloom.capacity:
+            build_username_filter()
+            username_filter['refreshed_at'] = now
+        elif now - username_filter['refreshed_at'] >= app.config['USERNAME_BLOOM_REFRESH_SECONDS']:
+            since = username_filter['refreshed_id'] - app.config['USERNAME_BLOOM_REFRESH_OVERLAP']
+            add_usernames(db.session.query(User.id, User.username).filter(User.id > since))
+            username_filter['refreshed_at'] = now
+        return username_filter['bloom']
+
+def remember_username(username):
+    """Record a just-registered user in this process's filter"""
+    with username_filter_lock:
+        bloom = username_filter['bloom']
+        if bloom is not None and username.lower() not in bloom:
+            bloom.add(username.lower())
+
+# User cache: {user_id: (expires_at, column values)}
+user_cache = {}
+user_cache_lock = threading.Lock()
+
+def cache_user(user):
+    """Store a snapshot of a user's columns for later requests"""
+    columns = {attr.key: getattr(user, attr.key) for attr in db.inspect(User).column_attrs}
+    expires_at = time.monotonic() + app.config['USER_CACHE_TTL_SECONDS']
+    with user_cache_lock:
+        if len(user_cache) >= app.config['USER_CACHE_MAX_ENTRIES'] and user.id not in user_cache:
+            now = time.monotonic()
+            for user_id in [uid for uid, (expiry, _) in user_cache.items() if expiry <= now]:
+                del user_cache[user_id]
+            if len(user_cache) >= app.config['USER_CACHE_MAX_ENTRIES']:
+                # Oldest insertion first
+                del user_cache[next(iter(user_cache))]
+        user_cache[user.id] = (expires_at, columns)
+
+def invalidate_user(user_id):
+    """Forget a cached user after its row changed"""
+    with user_cache_lock:
+        user_cache.pop(user_id, None)
+
+def load_user(user_id):
+    """Fetch a user by id, from the cache when fresh"""
+    if app.config['USER_CACHE_TTL_SECONDS'] > 0:
+        with user_cache_lock:
+            entry = user_cache.get(user_id)
+        if entry and entry[0] > time.monotonic():
+            # Rebuild a clean persistent instance without a SELECT; it can be
+            # modified and flushed like a loaded one
+            user = User(**entry[1])
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+    
+    user = db.session.get(User, user_id)
+    if user and app.config['USER_CACHE_TTL_SECONDS'] > 0:
+        cache_user(user)
+    return user
+
+def load_users(user_ids):
+    """Users by id: fresh cache entries without a query, the rest in one IN query"""
+    users, misses = {}, []
+    caching = app.config['USER_CACHE_TTL_SECONDS'] > 0
+    now = time.monotonic()
+    with user_cache_lock:
+        for user_id in user_ids:
+            entry = user_cache.get(user_id) if caching else None
+            if entry and entry[0] > now:
+                # Read-only snapshot; never added to the session
+                users[user_id] = User(**entry[1])
+            else:
+                misses.append(user_id)
+    
+    if misses:
+        for user in User.query.filter(User.id.in_(misses)):
+            users[user.id] = user
+            if caching:
+                cache_user(user)
+    return users
+
+def current_user():
+    """The logged-in user, loaded at most once per request"""
+    if 'user_id' not in session:
+        return None
+    if 'current_user' not in g:
+        g.current_user = load_user(session['user_id'])
+    return g.current_user
+
+# Post View Counters
+class ViewCounter:
+    """Per-process view counts, written with one multi-row UPDATE per flush"""
+    
+    # Posts per UPDATE statement, keeps the CASE expression a sane size
+    CHUNK_SIZE = 500
+    
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self.flusher_pid = None
+    
+    def record(self, post_id):
+        with self.lock:
+            self.counts[post_id] = self.counts.get(post_id, 0) + 1
+            full = len(self.counts) >= app.config['POST_VIEW_MAX_PENDING']
+        trending.record_view(post_id)
+        self.start_flusher()
+        # Also flushed inline so serverless instances (no background thread
+        # between requests) still write their counts
+        if full or time.monotonic() - self.last_flush >= app.config['POST_VIEW_FLUSH_SECONDS']:
+            self.flush()
+    
+    def pending(self, post_id):
+        with self.lock:
+            return self.counts.get(post_id, 0)
+    
+    def flush(self):
+        """Write and clear the pending counts; returns the number of posts updated"""
+        with self.flush_lock:
+            with self.lock:
+                counts, self.counts = self.counts, {}
+                self.last_flush = time.monotonic()
+            if not counts:
+                return 0
+            
+            items = sorted(counts.items())
+            try:
+                with app.app_context():
+                    with db.engine.begin() as conn:
+                        for start in range(0, len(items), self.CHUNK_SIZE):
+                            chunk = dict(items[start:start + self.CHUNK_SIZE])
+                            conn.execute(
+                                Post.__table__.update()
+                                .where(Post.id.in_(list(chunk)))
+                                .values(view_count=Post.view_count + db.case(chunk, value=Post.id, else_=0))
+                            )
+            except Exception as e:
+                print(f"⚠️ Failed to flush post views, will retry: {e}")
+                with self.lock:
+                    for post_id, count in counts.items():
+                        self.counts[post_id] = self.counts.get(post_id, 0) + count
+                return 0
+            recent_posts.add_views(counts)
+            post_cache.add_views(counts)
+            return len(counts)
+    
+    def start_flusher(self):
+        """Background flush loop, one per process (threads do not survive fork)"""
+        if self.flusher_pid == os.getpid():
+            return
+        with self.lock:
+            if self.flusher_pid == os.getpid():
+                return
+            self.flusher_pid = os.getpid()
+        threading.Thread(target=self.run_flusher, name='post-view-flusher', daemon=True).start()
+    
+    def run_flusher(self):
+        while True:
+            time.sleep(app.config['POST_VIEW_FLUSH_SECONDS'])
+            self.flush()
+
+view_counter = ViewCounter()
+# Drain whatever is pending when the process exits
+atexit.register(view_counter.flush)
+
+# Trending Posts
+class TrendingPosts:
+    """Top posts by engagement with exponential time decay, kept per process
+    
+    Every event adds weight * 2^((t - epoch) / half_life) to its post. Later
+    events weigh more, which decays everything older without touching it. The
+    epoch moves forward every REBASE_HALF_LIVES, scaling the stored scores down,
+    before that power outgrows a float. The candidate set is capped, so reads
+    never depend on the size of the table.
+    """
+    
+    POST_WEIGHT = 5.0
+    VIEW_WEIGHT = 1.0
+    # Candidates kept per ranked post; the weakest are dropped beyond this
+    CANDIDATE_FACTOR = 10
+    # Rows per chunk during a rebuild
+    CHUNK_SIZE = 1000
+    # 2^32 leaves plenty of float range; 2^1024 overflows
+    REBASE_HALF_LIVES = 32
+    
+    def __init__(self):
+        self.epoch = datetime.utcnow()
+        self.scores = {}
+        self.top = []
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.computed_at = None
+        self.rebuilding = False
+        # Events that arrive while a rebuild runs, replayed on top of it
+        self.replay = None
+    
+    @staticmethod
+    def half_lives(start, end):
+        return (end - start).total_seconds() / (app.config['TRENDING_HALF_LIFE_HOURS'] * 3600)
+    
+    def boost(self, when, epoch=None):
+        return 2 ** self.half_lives(epoch or self.epoch, when)
+    
+    def rebase(self, now):
+        """Move the epoch up to now once it is REBASE_HALF_LIVES behind;
+        call with the lock held"""
+        shift = self.half_lives(self.epoch, now)
+        if shift <= self.REBASE_HALF_LIVES:
+            return
+        factor = 2 ** -shift
+        self.epoch = now
+        self.scores = {post_id: score * factor for post_id, score in self.scores.items()}
+        self.top = [(post_id, score * factor) for post_id, score in self.top]
+        if self.replay is not None:
+            self.replay = [(post_id, score * factor) for post_id, score in self.replay]
+    
+    def capacity(self):
+        return app.config['TRENDING_SIZE'] * self.CANDIDATE_FACTOR
+    
+    def add(self, post_id, weight, when):
+        with self.lock:
+            self.rebase(when)
+            score = weight * self.boost(when)
+            self.scores[post_id] = self.scores.get(post_id, 0.0) + score
+            if self.replay is not None:
+                self.replay.append((post_id, score))
+            self.dirty = True
+            if len(self.scores) > 2 * self.capacity():
+                self.scores = dict(heapq.nlargest(self.capacity(), self.scores.items(), key=lambda item: item[1]))
+    
+    def record_post(self, post_id, created_at):
+        self.add(post_id, self.POST_WEIGHT, created_at)
+    
+    def record_view(self, post_id):
+        self.add(post_id, self.VIEW_WEIGHT, datetime.utcnow())
+    
+    def discard(self, post_id):
+        with self.lock:
+            self.scores.pop(post_id, None)
+            self.dirty = True
+    
+    def ranking(self, limit):
+        """Ids of the top posts, rebuilding in the background when stale"""
+        if self.computed_at is None or time.monotonic() - self.computed_at >= app.config['TRENDING_RECOMPUTE_SECONDS']:
+            # A cold process serves what it has recorded since starting
+            # (often nothing) rather than making the request wait
+            self.start_rebuild()
+        
+        with self.lock:
+            if self.dirty:
+                self.top = heapq.nlargest(app.config['TRENDING_SIZE'], self.scores.items(), key=lambda item: item[1])
+                self.dirty = False
+            return self.top[:limit]
+    
+    def start_rebuild(self):
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+        threading.Thread(target=self.rebuild, name='trending-rebuild', daemon=True).start()
+    
+    def rebuild(self):
+        """Rescore recent posts from the database, one chunk at a time"""
+        now = datetime.utcnow()
+        with self.lock:
+            self.rebuilding = True
+            self.replay = []
+            self.rebase(now)
+            epoch = self.epoch
+        try:
+            since = now - timedelta(days=app.config['TRENDING_WINDOW_DAYS'])
+            capacity = self.capacity()
+            best = []  # min-heap of (score, post_id), at most capacity entries
+            
+            with app.app_context():
+                # Walk ix_posts_created_at_id from the newest post down to the
+                # window's edge; older rows are never read
+                last = None  # (created_at, id) of the previous chunk's last row
+                while True:
+                    query = (db.session.query(Post.id, Post.created_at, Post.view_count)
+                             .filter(Post.created_at >= since))
+                    if last is not None:
+                        query = query.filter(Post.created_at <= last[0],
+                                             db.or_(Post.created_at < last[0], Post.id > last[1]))
+                    rows = query.order_by(Post.created_at.desc(), Post.id).limit(self.CHUNK_SIZE).all()
+                    if not rows:
+                        break
+                    for post_id, created_at, view_count in rows:
+                        # Stored views have no timestamp; score them at the post's age
+                        score = (self.POST_WEIGHT + self.VIEW_WEIGHT * (view_count or 0)) * self.boost(created_at, epoch)
+                        if len(best) < capacity:
+                            heapq.heappush(best, (score, post_id))
+                        elif score > best[0][0]:
+                            heapq.heapreplace(best, (score, post_id))
+                    last = (rows[-1][1], rows[-1][0])
+                db.session.remove()
+            
+            with self.lock:
+                # Events may have moved the epoch on while this ran
+                factor = 2 ** -self.half_lives(epoch, self.epoch)
+                scores = {post_id: score * factor for score, post_id in best}
+                for post_id, score in self.replay:
+                    scores[post_id] = scores.get(post_id, 0.0) + score
+                self.scores = scores
+                self.dirty = True
+        except Exception as e:
+            print(f"⚠️ Trending rebuild failed: {e}")
+        finally:
+            with self.lock:
+                self.replay = None
+                self.rebuilding = False
+                self.computed_at = time.monotonic()
+
+trending = TrendingPosts()
+
+# Recent Posts Cache
+class RecentPostsCache:
+    """The newest posts, serialized, in feed order
+    
+    Written through by create/update/delete in this process and reloaded from
+    the database every RECENT_POSTS_REFRESH_SECONDS for writes made elsewhere.
+    A page is served from here when it lies within the cached depth, or when
+    every post is cached.
+    """
+    
+    # Rough per-entry overhead on top of the text fields
+    ENTRY_OVERHEAD = 512
+    
+    def __init__(self):
+        self.entries = []   # dicts, newest first
+        self.keys = []      # sort keys matching entries, for bisect
+        self.total = 0      # posts in the table
+        self.size = 0
+        self.loaded_at = None
+        self.lock = threading.Lock()
+        self.reloading = False
+        # Writes seen while a reload runs, applied on top of it: (op, value, post id)
+        self.replay = None
+    
+    @staticmethod
+    def sort_key(created_at, post_id):
+        # created_at DESC, id ASC: the order of ix_posts_created_at_id. Whole
+        # microseconds, a float timestamp cannot hold them exactly
+        return (-((created_at - datetime(1970, 1, 1)) // timedelta(microseconds=1)), post_id)
+    
+    @classmethod
+    def entry_for(cls, post):
+        """Snapshot a post; call before commit expires it"""
+        data = post.to_dict()
+        data['view_count'] = post.view_count or 0
+        excerpt = post.preview()
+        return {
+            'id': post.id,
+            'key': cls.sort_key(post.created_at, post.id),
+            'created_at': post.created_at,
+            'data': data,
+            'excerpt': excerpt,
+            'size': len(data['title']) + len(data['content']) + len(excerpt) + cls.ENTRY_OVERHEAD
+        }
+    
+    def capacity_reached(self):
+        return (len(self.entries) > app.config['RECENT_POSTS_CACHE_SIZE']
+                or self.size > app.config['RECENT_POSTS_CACHE_MAX_BYTES'])
+    
+    def insert(self, entry):
+        self.discard(entry['id'])
+        if len(self.entries) < self.total - 1 and self.keys and entry['key'] > self.keys[-1]:
+            # Older than everything cached and not the whole table: not ours to hold
+            return
+        index = bisect.bisect_left(self.keys, entry['key'])
+        self.entries.insert(index, entry)
+        self.keys.insert(index, entry['key'])
+        self.size += entry['size']
+        self.trim()
+    
+    def trim(self):
+        while self.capacity_reached():
+            self.size -= self.entries.pop()['size']
+            self.keys.pop()
+    
+    def discard(self, post_id):
+        for index, entry in enumerate(self.entries):
+            if entry['id'] == post_id:
+                del self.entries[index]
+                del self.keys[index]
+                self.size -= entry['size']
+                return True
+        return False
+    
+    def apply(self, op, value):
+        if op == 'add':
+            self.total += 1
+            if value is not None:
+                self.insert(value)
+        elif op == 'replace':
+            for index, entry in enumerate(self.entries):
+                if entry['id'] == value['id']:
+                    self.entries[index] = value
+                    self.size += value['size'] - entry['size']
+                    break
+            self.trim()
+        elif op == 'remove':
+            self.total -= 1
+            self.discard(value)
+    
+    def write(self, op, value, post_id):
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            self.apply(op, value)
+            if self.replay is not None:
+                self.replay.append((op, value, post_id))
+    
+    def add(self, entry):
+        self.write('add', entry, entry['id'])
+    
+    def replace(self, entry):
+        self.write('replace', entry, entry['id'])
+    
+    def remove(self, post_id):
+        self.write('remove', post_id, post_id)
+    
+    def invalidate(self):
+        """Forget everything; the next read reloads"""
+        with self.lock:
+            self.entries, self.keys = [], []
+            self.size = self.total = 0
+            self.loaded_at = None
+    
+    def add_views(self, counts):
+        """Move just-flushed view counts into the cached totals"""
+        with self.lock:
+            for entry in self.entries:
+                if entry['id'] in counts:
+                    entry['data']['view_count'] += counts[entry['id']]
+    
+    def reload(self):
+        with self.lock:
+            self.reloading = True
+            self.replay = []
+        try:
+            posts = (Post.query.options(joinedload(Post.author))
+                     .order_by(Post.created_at.desc(), Post.id)
+                     .limit(app.config['RECENT_POSTS_CACHE_SIZE']).all())
+            entries = [self.entry_for(post) for post in posts]
+            # One statement, one snapshot: the newest id it counted
+            total, newest_id = db.session.query(db.func.count(Post.id), db.func.max(Post.id)).one()
+            
+            with self.lock:
+                self.entries, self.keys = [], []
+                self.size = 0
+                self.total = total
+                for entry in entries:
+                    self.entries.append(entry)
+                    self.keys.append(entry['key'])
+                    self.size += entry['size']
+                self.trim()
+                for op, value, post_id in self.replay:
+                    if op == 'add' and post_id <= (newest_id or 0):
+                        # Committed before the count: already in total, only place it
+                        if value is not None:
+                            self.insert(value)
+                    else:
+                        self.apply(op, value)
+                self.loaded_at = time.monotonic()
+        finally:
+            with self.lock:
+                self.replay = None
+                self.reloading = False
+    
+    def reload_in_background(self):
+        with self.lock:
+            if self.reloading:
+                return
+            self.reloading = True
+        
+        def run():
+            try:
+                with app.app_context():
+                    self.reload()
+                    db.session.remove()
+            except Exception as e:
+                print(f"⚠️ Recent posts reload failed: {e}")
+                with self.lock:
+                    self.reloading = False
+        
+        threading.Thread(target=run, name='recent-posts-reload', daemon=True).start()
+    
+    def refetch(self, post_id, created):
+        """Another process created or edited a post: fetch just that row
+        instead of reloading the newest posts and recounting the table"""
+        with self.lock:
+            if self.loaded_at is None:
+                return
+        with app.app_context():
+            try:
+                post = db.session.get(Post, post_id, options=[joinedload(Post.author)])
+                entry = self.entry_for(post) if post is not None else None
+            finally:
+                db.session.remove()
+        if created:
+            # Counted even if already deleted again; its delete event uncounts it
+            self.write('add', entry, post_id)
+        elif entry is not None:
+            # Edits keep created_at, so the post stays where it is, if cached
+            self.replace(entry)
+    
+    def reload_soon(self, post_id=None):
+        """Another process changed posts: stop serving the changed one and refetch"""
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            if post_id is not None:
+                self.discard(post_id)
+        self.reload_in_background()
+    
+    def ensure_loaded(self):
+        """Load on first use; afterwards refresh without blocking readers"""
+        if self.loaded_at is None:
+            self.reload()
+        elif (time.monotonic() - self.loaded_at >= app.config['RECENT_POSTS_REFRESH_SECONDS']
+              or len(self.entries) < min(self.total, app.config['RECENT_POSTS_CACHE_SIZE']) // 2):
+            # Stale, or deletes have eaten into the cached depth
+            self.reload_in_background()
+    
+    def page(self, page, per_page, summary=False, fields=None):
+        """(serialized posts, total) for a page inside the cache, else None"""
+        self.ensure_loaded()
+        with self.lock:
+            start, end = (page - 1) * per_page, page * per_page
+            if end > len(self.entries) and len(self.entries) < self.total:
+                return None
+            entries, total = self.entries[start:end], self.total
+        
+        posts = []
+        for entry in entries:
+            data = dict(entry['data'])
+            data['view_count'] += view_counter.pending(entry['id'])
+            if summary and fields is None:
+                del data['content']
+            if summary or fields is not None:
+                data['excerpt'] = entry['excerpt']
+            posts.append(project(data, fields))
+        return posts, total
+    
+    def latest(self, limit):
+        """Template-friendly objects for the newest posts, or None if not cached"""
+        self.ensure_loaded()
+        with self.lock:
+            if limit > len(self.entries) and len(self.entries) < self.total:
+                return None
+            entries = self.entries[:limit]
+        return [
+            SimpleNamespace(id=entry['id'], title=entry['data']['title'], created_at=entry['created_at'],
+                            author=SimpleNamespace(username=entry['data'].get('author')))
+            for entry in entries
+        ]
+
+recent_posts = RecentPostsCache()
+
+# Single Post Cache
+class InFlight:
+    """A load that concurrent requests for the same key wait on"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlightCache:
+    """Per-process cache where concurrent misses for a key share one load
+    
+    Entries are fresh for ttl seconds. For a further stale seconds they are
+    still served while a single background load refreshes them.
+    """
+    
+    def __init__(self, ttl_key, stale_key, max_entries_key):
+        self.ttl_key = ttl_key
+        self.stale_key = stale_key
+        self.max_entries_key = max_entries_key
+        self.entries = {}    # key -> (value, fresh_until, stale_until)
+        self.in_flight = {}  # key -> InFlight
+        self.lock = threading.Lock()
+        self.counts = {'hits': 0, 'stale_hits': 0, 'loads': 0, 'coalesced': 0}
+    
+    def get(self, key, load):
+        """Cached value for key, calling load() at most once at a time per key"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and now < entry[1]:
+                self.counts['hits'] += 1
+                return entry[0]
+            if entry and now < entry[2]:
+                self.counts['stale_hits'] += 1
+                if key not in self.in_flight:
+                    flight = self.in_flight[key] = InFlight()
+                    threading.Thread(target=self.refresh, args=(key, load, flight), daemon=True).start()
+                return entry[0]
+            flight = self.in_flight.get(key)
+            if flight:
+                self.counts['coalesced'] += 1
+                leader = False
+            else:
+                flight = self.in_flight[key] = InFlight()
+                leader = True
+        
+        if leader:
+            self.run(key, load, flight)
+        else:
+            flight.done.wait()
+        if flight.error:
+            raise flight.error
+        return flight.value
+    
+    def get_many(self, keys, load_many):
+        """{key: value} for several keys; the misses go to one load_many(keys) call
+        
+        load_many returns {key: value} and may leave out keys (stored as None).
+        """
+        now = time.monotonic()
+        values, leading, waiting = {}, {}, {}
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry and now < entry[1]:
+                    self.counts['hits'] += 1
+                    values[key] = entry[0]
+                elif entry and now < entry[2]:
+                    self.counts['stale_hits'] += 1
+                    values[key] = entry[0]
+                    if key not in self.in_flight:
+                        flight = self.in_flight[key] = InFlight()
+                        load = lambda key=key: load_many([key]).get(key)
+                        threading.Thread(target=self.refresh, args=(key, load, flight), daemon=True).start()
+                elif key in self.in_flight:
+                    self.counts['coalesced'] += 1
+                    waiting[key] = self.in_flight[key]
+                else:
+                    leading[key] = self.in_flight[key] = InFlight()
+        
+        if leading:
+            try:
+                loaded = load_many(list(leading))
+                for key, flight in leading.items():
+                    flight.value = loaded.get(key)
+                    self.store(key, flight.value, flight)
+            except Exception as e:
+                for flight in leading.values():
+                    flight.error = e
+            finally:
+                for key, flight in leading.items():
+                    self.land(key, flight)
+        
+        for key, flight in {**leading, **waiting}.items():
+            flight.done.wait()
+            if flight.error:
+                raise flight.error
+            values[key] = flight.value
+        return values
+    
+    def run(self, key, load, flight):
+        try:
+            flight.value = load()
+            self.store(key, flight.value, flight)
+        except Exception as e:
+            flight.error = e
+        finally:
+            self.land(key, flight)
+    
+    def land(self, key, flight):
+        """Finish a load and wake its waiters"""
+        with self.lock:
+            if self.in_flight.get(key) is flight:
+                del self.in_flight[key]
+        flight.done.set()
+    
+    def refresh(self, key, load, flight):
+        # The flight is passed in: by now the key may have been invalidated,
+        # or belong to a newer leader's flight
+        with app.app_context():
+            self.run(key, load, flight)
+            db.session.remove()
+    
+    def store(self, key, value, flight):
+        now = time.monotonic()
+        ttl = app.config[self.ttl_key]
+        with self.lock:
+            self.counts['loads'] += 1
+            if self.in_flight.get(key) is not flight:
+                # Invalidated while loading; the value may predate the change
+                return
+            if len(self.entries) >= app.config[self.max_entries_key] and key not in self.entries:
+                del self.entries[next(iter(self.entries))]
+            self.entries[key] = (value, now + ttl, now + ttl + app.config[self.stale_key])
+    
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            # Readers already waiting keep their result, later ones reload
+            self.in_flight.pop(key, None)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.in_flight.clear()
+    
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, entries=len(self.entries))
+
+class PostCache(SingleFlightCache):
+    """Posts by id for get_post and web_post_detail, serialized once per load"""
+    
+    def __init__(self):
+        super().__init__('POST_CACHE_TTL_SECONDS', 'POST_CACHE_STALE_SECONDS', 'POST_CACHE_MAX_ENTRIES')
+    
+    @staticmethod
+    def entry_for(post):
+        data = post.to_dict()
+        data['view_count'] = post.view_count or 0
+        return {'data': data, 'created_at': post.created_at, 'updated_at': post.updated_at}
+    
+    @classmethod
+    def load_post(cls, post_id):
+        post = Post.query.options(joinedload(Post.author)).filter_by(id=post_id).first()
+        return cls.entry_for(post) if post else None
+    
+    @classmethod
+    def load_posts(cls, post_ids):
+        posts = Post.query.options(joinedload(Post.author)).filter(Post.id.in_(post_ids))
+        return {post.id: cls.entry_for(post) for post in posts}
+    
+    @staticmethod
+    def live(cached, summary=False, fields=None):
+        data = dict(cached['data'], view_count=cached['data']['view_count'] + view_counter.pending(cached['data']['id']))
+        if summary or fields is not None:
+            # Same text as Post.preview(), from the cached content
+            content = data['content'] if fields is not None else data.pop('content')
+            data['excerpt'] = content[:EXCERPT_LENGTH] + '...' if len(content) > EXCERPT_LENGTH else content
+        return project(data, fields)
+    
+    def lookup(self, post_id, fields=None):
+        """Cached post dict (None when missing) with live view count"""
+        cached = self.get(post_id, lambda: self.load_post(post_id))
+        return self.live(cached, fields=fields) if cached else None
+    
+    def lookup_many(self, post_ids, summary=False, fields=None):
+        """{post_id: post dict or None}, loading every miss in one query"""
+        found = self.get_many(post_ids, self.load_posts)
+        return {post_id: self.live(cached, summary, fields) if cached else None for post_id, cached in found.items()}
+    
+    def lookup_for_template(self, post_id):
+        cached = self.get(post_id, lambda: self.load_post(post_id))
+        if cached is None:
+            return None
+        data = cached['data']
+        return SimpleNamespace(
+            id=data['id'], title=data['title'], content=data['content'], user_id=data['user_id'],
+            created_at=cached['created_at'], updated_at=cached['updated_at'],
+            view_count=data['view_count'] + view_counter.pending(post_id),
+            author=SimpleNamespace(username=data.get('author'))
+        )
+    
+    def add_views(self, counts):
+        """Move just-flushed view counts into the cached totals"""
+        with self.lock:
+            for post_id, count in counts.items():
+                entry = self.entries.get(post_id)
+                if entry and entry[0] is not None:
+                    entry[0]['data']['view_count'] += count
+
+post_cache = PostCache()
+
+# Home Timelines
+class BackgroundQueue:
+    """Runs jobs on a background thread, in submission order
+    
+    Jobs still queued at exit are run before the process stops. A crash loses
+    them: for timeline fan-out the posts stay visible everywhere except those
+    followers' timelines.
+    """
+    
+    def __init__(self, name):
+        self.name = name
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker_pid = None
+    
+    def submit(self, job, *args):
+        self.start_worker()
+        self.jobs.put((job, args))
+    
+    def start_worker(self):
+        if self.worker_pid == os.getpid():
+            return
+        with self.lock:
+            if self.worker_pid == os.getpid():
+                return
+            self.worker_pid = os.getpid()
+            if self.jobs.unfinished_tasks:
+                # Inherited across fork with no thread to serve it
+                self.jobs = queue.Queue()
+        threading.Thread(target=self.run_worker, name=self.name, daemon=True).start()
+    
+    def run_worker(self):
+        while True:
+            self.run_one(*self.jobs.get())
+    
+    def run_one(self, job, args):
+        try:
+            with app.app_context():
+                job(*args)
+                db.session.remove()
+        except Exception as e:
+            print(f"⚠️ Background job {job.__name__} ({self.name}) failed: {e}")
+        finally:
+            self.jobs.task_done()
+    
+    def join(self):
+        """Wait until every submitted job has run"""
+        self.jobs.join()
+    
+    def drain(self):
+        """Run queued jobs on the calling thread"""
+        while True:
+            try:
+                item = self.jobs.get_nowait()
+            except queue.Empty:
+                return
+            self.run_one(*item)
+
+fanout = BackgroundQueue('timeline-fanout')
+atexit.register(fanout.drain)
+
+# Followers per INSERT when fanning out a post
+FANOUT_CHUNK_SIZE = 1000
+
+def fan_out_post(post_id, author_id, created_at):
+    """Deliver a new post to its author's and followers' timelines"""
+    entries = TimelineEntry.__table__
+    db.session.execute(entries.insert(), [{'user_id': author_id, 'post_id': post_id, 'created_at': created_at}])
+    
+    author = db.session.get(User, author_id)
+    if author is None or author.follower_count >= app.config['TIMELINE_FANOUT_MAX_FOLLOWERS']:
+        # Followers pull this post at read time, even once the author drops
+        # back under the threshold
+        db.session.execute(db.update(Post).where(Post.id == post_id).values(fanned_out=False),
+                           execution_options={'synchronize_session': False})
+        db.session.commit()
+        return
+    
+    last_id = 0
+    while True:
+        follower_ids = db.session.scalars(
+            db.select(Follow.follower_id)
+            .where(Follow.followed_id == author_id, Follow.follower_id > last_id)
+            .order_by(Follow.follower_id).limit(FANOUT_CHUNK_SIZE)
+        ).all()
+        if not follower_ids:
+            break
+        db.session.execute(entries.insert(), [
+            {'user_id': follower_id, 'post_id': post_id, 'created_at': created_at}
+            for follower_id in follower_ids
+        ])
+        # One transaction per chunk keeps locks short on big fan-outs
+        db.session.commit()
+        last_id = follower_ids[-1]
+    db.session.commit()
+
+def backfill_timeline(follower_id, followed_id):
+    """Copy a newly followed author's recent posts into the follower's timeline"""
+    already = db.select(TimelineEntry.post_id).where(TimelineEntry.user_id == follower_id)
+    recent = (db.select(db.literal(follower_id), Post.id, Post.created_at)
+              .where(Post.user_id == followed_id, Post.id.not_in(already))
+              .order_by(Post.created_at.desc())
+              .limit(app.config['TIMELINE_BACKFILL_POSTS']))
+    db.session.execute(
+        TimelineEntry.__table__.insert().from_select(['user_id', 'post_id', 'created_at'], recent)
+    )
+    db.session.commit()
+
+def prune_timeline(follower_id, followed_id):
+    """Remove an unfollowed author's posts from the follower's timeline"""
+    db.session.execute(
+        TimelineEntry.__table__.delete().where(
+            TimelineEntry.user_id == follower_id,
+            TimelineEntry.post_id.in_(db.select(Post.id).where(Post.user_id == followed_id))
+        )
+    )
+    db.session.commit()
+
+def parse_timeline_cursor(cursor):
+    """'<created_at ISO>_<post id>' from a previous page's next_cursor"""
+    created_at, _, post_id = cursor.rpartition('_')
+    return datetime.fromisoformat(created_at), int(post_id)
+
+def timeline_query(user_id, limit, cursor=None):
+    """One statement: the user's timeline rows, merged with the posts of
+    followed authors that were too big to fan out when they wrote them"""
+    delivered = db.select(TimelineEntry.post_id.label('post_id'), TimelineEntry.created_at.label('created_at')) \
+        .where(TimelineEntry.user_id == user_id)
+    followed = db.select(Follow.followed_id).where(Follow.follower_id == user_id)
+    pulled = db.select(Post.id.label('post_id'), Post.created_at.label('created_at')) \
+        .where(Post.user_id.in_(followed), db.text('NOT posts.fanned_out'))
+    
+    if cursor:
+        created_at, post_id = cursor
+        delivered = delivered.where(db.tuple_(TimelineEntry.created_at, TimelineEntry.post_id) < (created_at, post_id))
+        pulled = pulled.where(db.tuple_(Post.created_at, Post.id) < (created_at, post_id))
+    
+    # Each side is a range scan of its (user, created_at) index, the pull side of
+    # the partial one, limited before the merge
+    delivered = delivered.order_by(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc()).limit(limit)
+    pulled = pulled.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit)
+    page = db.union(db.select(delivered.subquery()), db.select(pulled.subquery())).subquery()
+    
+    return (Post.query.join(page, Post.id == page.c.post_id)
+            .order_by(Post.created_at.desc(), Post.id.desc())
+            .limit(limit))
+
+# Account Deletion
+# No password hash matches this: the account can no longer log in while its
+# posts are being deleted
+DELETED_PASSWORD_HASH = '!deleted'
+
+account_deletions = BackgroundQueue('account-deletion')
+atexit.register(account_deletions.drain)
+
+def forget_posts(post_ids):
+    """Drop deleted posts from this process's caches"""
+    for post_id in post_ids:
+        recent_posts.remove(post_id)
+        post_cache.invalidate(post_id)
+        trending.discard(post_id)
+
+def delete_account(user_id):
+    """Delete a user's posts one chunk per transaction, then the user
+    
+    Timeline entries and follows go with ON DELETE CASCADE, so nothing is
+    loaded into the session and every transaction locks one chunk of rows.
+    Running it again finishes an interrupted deletion; accounts left half
+    deleted have password_hash DELETED_PASSWORD_HASH and are picked up by
+    resume_account_deletions().
+    """
+    chunk_size = app.config['ACCOUNT_DELETE_CHUNK_SIZE']
+    while True:
+        post_ids = db.session.scalars(
+            db.select(Post.id).where(Post.user_id == user_id).order_by(Post.id).limit(chunk_size)
+        ).all()
+        if post_ids:
+            db.session.execute(db.delete(Post).where(Post.id.in_(post_ids)), execution_options={'synchronize_session': False})
+            for post_id in post_ids:
+                invalidation_bus.publish('post', post_id, 'delete')
+        if len(post_ids) < chunk_size:
+            break
+        db.session.commit()
+        forget_posts(post_ids)
+        time.sleep(app.config['ACCOUNT_DELETE_PAUSE_SECONDS'])
+    
+    # The last chunk commits with the user row
+    followed = db.select(Follow.followed_id).where(Follow.follower_id == user_id)
+    db.session.execute(db.update(User).where(User.id.in_(followed))
+                       .values(follower_count=User.follower_count - 1),
+                       execution_options={'synchronize_session': False})
+    db.session.execute(db.delete(User).where(User.id == user_id), execution_options={'synchronize_session': False})
+    invalidation_bus.publish('user', user_id, 'delete')
+    db.session.commit()
+    forget_posts(post_ids)
+    invalidate_user(user_id)
+
+def resume_account_deletions():
+    """Finish every deletion a crash or restart left behind; returns the user ids
+    
+    The background queue is in memory, so a process that dies loses the
+    accounts it had locked but not yet deleted. Runs on the calling thread.
+    """
+    user_ids = db.session.scalars(
+        db.select(User.id).where(User.password_hash == DELETED_PASSWORD_HASH).order_by(User.id)
+    ).all()
+    for user_id in user_ids:
+        delete_account(user_id)
+    return user_ids
+
+# Cache Invalidation Bus
+class PostgresChannel:
+    """NOTIFY inside the writing transaction, LISTEN on a dedicated connection"""
+    
+    CHANNEL = 'cache_invalidation'
+    
+    def __init__(self, url):
+        self.dsn = url.set(drivername='postgresql').render_as_string(hide_password=False)
+    
+    def send_in_transaction(self, session, payloads):
+        # Delivered by Postgres on commit, dropped on rollback; one round trip
+        # however many rows the transaction changed
+        session.execute(db.text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+                        {'channel': self.CHANNEL, 'payloads': list(payloads)})
+    
+    def send(self, payloads):
+        pass
+    
+    def listen(self, deliver):
+        import psycopg2
+        
+        delay = 1
+        while True:
+            try:
+                conn = psycopg2.connect(self.dsn, application_name='flask_vercel_app_listener')
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {self.CHANNEL}")
+                # Anything sent while we were not listening is lost
+                deliver(None)
+                delay = 1
+                while True:
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        deliver(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"⚠️ Invalidation listener disconnected, retrying in {delay}s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+class FileChannel:
+    """Append-only file shared by the processes of one host, polled for new lines"""
+    
+    POLL_SECONDS = 0.01
+    # Truncated past this size; readers notice and resynchronise
+    MAX_BYTES = 1024 * 1024
+    
+    def __init__(self, path):
+        self.path = path
+    
+    def send_in_transaction(self, session, payloads):
+        pass
+    
+    def send(self, payloads):
+        data = ''.join(payload + '\n' for payload in payloads).encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size > self.MAX_BYTES:
+                os.ftruncate(fd, 0)
+            # O_APPEND writes this small are not interleaved with other writers
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+    
+    def size(self):
+        try:
+            return os.stat(self.path).st_size
+        except FileNotFoundError:
+            return 0
+    
+    def listen(self, deliver):
+        offset = self.size()
+        while True:
+            time.sleep(self.POLL_SECONDS)
+            size = self.size()
+            if size < offset:
+                offset = 0
+                deliver(None)
+            if size == offset:
+                continue
+            try:
+                with open(self.path, 'rb') as f:
+                    f.seek(offset)
+                    chunk = f.read(size - offset)
+            except OSError:
+                continue
+            # Leave a partially written last line for the next poll
+            complete = chunk[:chunk.rfind(b'\n') + 1]
+            offset += len(complete)
+            for line in complete.decode().splitlines():
+                deliver(line)
+
+class InvalidationBus:
+    """Tells other processes which cached rows changed
+    
+    Events queued with publish() are sent when the session commits, and
+    skipped by the process that sent them (its caches are written through).
+    Handlers subscribe per kind; 'resync' handlers run when events may have
+    been missed.
+    """
+    
+    def __init__(self, channel):
+        self.channel = channel
+        self.handlers = {}
+        self.lock = threading.Lock()
+        self.listener_pid = None
+        self.origin = None
+    
+    def subscribe(self, kind, handler):
+        self.handlers.setdefault(kind, []).append(handler)
+    
+    def start(self):
+        """Start this process's listener (threads do not survive fork)"""
+        if self.channel is None or self.listener_pid == os.getpid():
+            return
+        with self.lock:
+            if self.listener_pid == os.getpid():
+                return
+            self.listener_pid = os.getpid()
+            self.origin = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        threading.Thread(target=self.channel.listen, args=(self.deliver,),
+                         name='invalidation-listener', daemon=True).start()
+    
+    def publish(self, kind, object_id, op):
+        """Queue an event on the current transaction"""
+        if self.channel is None:
+            return
+        self.start()
+        db.session.info.setdefault('invalidations', []).append(
+            json.dumps({'kind': kind, 'id': object_id, 'op': op, 'origin': self.origin})
+        )
+    
+    def deliver(self, payload):
+        try:
+            if payload is None:
+                events = [('resync', None, None)]
+            else:
+                event_data = json.loads(payload)
+                if event_data['origin'] == self.origin:
+                    return
+                events = [(event_data['kind'], event_data['id'], event_data['op'])]
+            for kind, object_id, op in events:
+                for handler in self.handlers.get(kind, []):
+                    handler(object_id, op)
+        except Exception as e:
+            print(f"⚠️ Invalidation event failed: {e}")
+
+def invalidation_channel():
+    setting = app.config['INVALIDATION_BUS']
+    if setting == 'auto':
+        setting = 'postgres' if db_url and db_url.startswith('postgresql') else 'off'
+    if setting == 'postgres':
+        return PostgresChannel(make_url(db_url))
+    if setting == 'file':
+        return FileChannel(app.config['INVALIDATION_BUS_FILE'])
+    return None
+
+invalidation_bus = InvalidationBus(invalidation_channel())
+
+@event.listens_for(db.session, 'before_commit')
+def send_invalidations_in_transaction(session):
+    if invalidation_bus.channel and session.info.get('invalidations'):
+        invalidation_bus.channel.send_in_transaction(session, session.info['invalidations'])
+
+@event.listens_for(db.session, 'after_commit')
+def send_invalidations(session):
+    payloads = session.info.pop('invalidations', None)
+    if invalidation_bus.channel and payloads:
+        try:
+            invalidation_bus.channel.send(payloads)
+        except OSError as e:
+            print(f"⚠️ Failed to publish cache invalidations: {e}")
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_invalidations(session):
+    session.info.pop('invalidations', None)
+
+def on_remote_user_change(user_id, op):
+    invalidate_user(user_id)
+
+def on_remote_post_change(post_id, op):
+    post_cache.invalidate(post_id)
+    if op == 'delete':
+        recent_posts.remove(post_id)
+        trending.discard(post_id)
+    else:
+        # New or edited elsewhere: fetch that one post; the delete event, if
+        # it is gone already, takes care of the rest
+        try:
+            recent_posts.refetch(post_id, created=op == 'create')
+        except Exception as e:
+            print(f"⚠️ Refetching post {post_id} failed, reloading recent posts: {e}")
+            recent_posts.reload_soon(post_id)
+
+def on_resync(object_id, op):
+    with user_cache_lock:
+        user_cache.clear()
+    post_cache.clear()
+    recent_posts.reload_soon()
+
+invalidation_bus.subscribe('user', on_remote_user_change)
+invalidation_bus.subscribe('post', on_remote_post_change)
+invalidation_bus.subscribe('resync', on_resync)
+
+@app.before_request
+def start_invalidation_listener():
+    invalidation_bus.start()
+
+@app.context_processor
+def inject_session_user():
+    """Expose the logged-in user from the session to every template"""
+    if 'user_id' not in session:
+        return {'session_user': None}
+    return {'session_user': {'id': session['user_id'], 'username': session.get('username')}}
+
+# Response Compression
+class CompressionMiddleware:
+    """Compress text responses with the best encoding the client accepts
+    
+    Wraps app.wsgi_app. Responses that already carry a Content-Encoding (such
+    as pre-compressed static files), binary types, partial content and
+    Cache-Control: no-transform pass through untouched.
+    """
+    
+    COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript',
+                          'application/xml', 'image/svg+xml')
+    SKIPPED_TYPES = ('text/event-stream',)
+    
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+    
+    @staticmethod
+    def encodings():
+        """Supported encodings, most preferred first"""
+        return ('br', 'gzip', 'deflate') if brotli else ('gzip', 'deflate')
+    
+    def negotiate(self, accept_encoding):
+        """Highest-quality supported encoding in an Accept-Encoding header, or None"""
+        accept = parse_accept_header(accept_encoding)
+        best, best_quality = None, 0
+        for encoding in self.encodings():
+            quality = accept.quality(encoding)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+    
+    @staticmethod
+    def compressor(encoding):
+        """Object with compress(data) and flush() for an encoding"""
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=app.config['COMPRESSION_BROTLI_QUALITY'])
+            return SimpleNamespace(compress=compressor.process, flush=compressor.finish)
+        # gzip wraps the deflate stream in a gzip header, HTTP "deflate" is zlib format
+        wbits = 16 + zlib.MAX_WBITS if encoding == 'gzip' else zlib.MAX_WBITS
+        return zlib.compressobj(app.config['COMPRESSION_LEVEL'], zlib.DEFLATED, wbits)
+    
+    def compressible(self, status, headers):
+        content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        length = headers.get('Content-Length', type=int)
+        return (status[:3] not in ('204', '206', '304')
+                and 'Content-Encoding' not in headers
+                and 'no-transform' not in headers.get('Cache-Control', '')
+                and content_type.startswith(self.COMPRESSIBLE_TYPES)
+                and not content_type.startswith(self.SKIPPED_TYPES)
+                and (length is None or length >= app.config['COMPRESSION_MIN_BYTES']))
+    
+    def __call__(self, environ, start_response):
+        encoding = self.negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if not app.config['COMPRESSION_ENABLED'] or not encoding or environ['REQUEST_METHOD'] == 'HEAD':
+            return self.wsgi_app(environ, start_response)
+        
+        # Hold the headers back until we know whether the body gets compressed
+        response = {}
+        written = []
+        
+        def capture(status, headers, exc_info=None):
+            response.update(status=status, headers=headers, exc_info=exc_info)
+            return written.append
+        
+        app_iter = self.wsgi_app(environ, capture)
+        return self.respond(app_iter, response, written, encoding, start_response)
+    
+    def respond(self, app_iter, response, written, encoding, start_response):
+        try:
+            chunks = iter(app_iter)
+            body = list(written)
+            if not response:
+                # Generator apps call start_response when producing their first chunk
+                body.append(next(chunks, b''))
+            status, headers = response['status'], Headers(response['headers'])
+            
+            if not self.compressible(status, headers):
+                start_response(status, headers.to_wsgi_list(), response['exc_info'])
+                yield from body
+                yield from chunks
+                return
+            
+            # Read ahead to the stream threshold: small bodies are compressed
+            # whole and keep a Content-Length, larger ones are streamed
+            size = sum(len(chunk) for chunk in body)
+            complete = True
+            for chunk in chunks:
+                body.append(chunk)
+                size += len(chunk)
+                if size > app.config['COMPRESSION_STREAM_BYTES']:
+                    complete = False
+                    break
+            
+            if complete and size < app.config['COMPRESSION_MIN_BYTES']:
+                start_response(status, headers.to_wsgi_list(), response['exc_info'])
+                yield from body
+                return
+            
+            headers['Content-Encoding'] = encoding
+            vary = headers.get('Vary')
+            if not vary:
+                headers['Vary'] = 'Accept-Encoding'
+            elif 'accept-encoding' not in vary.lower():
+                headers['Vary'] = f"{vary}, Accept-Encoding"
+            etag = headers.get('ETag')
+            if etag and not etag.startswith('W/'):
+                # The compressed bytes differ from the ones the tag was made for
+                headers['ETag'] = 'W/' + etag
+            
+            compressor = self.compressor(encoding)
+            if complete:
+                data = b''.join(compressor.compress(chunk) for chunk in body) + compressor.flush()
+                headers['Content-Length'] = str(len(data))
+                start_response(status, headers.to_wsgi_list(), response['exc_info'])
+                yield data
+                return
+            
+            headers.remove('Content-Length')
+            start_response(status, headers.to_wsgi_list(), response['exc_info'])
+            for chunk in body:
+                data = compressor.compress(chunk)
+                if data:
+                    yield data
+            for chunk in chunks:
+                data = compressor.compress(chunk)
+                if data:
+                    yield data
+            yield compressor.flush()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+
 # Routes
 @app.route('/')
 @app.route('/api')
@@ -156,9 +1948,17 @@ def home():
             "POST /api/logout": "Logout user",
             "GET /api/profile": "Get user profile (requires login)",
             "PUT /api/profile": "Update user profile (requires login)",
-            "GET /api/users": "Get all users (paginated)",
+            "DELETE /api/profile": "Delete your account and posts (requires login and password)",
+            "GET /api/users": "Get all users (paginated, ?ids=1,2,3 for specific users)",
+            "GET /api/users/available?username=": "Check if a username is free",
+            "GET /api/users/<id>/posts": "Get a user's posts (paginated)",
+            "POST /api/users/<id>/follow": "Follow a user (requires login)",
+            "DELETE /api/users/<id>/follow": "Unfollow a user (requires login)",
+            "GET /api/timeline": "Posts from followed users (requires login, ?cursor= for more)",
             "POST /api/posts": "Create a new post (requires login)",
-            "GET /api/posts": "Get all posts (paginated)",
+            "GET /api/posts": "Get all posts (paginated, ?view=summary for excerpts, ?ids=1,2,3 for specific posts)",
+            "GET /api/posts/search?q=": "Search posts by title and content",
+            "GET /api/posts/trending": "Most engaged-with recent posts",
             "GET /api/posts/<id>": "Get specific post",
             "PUT /api/posts/<id>": "Update post (requires login)",
             "DELETE /api/posts/<id>": "Delete post (requires login)",
@@ -185,22 +1985,29 @@ def register():
         if '@' not in email:
             return jsonify({"error": "Invalid email format"}), 400
         
-        # Check if user exists
-        if User.query.filter_by(username=username).first():
-            return jsonify({"error": "Username already exists"}), 409
-        if User.query.filter_by(email=email).first():
-            return jsonify({"error": "Email already exists"}), 409
-        
-        # Create user
+        # Create user; the unique indexes on username/email do the duplicate check
+        # in the same INSERT, so there is no window between checking and writing
         user = User(username=username, email=email)
         user.set_password(password)
         
         db.session.add(user)
+        try:
+            db.session.flush()
+        except IntegrityError as e:
+            db.session.rollback()
+            duplicate = duplicate_user_error(e)
+            if duplicate:
+                return duplicate
+            raise
+        
+        # Serialize before commit expires the instance and forces a reload
+        user_data = user.to_dict()
         db.session.commit()
+        remember_username(user_data['username'])
         
         return jsonify({
             "message": "User registered successfully",
-            "user": user.to_dict()
+            "user": user_data
         }), 201
         
     except Exception as e:
@@ -218,11 +2025,14 @@ def login():
         username = data['username'].strip()
         password = data['password']
         
-        user = User.query.filter_by(username=username).first()
+        user = User.query.filter(db.func.lower(User.username) == username.lower()).first()
         
         if user and user.check_password(password):
             session['user_id'] = user.id
             session['username'] = user.username
+            # The next authenticated request finds the user already cached
+            if app.config['USER_CACHE_TTL_SECONDS'] > 0:
+                cache_user(user)
             
             return jsonify({
                 "message": "Login successful",
@@ -246,9 +2056,14 @@ def get_profile():
         return auth_error
     
     try:
-        user = User.query.get(session['user_id'])
+        try:
+            fields = parse_fields(request.args.get('fields'), PROFILE_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        user = current_user()
         if user:
-            return jsonify({"user": user.to_dict()}), 200
+            return jsonify({"user": user.to_dict(fields=fields)}), 200
         else:
             return jsonify({"error": "User not found"}), 404
     except Exception as e:
@@ -262,7 +2077,7 @@ def update_profile():
     
     try:
         data = request.get_json()
-        user = User.query.get(session['user_id'])
+        user = current_user()
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -272,10 +2087,6 @@ def update_profile():
             if '@' not in email:
                 return jsonify({"error": "Invalid email format"}), 400
             
-            existing_user = User.query.filter_by(email=email).first()
-            if existing_user and existing_user.id != user.id:
-                return jsonify({"error": "Email already exists"}), 409
-            
             user.email = email
         
         if 'password' in data:
@@ -283,39 +2094,252 @@ def update_profile():
                 return jsonify({"error": "Password must be at least 6 characters long"}), 400
             user.set_password(data['password'])
         
+        try:
+            db.session.flush()
+        except IntegrityError as e:
+            db.session.rollback()
+            duplicate = duplicate_user_error(e)
+            if duplicate:
+                return duplicate
+            raise
+        
+        user_data = user.to_dict()
+        invalidation_bus.publish('user', user_data['id'], 'update')
         db.session.commit()
+        invalidate_user(user_data['id'])
         
         return jsonify({
             "message": "Profile updated successfully",
-            "user": user.to_dict()
+            "user": user_data
         }), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/profile', methods=['DELETE'])
+def delete_profile():
+    auth_error = require_auth()
+    if auth_error:
+        return auth_error
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        user = current_user()
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        if not user.check_password(data.get('password') or ''):
+            return jsonify({"error": "Password is incorrect"}), 403
+        
+        user_id = user.id
+        post_count = db.session.scalar(
+            db.select(db.func.count()).select_from(Post).where(Post.user_id == user_id)
+        )
+        
+        # Below one chunk delete_account never pauses, so the request never sleeps
+        if post_count < app.config['ACCOUNT_DELETE_CHUNK_SIZE']:
+            delete_account(user_id)
+            session.clear()
+            return jsonify({"message": "Account deleted"}), 200
+        
+        # Lock the account now, delete its posts in bounded transactions later
+        db.session.execute(db.update(User).where(User.id == user_id).values(password_hash=DELETED_PASSWORD_HASH))
+        invalidation_bus.publish('user', user_id, 'update')
+        db.session.commit()
+        invalidate_user(user_id)
+        account_deletions.submit(delete_account, user_id)
+        # Log out only once the account is locked and its deletion is queued
+        session.clear()
+        return jsonify({"message": "Account deletion started", "posts": post_count}), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/users', methods=['GET'])
 def get_users():
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 10, type=int), 50)
+        try:
+            fields = parse_fields(request.args.get('fields'), USER_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if 'ids' in request.args:
+            try:
+                ids = parse_ids(request.args.getlist('ids'))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            
+            users, missing = in_request_order(ids, load_users(ids))
+            return jsonify({
+                "users": [user.to_dict(include_email=False, fields=fields) for user in users],
+                "missing": missing
+            }), 200
+        
+        page, per_page = page_args()
+        
+        mode = count_mode()
+        if mode is None:
+            return jsonify({"error": "count must be one of: exact, estimate, none"}), 400
+        
+        query = User.query.options(*user_load_options(fields))
+        users, pagination = paginate_query(query.order_by(User.id), page, per_page, mode)
+        
+        return jsonify({
+            "users": [user.to_dict(include_email=False, fields=fields) for user in users],
+            "pagination": pagination
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/users/available', methods=['GET'])
+def username_available():
+    try:
+        username = request.args.get('username', '').strip()
+        
+        if len(username) < 3:
+            return jsonify({"error": "Username must be at least 3 characters long"}), 400
+        
+        # A Bloom filter miss is definitive; only possible hits cost a query
+        if username.lower() not in get_username_filter():
+            return jsonify({"username": username, "available": True, "checked": "filter"}), 200
+        
+        taken = db.session.query(User.id).filter(
+            db.func.lower(User.username) == username.lower()
+        ).first() is not None
+        
+        return jsonify({"username": username, "available": not taken, "checked": "database"}), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/users/<int:user_id>/posts', methods=['GET'])
+def get_user_posts(user_id):
+    try:
+        page, per_page = page_args()
+        summary = request.args.get('view') == 'summary'
+        try:
+            fields = parse_fields(request.args.get('fields'), POST_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        mode = count_mode()
+        if mode is None:
+            return jsonify({"error": "count must be one of: exact, estimate, none"}), 400
         
-        users = User.query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
+        user = db.session.get(User, user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        
+        # Served by ix_posts_user_id_created_at
+        query = Post.query.options(*post_load_options(fields, summary)).filter_by(user_id=user_id)
+        
+        posts, pagination = paginate_query(
+            query.order_by(Post.created_at.desc(), Post.id.desc()), page, per_page, mode
         )
         
         return jsonify({
-            "users": [user.to_dict(include_email=False) for user in users.items],
-            "pagination": {
-                "page": page,
-                "per_page": per_page,
-                "total": users.total,
-                "pages": users.pages,
-                "has_next": users.has_next,
-                "has_prev": users.has_prev
-            }
+            "user": user.to_dict(include_email=False),
+            "posts": [post.to_dict(summary=summary, fields=fields) for post in posts],
+            "pagination": pagination
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/users/<int:user_id>/follow', methods=['POST'])
+def follow_user(user_id):
+    auth_error = require_auth()
+    if auth_error:
+        return auth_error
+    
+    try:
+        if user_id == session['user_id']:
+            return jsonify({"error": "You cannot follow yourself"}), 400
+        
+        db.session.add(Follow(follower_id=session['user_id'], followed_id=user_id))
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # Already following (primary key) or no such user (foreign key)
+            db.session.rollback()
+            if not db.session.get(User, user_id):
+                return jsonify({"error": "User not found"}), 404
+            return jsonify({"message": "Already following"}), 200
+        
+        # Foreign keys are not enforced on every backend; don't count a ghost follow
+        updated = db.session.execute(
+            User.__table__.update().where(User.id == user_id)
+            .values(follower_count=User.follower_count + 1)
+        ).rowcount
+        if not updated:
+            db.session.rollback()
+            return jsonify({"error": "User not found"}), 404
+        db.session.commit()
+        
+        fanout.submit(backfill_timeline, session['user_id'], user_id)
+        return jsonify({"message": "Followed"}), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/users/<int:user_id>/follow', methods=['DELETE'])
+def unfollow_user(user_id):
+    auth_error = require_auth()
+    if auth_error:
+        return auth_error
+    
+    try:
+        deleted = Follow.query.filter_by(follower_id=session['user_id'], followed_id=user_id) \
+            .delete(synchronize_session=False)
+        if not deleted:
+            return jsonify({"error": "Not following this user"}), 404
+        
+        db.session.execute(
+            User.__table__.update().where(User.id == user_id)
+            .values(follower_count=User.follower_count - 1)
+        )
+        db.session.commit()
+        
+        fanout.submit(prune_timeline, session['user_id'], user_id)
+        return jsonify({"message": "Unfollowed"}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/timeline', methods=['GET'])
+def get_timeline():
+    auth_error = require_auth()
+    if auth_error:
+        return auth_error
+    
+    try:
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        summary = request.args.get('view') == 'summary'
+        try:
+            fields = parse_fields(request.args.get('fields'), POST_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        cursor = request.args.get('cursor')
+        try:
+            cursor = parse_timeline_cursor(cursor) if cursor else None
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        
+        # One extra row tells us whether there is a next page
+        # created_at is always loaded for the cursor
+        query = timeline_query(session['user_id'], limit + 1, cursor)
+        posts = query.options(*post_load_options(fields, summary, columns=(Post.created_at,))).all()
+        
+        has_next = len(posts) > limit
+        posts = posts[:limit]
+        next_cursor = f"{posts[-1].created_at.isoformat()}_{posts[-1].id}" if has_next else None
+        
+        return jsonify({
+            "posts": [post.to_dict(summary=summary, fields=fields) for post in posts],
+            "next_cursor": next_cursor
         }), 200
         
     except Exception as e:
@@ -339,18 +2363,32 @@ def create_post():
         if len(title) < 1 or len(content) < 1:
             return jsonify({"error": "Title and content cannot be empty"}), 400
         
+        user = current_user()
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        
         post = Post(
             title=title,
             content=content,
-            user_id=session['user_id']
+            author=user
         )
         
         db.session.add(post)
+        db.session.flush()
+        # Serialize before commit expires the post and its author
+        post_data = post.to_dict()
+        created_at = post.created_at
+        cache_entry = recent_posts.entry_for(post)
+        invalidation_bus.publish('post', post_data['id'], 'create')
         db.session.commit()
+        recent_posts.add(cache_entry)
+        post_cache.invalidate(post_data['id'])
+        trending.record_post(post_data['id'], created_at)
+        fanout.submit(fan_out_post, post_data['id'], post_data['user_id'], created_at)
         
         return jsonify({
             "message": "Post created successfully",
-            "post": post.to_dict()
+            "post": post_data
         }), 201
         
     except Exception as e:
@@ -360,37 +2398,125 @@ def create_post():
 @app.route('/api/posts', methods=['GET'])
 def get_posts():
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 10, type=int), 50)
+        page, per_page = page_args()
+        summary = request.args.get('view') == 'summary'
+        try:
+            fields = parse_fields(request.args.get('fields'), POST_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if 'ids' in request.args:
+            # Not counted as views, these are references rather than reads
+            try:
+                ids = parse_ids(request.args.getlist('ids'))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            
+            posts, missing = in_request_order(ids, post_cache.lookup_many(ids, summary, fields))
+            return jsonify({"posts": posts, "missing": missing}), 200
+        
+        mode = count_mode()
+        if mode is None:
+            return jsonify({"error": "count must be one of: exact, estimate, none"}), 400
+        
+        cached = recent_posts.page(page, per_page, summary, fields)
+        if cached is not None:
+            items, total = cached
+            return jsonify({"posts": items, "pagination": cached_pagination(page, per_page, total, mode)}), 200
+        
+        # Deeper pages
+        query = Post.query.options(*post_load_options(fields, summary))
+        posts, pagination = paginate_query(
+            query.order_by(Post.created_at.desc(), Post.id), page, per_page, mode
+        )
+        
+        return jsonify({
+            "posts": [post.to_dict(summary=summary, fields=fields) for post in posts],
+            "pagination": pagination
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/posts/search', methods=['GET'])
+def search_posts():
+    try:
+        query = request.args.get('q', '').strip()
+        page, per_page = page_args()
+        summary = request.args.get('view') == 'summary'
+        
+        if not query:
+            return jsonify({"error": "Search query is required"}), 400
+        try:
+            fields = parse_fields(request.args.get('fields'), POST_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        mode = count_mode()
+        if mode is None:
+            return jsonify({"error": "count must be one of: exact, estimate, none"}), 400
         
-        posts = Post.query.order_by(Post.created_at.desc()).paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
+        # Search in title and content
+        search = Post.query.options(*post_load_options(fields, summary)).filter(
+            db.or_(
+                Post.title.ilike(f'%{query}%'),
+                Post.content.ilike(f'%{query}%')
+            )
         )
         
+        posts, pagination = paginate_query(search.order_by(Post.created_at.desc()), page, per_page, mode)
+        
         return jsonify({
-            "posts": [post.to_dict() for post in posts.items],
-            "pagination": {
-                "page": page,
-                "per_page": per_page,
-                "total": posts.total,
-                "pages": posts.pages,
-                "has_next": posts.has_next,
-                "has_prev": posts.has_prev
-            }
+            "query": query,
+            "posts": [post.to_dict(summary=summary, fields=fields) for post in posts],
+            "pagination": pagination
         }), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/posts/trending', methods=['GET'])
+def trending_posts():
+    try:
+        limit = min(max(request.args.get('limit', 10, type=int), 1), app.config['TRENDING_SIZE'])
+        summary = request.args.get('view') == 'summary'
+        try:
+            fields = parse_fields(request.args.get('fields'), POST_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        ranked = trending.ranking(limit)
+        query = Post.query.options(*post_load_options(fields, summary))
+        posts = {post.id: post for post in query.filter(Post.id.in_([post_id for post_id, _ in ranked]))} if ranked else {}
+        
+        results = []
+        for post_id, score in ranked:
+            if post_id in posts:
+                data = posts[post_id].to_dict(summary=summary, fields=fields)
+                data['trending_score'] = round(score / trending.boost(datetime.utcnow()), 4)
+                results.append(data)
+        
+        return jsonify({"posts": results}), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/posts/<int:post_id>', methods=['GET'])
 def get_post(post_id):
     try:
-        post = Post.query.get_or_404(post_id)
-        return jsonify({"post": post.to_dict()}), 200
+        try:
+            fields = parse_fields(request.args.get('fields'), POST_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        post = post_cache.lookup(post_id, fields)
+        if post is None:
+            return jsonify({"error": "Post not found"}), 404
+        view_counter.record(post_id)
+        if 'view_count' in post:
+            post['view_count'] += 1
+        return jsonify({"post": post}), 200
     except Exception as e:
-        return jsonify({"error": "Post not found"}), 404
+        return jsonify({"error": str(e)}), 500
 
 @app.route('/api/posts/<int:post_id>', methods=['PUT'])
 def update_post(post_id):
@@ -413,11 +2539,17 @@ def update_post(post_id):
         post.content = data['content'].strip()
         post.updated_at = datetime.utcnow()
         
+        db.session.flush()
+        post_data = post.to_dict()
+        cache_entry = recent_posts.entry_for(post)
+        invalidation_bus.publish('post', post_id, 'update')
         db.session.commit()
+        recent_posts.replace(cache_entry)
+        post_cache.invalidate(post_id)
         
         return jsonify({
             "message": "Post updated successfully",
-            "post": post.to_dict()
+            "post": post_data
         }), 200
         
     except Exception as e:
@@ -439,7 +2571,9 @@ def delete_post(post_id):
             return jsonify({"error": "Unauthorized to delete this post"}), 403
         
         db.session.delete(post)
+        invalidation_bus.publish('post', post_id, 'delete')
         db.session.commit()
+        forget_posts([post_id])
         
         return jsonify({"message": "Post deleted successfully"}), 200
         
@@ -468,7 +2602,9 @@ def health_check():
             "stats": {
                 "users": user_count,
                 "posts": post_count
-            }
+            },
+            # Per process: coalesced counts requests that waited on another's load
+            "post_cache": post_cache.stats()
         }), 200
     except Exception as e:
         return jsonify({
@@ -501,24 +2637,37 @@ def web_dashboard():
     if 'user_id' not in session:
         return redirect(url_for('web_login'))
     
-    user = User.query.get(session['user_id'])
-    user_posts = Post.query.filter_by(user_id=session['user_id']).order_by(Post.created_at.desc()).limit(5).all()
-    recent_posts = Post.query.order_by(Post.created_at.desc()).limit(10).all()
+    user = current_user()
+    if not user:
+        session.clear()
+        return redirect(url_for('web_login'))
+    
+    # The author of our own posts is already in the identity map; the community
+    # list comes from the recent posts cache
+    user_posts = (Post.query.options(defer(Post.content))
+                  .filter_by(user_id=user.id).order_by(Post.created_at.desc()).limit(5).all())
+    community_posts = recent_posts.latest(10)
+    if community_posts is None:
+        community_posts = (Post.query.options(joinedload(Post.author), defer(Post.content))
+                           .order_by(Post.created_at.desc(), Post.id).limit(10).all())
     
-    return render_template('dashboard.html', user=user, user_posts=user_posts, recent_posts=recent_posts)
+    return render_template('dashboard.html', user=user, user_posts=user_posts, recent_posts=community_posts)
 
 @app.route('/web/posts')
 def web_posts():
     page = request.args.get('page', 1, type=int)
-    posts = Post.query.order_by(Post.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
+    posts = Post.query.options(joinedload(Post.author), defer(Post.content)).order_by(Post.created_at.desc()).paginate(
+        page=page, per_page=WEB_POSTS_PER_PAGE, error_out=False
     )
     return render_template('posts.html', posts=posts)
 
 @app.route('/web/posts/<int:post_id>')
 def web_post_detail(post_id):
-    post = Post.query.get_or_404(post_id)
-    return render_template('post_detail.html', post=post)
+    post = post_cache.lookup_for_template(post_id)
+    if post is None:
+        abort(404)
+    view_counter.record(post_id)
+    return render_template('post_detail.html', post=post, view_count=post.view_count + 1)
 
 @app.route('/web/create-post')
 def web_create_post():
@@ -531,10 +2680,25 @@ def web_profile():
     if 'user_id' not in session:
         return redirect(url_for('web_login'))
     
-    user = User.query.get(session['user_id'])
-    user_posts = Post.query.filter_by(user_id=session['user_id']).order_by(Post.created_at.desc()).all()
+    user = current_user()
+    if not user:
+        session.clear()
+        return redirect(url_for('web_login'))
+    
+    page = request.args.get('page', 1, type=int)
+    
+    # One aggregate gives the statistics for every page, so the paginated
+    # query can skip its own COUNT
+    post_count, last_post_at = db.session.query(
+        db.func.count(Post.id), db.func.max(Post.created_at)
+    ).filter(Post.user_id == user.id).one()
+    
+    user_posts = Post.query.options(defer(Post.content)).filter_by(user_id=user.id).order_by(Post.created_at.desc()).paginate(
+        page=page, per_page=WEB_PROFILE_POSTS_PER_PAGE, error_out=False, count=False
+    )
+    user_posts.total = post_count
     
-    return render_template('profile.html', user=user, user_posts=user_posts)
+    return render_template('profile.html', user=user, user_posts=user_posts, last_post_at=last_post_at)
 @app.route('/favicon.ico')
 def favicon():
     return send_from_directory('public', 'favicon.ico')
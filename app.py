@@ -1,6 +1,10 @@
 from flask import Flask, request, jsonify, session
+from flask.sessions import SecureCookieSessionInterface
+from itsdangerous import URLSafeTimedSerializer
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import validates
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import secrets
@@ -23,7 +27,34 @@ app = Flask(__name__)
 # db = SQLAlchemy(app)
 # migrate = Migrate(app, db)
 # Configuration
-app.config['SECRET_KEY'] = secrets.token_hex(16)
+# Same keyring as api/index.py: SECRET_KEY signs, SECRET_KEY_FALLBACKS
+# (comma-separated, newest first) still verify
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
+app.config['SECRET_KEY_FALLBACKS'] = [
+    key.strip() for key in os.environ.get('SECRET_KEY_FALLBACKS', '').split(',') if key.strip()
+]
+if not app.config['SECRET_KEY']:
+    print("⚠️ SECRET_KEY is not set, using a random key: sessions will not survive restarts "
+          "or be accepted by other instances")
+    app.config['SECRET_KEY'] = secrets.token_hex(32)
+
+
+class KeyringSessionInterface(SecureCookieSessionInterface):
+    """Sign session cookies with SECRET_KEY, accept any key in SECRET_KEY_FALLBACKS"""
+
+    def get_signing_serializer(self, app):
+        if not app.secret_key:
+            return None
+        # itsdangerous signs with the last key and verifies against all of them
+        keys = [*reversed(app.config.get('SECRET_KEY_FALLBACKS') or []), app.secret_key]
+        return URLSafeTimedSerializer(
+            keys,
+            salt=self.salt,
+            serializer=self.serializer,
+            signer_kwargs={'key_derivation': self.key_derivation, 'digest_method': self.digest_method}
+        )
+
+app.session_interface = KeyringSessionInterface()
 
 # Use POSTGRES_URL if available, otherwise use individual variables
 postgres_url = os.getenv('POSTGRES_URL')
@@ -48,6 +79,9 @@ else:
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Characters of post content kept in posts.excerpt (keep in sync with api/index.py)
+EXCERPT_LENGTH = 200
+
 # Initialize extensions
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
@@ -61,9 +95,16 @@ class User(db.Model):
     email = db.Column(db.String(100), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Maintained by the follow endpoints in api/index.py
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # Usernames are unique regardless of case; also serves case-insensitive lookups
+    __table_args__ = (
+        db.Index('ix_users_username_lower', db.func.lower(username), unique=True),
+    )
     
     # Relationship
-    posts = db.relationship('Post', backref='author', lazy=True, cascade='all, delete-orphan')
+    posts = db.relationship('Post', backref='author', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
     
     def set_password(self, password):
         """Hash and set password"""
@@ -97,7 +138,26 @@ class Post(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Foreign key
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    # One character longer than EXCERPT_LENGTH so we can tell when content was cut
+    excerpt = db.Column(db.String(EXCERPT_LENGTH + 1))
+    # Counted and flushed in batches by api/index.py
+    view_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # False when followers pull the post instead of receiving timeline rows
+    fanned_out = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
+    
+    # Feed orderings; built CONCURRENTLY on Postgres by the migration
+    __table_args__ = (
+        db.Index('ix_posts_created_at_id', created_at.desc(), id),
+        db.Index('ix_posts_user_id_created_at', user_id, created_at.desc()),
+        db.Index('ix_posts_pulled_user_id_created_at', user_id, created_at.desc(),
+                 postgresql_where=db.text('NOT fanned_out'), sqlite_where=db.text('NOT fanned_out')),
+    )
+    
+    @validates('content')
+    def update_excerpt(self, key, content):
+        self.excerpt = content[:EXCERPT_LENGTH + 1] if content is not None else None
+        return content
     
     def to_dict(self, include_author=True):
         """Convert post to dictionary"""
@@ -107,7 +167,8 @@ class Post(db.Model):
             'content': self.content,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'user_id': self.user_id
+            'user_id': self.user_id,
+            'view_count': self.view_count or 0
         }
         if include_author and self.author:
             data['author'] = self.author.username
@@ -131,6 +192,17 @@ def require_auth():
         return jsonify({"error": "Authentication required"}), 401
     return None
 
+def duplicate_user_error(error):
+    """Map a unique-constraint violation on users to the matching 409 response"""
+    # Postgres names the violated index; SQLite only names the column(s)
+    diag = getattr(error.orig, 'diag', None)
+    detail = (getattr(diag, 'constraint_name', None) or str(error.orig)).lower()
+    if 'email' in detail:
+        return jsonify({"error": "Email already exists"}), 409
+    if 'username' in detail:
+        return jsonify({"error": "Username already exists"}), 409
+    return None
+
 # Root endpoint
 @app.route('/')
 def home():
@@ -177,22 +249,28 @@ def register():
         if '@' not in email:
             return jsonify({"error": "Invalid email format"}), 400
         
-        # Check if user already exists
-        if User.query.filter_by(username=username).first():
-            return jsonify({"error": "Username already exists"}), 409
-        if User.query.filter_by(email=email).first():
-            return jsonify({"error": "Email already exists"}), 409
-        
-        # Create new user
+        # Create user; the unique indexes on username/email do the duplicate check
+        # in the same INSERT, so there is no window between checking and writing
         user = User(username=username, email=email)
         user.set_password(password)
         
         db.session.add(user)
+        try:
+            db.session.flush()
+        except IntegrityError as e:
+            db.session.rollback()
+            duplicate = duplicate_user_error(e)
+            if duplicate:
+                return duplicate
+            raise
+        
+        # Serialize before commit expires the instance and forces a reload
+        user_data = user.to_dict()
         db.session.commit()
         
         return jsonify({
             "message": "User registered successfully",
-            "user": user.to_dict()
+            "user": user_data
         }), 201
         
     except Exception as e:
@@ -212,7 +290,7 @@ def login():
         password = data['password']
         
         # Find user
-        user = User.query.filter_by(username=username).first()
+        user = User.query.filter(db.func.lower(User.username) == username.lower()).first()
         
         if user and user.check_password(password):
             session['user_id'] = user.id
@@ -270,11 +348,6 @@ def update_profile():
             if '@' not in email:
                 return jsonify({"error": "Invalid email format"}), 400
             
-            # Check if email is already taken by another user
-            existing_user = User.query.filter_by(email=email).first()
-            if existing_user and existing_user.id != user.id:
-                return jsonify({"error": "Email already exists"}), 409
-            
             user.email = email
         
         if 'password' in data:
@@ -282,11 +355,21 @@ def update_profile():
                 return jsonify({"error": "Password must be at least 6 characters long"}), 400
             user.set_password(data['password'])
         
+        try:
+            db.session.flush()
+        except IntegrityError as e:
+            db.session.rollback()
+            duplicate = duplicate_user_error(e)
+            if duplicate:
+                return duplicate
+            raise
+        
+        user_data = user.to_dict()
         db.session.commit()
         
         return jsonify({
             "message": "Profile updated successfully",
-            "user": user.to_dict()
+            "user": user_data
         }), 200
         
     except Exception as e:
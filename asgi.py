@@ -0,0 +1,298 @@
+"""
+ASGI entry point with asyncio database access
+
+The read-heavy JSON routes (post listing, single post, search, user
+listing) run as async handlers on SQLAlchemy's asyncio engine, so a
+request waiting on the database does not pin a thread. Every other route
+is passed through to the Flask app in api/index.py unchanged.
+
+    pip install -r requirements-asgi.txt
+    uvicorn asgi:app --workers 4
+
+DATABASE_URL postgresql://... runs on asyncpg. sqlite:///path.db runs on
+aiosqlite as a local stand-in; use a file database, an in-memory one is
+not shared with the Flask app's engine.
+"""
+import contextlib
+import os
+from dotenv import load_dotenv
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select, func, or_
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import configure_mappers
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route, Mount
+
+load_dotenv()
+
+from api.index import (app as flask_app, db, Post, User, view_counter, post_cache, recent_posts, COUNT_MODES,
+                       estimate_row_count, pagination_info, cached_pagination, parse_ids, in_request_order, load_users,
+                       POST_FIELDS, USER_FIELDS, parse_fields, post_load_options, user_load_options)
+
+# Post.author is a backref; make it exist before the first select() uses it
+configure_mappers()
+
+# Connections per worker process; asyncpg connections are cheap to hold idle
+ASGI_DB_POOL_SIZE = int(os.environ.get('ASGI_DB_POOL_SIZE', 20))
+ASGI_DB_MAX_OVERFLOW = int(os.environ.get('ASGI_DB_MAX_OVERFLOW', 10))
+# Threads for the Flask routes served through the WSGI bridge
+ASGI_WSGI_WORKERS = int(os.environ.get('ASGI_WSGI_WORKERS', 10))
+
+
+def async_database_url(url):
+    """Swap the sync driver in a database URL for its asyncio counterpart"""
+    if url.startswith('postgresql://'):
+        return url.replace('postgresql://', 'postgresql+asyncpg://', 1)
+    if url.startswith('postgresql+psycopg2://'):
+        return url.replace('postgresql+psycopg2://', 'postgresql+asyncpg://', 1)
+    if url.startswith('sqlite://'):
+        return url.replace('sqlite://', 'sqlite+aiosqlite://', 1)
+    return url
+
+
+def create_engine_for(url):
+    """Async engine with settings matching the Flask app's engine"""
+    url = async_database_url(url)
+    if url.startswith('sqlite'):
+        return create_async_engine(url)
+    return create_async_engine(
+        url,
+        pool_size=ASGI_DB_POOL_SIZE,
+        max_overflow=ASGI_DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        connect_args={
+            'timeout': 10,
+            'server_settings': {'application_name': 'flask_vercel_app_asgi'}
+        }
+    )
+
+
+engine = create_engine_for(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+def int_arg(request, name, default):
+    """Integer query parameter, falling back like Flask's request.args.get(type=int)"""
+    try:
+        return int(request.query_params.get(name, default))
+    except ValueError:
+        return default
+
+
+def page_args(request):
+    page = int_arg(request, 'page', 1)
+    per_page = min(int_arg(request, 'per_page', 10), 50)
+    return max(page, 1), max(per_page, 1)
+
+
+def count_arg(request, endpoint):
+    """?count= or the endpoint's configured default; None if invalid"""
+    mode = request.query_params.get('count') or flask_app.config['PAGINATION_COUNT'][endpoint]
+    return mode if mode in COUNT_MODES else None
+
+
+def count_error():
+    return JSONResponse({"error": "count must be one of: exact, estimate, none"}, status_code=400)
+
+
+async def in_flask_context(function, *args):
+    """Run sync code that needs the Flask app (caches, db.session) on a worker thread"""
+    def call():
+        with flask_app.app_context():
+            try:
+                return function(*args)
+            finally:
+                db.session.remove()
+    return await run_in_threadpool(call)
+
+
+async def paginate(session, statement, page, per_page, mode='exact'):
+    """Run one page of a select() and count it like api.index.paginate_query"""
+    rows = (await session.execute(
+        statement.limit(per_page + 1).offset((page - 1) * per_page)
+    )).scalars().unique().all()
+    has_next = len(rows) > per_page
+    items = rows[:per_page]
+
+    total = None
+    if mode == 'estimate':
+        if not has_next and (items or page == 1):
+            total = (page - 1) * per_page + len(items)
+        else:
+            estimate = await session.run_sync(estimate_row_count, statement)
+            if estimate is None:
+                mode = 'exact'
+            else:
+                total = max(estimate, (page - 1) * per_page + len(items) + has_next)
+    if mode == 'exact':
+        total = await session.scalar(
+            select(func.count()).select_from(statement.order_by(None).subquery())
+        )
+    return items, pagination_info(page, per_page, total, has_next, mode)
+
+
+async def get_posts(request):
+    try:
+        summary = request.query_params.get('view') == 'summary'
+        try:
+            fields = parse_fields(request.query_params.get('fields'), POST_FIELDS)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        if 'ids' in request.query_params:
+            try:
+                ids = parse_ids(request.query_params.getlist('ids'))
+            except ValueError as e:
+                return JSONResponse({"error": str(e)}, status_code=400)
+            # Shares the Flask app's post cache
+            found = await in_flask_context(post_cache.lookup_many, ids, summary, fields)
+            posts, missing = in_request_order(ids, found)
+            return JSONResponse({"posts": posts, "missing": missing})
+
+        page, per_page = page_args(request)
+        mode = count_arg(request, 'get_posts')
+        if mode is None:
+            return count_error()
+
+        # First pages come from the Flask app's newest-posts cache
+        cached = await in_flask_context(recent_posts.page, page, per_page, summary, fields)
+        if cached is not None:
+            items, total = cached
+            return JSONResponse({"posts": items, "pagination": cached_pagination(page, per_page, total, mode)})
+
+        # Deeper pages
+        statement = select(Post).options(*post_load_options(fields, summary)).order_by(Post.created_at.desc(), Post.id)
+
+        async with Session() as session:
+            posts, pagination = await paginate(session, statement, page, per_page, mode)
+
+        return JSONResponse({
+            "posts": [post.to_dict(summary=summary, fields=fields) for post in posts],
+            "pagination": pagination
+        })
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def search_posts(request):
+    try:
+        query = request.query_params.get('q', '').strip()
+        page, per_page = page_args(request)
+        summary = request.query_params.get('view') == 'summary'
+
+        if not query:
+            return JSONResponse({"error": "Search query is required"}, status_code=400)
+        try:
+            fields = parse_fields(request.query_params.get('fields'), POST_FIELDS)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        mode = count_arg(request, 'search_posts')
+        if mode is None:
+            return count_error()
+
+        statement = select(Post).options(*post_load_options(fields, summary)).filter(
+            or_(
+                Post.title.ilike(f'%{query}%'),
+                Post.content.ilike(f'%{query}%')
+            )
+        ).order_by(Post.created_at.desc())
+
+        async with Session() as session:
+            posts, pagination = await paginate(session, statement, page, per_page, mode)
+
+        return JSONResponse({
+            "query": query,
+            "posts": [post.to_dict(summary=summary, fields=fields) for post in posts],
+            "pagination": pagination
+        })
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def get_post(request):
+    try:
+        try:
+            fields = parse_fields(request.query_params.get('fields'), POST_FIELDS)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+        post_id = request.path_params['post_id']
+        # The Flask app's post cache: concurrent misses share one load and
+        # expired entries are served while one refresh runs
+        post = await in_flask_context(post_cache.lookup, post_id, fields)
+        if post is None:
+            return JSONResponse({"error": "Post not found"}, status_code=404)
+        # May flush the batch with the sync engine; keep that off the event loop
+        await run_in_threadpool(view_counter.record, post_id)
+        if 'view_count' in post:
+            post['view_count'] += 1
+        return JSONResponse({"post": post})
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def get_users(request):
+    try:
+        try:
+            fields = parse_fields(request.query_params.get('fields'), USER_FIELDS)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        if 'ids' in request.query_params:
+            try:
+                ids = parse_ids(request.query_params.getlist('ids'))
+            except ValueError as e:
+                return JSONResponse({"error": str(e)}, status_code=400)
+            users, missing = in_request_order(ids, await in_flask_context(load_users, ids))
+            return JSONResponse({
+                "users": [user.to_dict(include_email=False, fields=fields) for user in users],
+                "missing": missing
+            })
+
+        page, per_page = page_args(request)
+        mode = count_arg(request, 'get_users')
+        if mode is None:
+            return count_error()
+
+        async with Session() as session:
+            statement = select(User).options(*user_load_options(fields)).order_by(User.id)
+            users, pagination = await paginate(session, statement, page, per_page, mode)
+
+        return JSONResponse({
+            "users": [user.to_dict(include_email=False, fields=fields) for user in users],
+            "pagination": pagination
+        })
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/posts', get_posts, methods=['GET']),
+        Route('/api/posts/search', search_posts, methods=['GET']),
+        Route('/api/posts/{post_id:int}', get_post, methods=['GET']),
+        Route('/api/users', get_users, methods=['GET']),
+        # Writes, auth, HTML pages and everything else
+        Mount('/', WSGIMiddleware(flask_app, workers=ASGI_WSGI_WORKERS)),
+    ],
+    # gzip for the async routes; Flask responses arrive already compressed
+    # (Content-Encoding set) and are passed through
+    middleware=[
+        Middleware(GZipMiddleware, minimum_size=flask_app.config['COMPRESSION_MIN_BYTES'],
+                   compresslevel=flask_app.config['COMPRESSION_LEVEL'])
+    ] if flask_app.config['COMPRESSION_ENABLED'] else [],
+    lifespan=lifespan
+)
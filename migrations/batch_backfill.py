@@ -0,0 +1,239 @@
+"""
+Resumable, throttled backfills over whole tables
+
+    from batch_backfill import Backfill
+
+    job = Backfill('post_excerpts', 'posts', "excerpt = substr(content, 1, 201)", where="excerpt IS NULL")
+    job.run(engine, workers=4, rows_per_second=5000, max_lag_seconds=5)
+
+The first run records the table's primary-key range and splits it into one
+slice per worker. Each worker updates its slice one batch of keys at a time.
+A batch commits in the same transaction as its checkpoint row in
+backfill_progress. After an interruption (Ctrl-C, crash, deploy), running the
+job again under the same name continues after the last committed batch. Rows
+inserted after the first run fall outside the range; the app writes those
+complete.
+
+Two optional throttles:
+- rows_per_second caps the combined rate of all workers.
+- max_lag_seconds pauses every worker while a streaming replica is further
+  behind than that (PostgreSQL primary, pg_stat_replication).
+
+Progress, rate and ETA are printed every report_seconds.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+# Not an app model: created on first use and left out of autogenerate (env.py)
+progress = sa.Table(
+    'backfill_progress', metadata,
+    sa.Column('name', sa.String(100), primary_key=True),
+    sa.Column('slice', sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column('table_name', sa.String(100), nullable=False),
+    sa.Column('start_key', sa.BigInteger, nullable=False),
+    sa.Column('end_key', sa.BigInteger, nullable=False),
+    # First key of the slice not yet done; past end_key once finished
+    sa.Column('next_key', sa.BigInteger, nullable=False),
+    sa.Column('rows_updated', sa.BigInteger, nullable=False, default=0),
+    sa.Column('updated_at', sa.DateTime, nullable=True),
+    sa.Column('finished_at', sa.DateTime, nullable=True),
+)
+
+
+def replication_lag(conn):
+    """Seconds the furthest streaming replica is behind, 0 without replicas"""
+    return conn.execute(sa.text(
+        "SELECT COALESCE(EXTRACT(EPOCH FROM max(replay_lag)), 0) FROM pg_stat_replication"
+    )).scalar()
+
+
+def status(engine):
+    """Progress of every backfill that has run: name -> summary dict"""
+    jobs = {}
+    with engine.connect() as conn:
+        if not sa.inspect(conn).has_table(progress.name):
+            return jobs
+        for row in conn.execute(sa.select(progress).order_by(progress.c.name, progress.c.slice)):
+            job = jobs.setdefault(row.name, {'table': row.table_name, 'keys': 0, 'keys_done': 0,
+                                             'rows_updated': 0, 'slices': 0, 'finished': True,
+                                             'updated_at': None})
+            job['keys'] += row.end_key - row.start_key + 1
+            job['keys_done'] += min(row.next_key, row.end_key + 1) - row.start_key
+            job['rows_updated'] += row.rows_updated
+            job['slices'] += 1
+            job['finished'] = job['finished'] and row.finished_at is not None
+            if row.updated_at and (job['updated_at'] is None or row.updated_at > job['updated_at']):
+                job['updated_at'] = row.updated_at
+    return jobs
+
+
+class RateLimiter:
+    """Paces all workers together to at most rate rows per second"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
+
+    def wait(self, rows, stop):
+        if not self.rate or not rows:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.next_at = max(self.next_at, now) + rows / self.rate
+            delay = self.next_at - now
+        stop.wait(delay)
+
+
+class Backfill:
+    """UPDATE table SET assignments over the whole table in checkpointed key batches"""
+
+    def __init__(self, name, table, assignments, where=None, key='id', batch_size=1000):
+        self.name = name
+        self.table = table
+        self.key = key
+        self.batch_size = batch_size
+        condition = f" AND ({where})" if where else ""
+        self.statement = sa.text(
+            f"UPDATE {table} SET {assignments} WHERE {key} BETWEEN :low AND :high{condition}"
+        )
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+    def slices(self, conn):
+        return conn.execute(
+            sa.select(progress).where(progress.c.name == self.name).order_by(progress.c.slice)
+        ).all()
+
+    def plan(self, engine, workers):
+        """The job's slices, splitting the current key range on the first run"""
+        metadata.create_all(engine)
+        with engine.begin() as conn:
+            existing = self.slices(conn)
+            if existing:
+                return existing
+            low, high = conn.execute(sa.text(f"SELECT min({self.key}), max({self.key}) FROM {self.table}")).one()
+            if low is None:
+                return []
+            size = -(-(high - low + 1) // workers)
+            conn.execute(progress.insert(), [
+                {'name': self.name, 'slice': i, 'table_name': self.table, 'start_key': start,
+                 'end_key': min(start + size - 1, high), 'next_key': start, 'rows_updated': 0}
+                for i, start in enumerate(range(low, high + 1, size))
+            ])
+            return self.slices(conn)
+
+    def reset(self, engine):
+        """Forget the checkpoints so the next run starts over"""
+        metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(progress.delete().where(progress.c.name == self.name))
+
+    def wait_for_replicas(self, conn, max_lag_seconds):
+        paused = False
+        while not self.stop.is_set():
+            lag = replication_lag(conn)
+            conn.commit()
+            if lag <= max_lag_seconds:
+                break
+            if not paused:
+                print(f"⏸️ {self.name}: replica lag {lag:.1f}s > {max_lag_seconds}s, pausing")
+                paused = True
+            self.stop.wait(1)
+        if paused:
+            print(f"▶️ {self.name}: replica caught up, resuming")
+
+    def run_slice(self, engine, row, limiter, max_lag_seconds):
+        next_key = row.next_key
+        with engine.connect() as conn:
+            while next_key <= row.end_key and not self.stop.is_set():
+                if max_lag_seconds is not None:
+                    self.wait_for_replicas(conn, max_lag_seconds)
+                high = min(next_key + self.batch_size - 1, row.end_key)
+                now = datetime.utcnow()
+                with conn.begin():
+                    updated = conn.execute(self.statement, {'low': next_key, 'high': high}).rowcount
+                    conn.execute(progress.update().where(
+                        progress.c.name == self.name, progress.c.slice == row.slice
+                    ).values(next_key=high + 1, rows_updated=progress.c.rows_updated + updated,
+                             updated_at=now, finished_at=now if high == row.end_key else None))
+                with self.lock:
+                    self.keys_done += high - next_key + 1
+                    self.rows_updated += updated
+                next_key = high + 1
+                limiter.wait(updated, self.stop)
+
+    def report(self, total_keys, started_keys, started_rows, started_at):
+        with self.lock:
+            keys_done, rows_updated = self.keys_done, self.rows_updated
+        elapsed = time.monotonic() - started_at
+        # Rates count this run only; earlier runs' work is in the totals
+        keys_rate = (keys_done - started_keys) / elapsed if elapsed else 0
+        rows_rate = (rows_updated - started_rows) / elapsed if elapsed else 0
+        eta = timedelta(seconds=int((total_keys - keys_done) / keys_rate)) if keys_rate else 'unknown'
+        print(f"⏳ {self.name}: {100 * keys_done / total_keys:5.1f}% ({keys_done:,}/{total_keys:,} keys), "
+              f"{rows_updated:,} rows updated, {rows_rate:,.0f} rows/s, ETA {eta}")
+
+    def run(self, engine, workers=1, rows_per_second=None, max_lag_seconds=None, report_seconds=10):
+        """Run or resume the backfill; True once every slice is finished, False if stopped"""
+        if engine.dialect.name != 'postgresql':
+            # One writer at a time on SQLite, and no replicas to watch
+            workers, max_lag_seconds = 1, None
+
+        slices = self.plan(engine, workers)
+        pending = [row for row in slices if row.next_key <= row.end_key]
+        total_keys = sum(row.end_key - row.start_key + 1 for row in slices)
+        self.keys_done = total_keys - sum(row.end_key - row.next_key + 1 for row in pending)
+        self.rows_updated = sum(row.rows_updated for row in slices)
+        if not pending:
+            print(f"✅ {self.name}: nothing to do ({self.rows_updated:,} rows updated in earlier runs)")
+            return True
+        if len(slices) != workers:
+            print(f"ℹ️ {self.name}: resuming with the {len(slices)} slice(s) planned on the first run")
+        print(f"🚀 {self.name}: {len(pending)} slice(s), batches of {self.batch_size:,} keys"
+              + (f", at most {rows_per_second:,} rows/s" if rows_per_second else "")
+              + (f", pausing while replica lag > {max_lag_seconds}s" if max_lag_seconds is not None else ""))
+
+        self.stop.clear()
+        limiter = RateLimiter(rows_per_second)
+        errors = []
+
+        def work(row):
+            try:
+                self.run_slice(engine, row, limiter, max_lag_seconds)
+            except Exception as e:
+                errors.append(e)
+                self.stop.set()
+
+        threads = [threading.Thread(target=work, args=(row,), name=f'backfill-{self.name}-{row.slice}')
+                   for row in pending]
+        started_keys, started_rows, started_at = self.keys_done, self.rows_updated, time.monotonic()
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=report_seconds)
+                    if thread.is_alive():
+                        break
+                self.report(total_keys, started_keys, started_rows, started_at)
+        except KeyboardInterrupt:
+            print(f"\n🛑 {self.name}: stopping after the current batches...")
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+
+        finished = self.keys_done == total_keys
+        if finished:
+            print(f"✅ {self.name}: done, {self.rows_updated - started_rows:,} rows updated "
+                  f"in {time.monotonic() - started_at:.1f}s ({self.rows_updated:,} in all runs)")
+        else:
+            print(f"⏹️ {self.name}: stopped at {100 * self.keys_done / total_keys:.1f}%; run again to resume")
+        return finished
@@ -1,4 +1,6 @@
 import logging
+import os
+import sys
 from logging.config import fileConfig
 
 from flask import current_app
@@ -14,6 +16,11 @@ config = context.config
 fileConfig(config.config_file_name)
 logger = logging.getLogger('alembic.env')
 
+# Revisions import their helpers with `from online_migrations import ...`
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from batch_backfill import progress  # noqa: E402
+from online_migrations import set_timeouts  # noqa: E402
+
 
 def get_engine():
     try:
@@ -93,10 +100,20 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    # A failure rolls back only its own revision, and locks taken by one
+    # revision are released before the next starts
+    conf_args.setdefault("transaction_per_migration", True)
+    # Backfill checkpoints are tooling state, not part of the app schema
+    conf_args.setdefault("include_name", lambda name, type_, parent_names:
+                         not (type_ == "table" and name == progress.name))
 
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # lock_timeout/statement_timeout for every statement that follows
+        set_timeouts(connection)
+        connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -0,0 +1,211 @@
+"""
+Helpers for migrations that must not block a busy database
+
+    from online_migrations import add_column, create_index_concurrently
+
+env.py puts this directory on sys.path and runs each revision in its own
+transaction. Every helper is idempotent, so a migration that stopped halfway
+can simply be run again. On PostgreSQL:
+
+- env.py sets lock_timeout and statement_timeout on the migration connection.
+  An ALTER waiting behind a long transaction gives up after the lock timeout
+  instead of stalling every query queued behind it; with_lock_retry() then
+  tries it again after a pause.
+- create_index_concurrently() and drop_index_concurrently() run outside the
+  migration transaction, with no statement timeout, and clean up the invalid
+  index a failed concurrent build leaves behind.
+- add_column(..., backfill=...) adds the column as nullable, fills it with a
+  checkpointed batch_backfill.Backfill, and only then sets NOT NULL.
+  The NOT NULL is proven by a CHECK constraint that is validated without
+  blocking writes.
+
+Other databases get the plain operation.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.exc import DBAPIError
+
+from batch_backfill import Backfill
+
+# Limits for the migration connection; 0 disables a timeout
+LOCK_TIMEOUT_MS = int(os.environ.get('MIGRATION_LOCK_TIMEOUT_MS', 5000))
+STATEMENT_TIMEOUT_MS = int(os.environ.get('MIGRATION_STATEMENT_TIMEOUT_MS', 60000))
+LOCK_RETRIES = int(os.environ.get('MIGRATION_LOCK_RETRIES', 5))
+BACKFILL_BATCH_SIZE = int(os.environ.get('MIGRATION_BACKFILL_BATCH_SIZE', 5000))
+
+# SQLSTATE raised when lock_timeout expires
+LOCK_NOT_AVAILABLE = '55P03'
+
+
+def set_timeouts(connection):
+    """Session-level lock and statement timeouts for a migration connection"""
+    if connection.dialect.name != 'postgresql':
+        return
+    connection.execute(sa.text(f"SET lock_timeout = {LOCK_TIMEOUT_MS}"))
+    connection.execute(sa.text(f"SET statement_timeout = {STATEMENT_TIMEOUT_MS}"))
+
+
+@contextmanager
+def no_statement_timeout():
+    """Lift the statement timeout for a long but non-blocking statement"""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        yield
+        return
+    bind.execute(sa.text("SET statement_timeout = 0"))
+    try:
+        yield
+    finally:
+        bind.execute(sa.text(f"SET statement_timeout = {STATEMENT_TIMEOUT_MS}"))
+
+
+def is_lock_timeout(error):
+    return getattr(getattr(error, 'orig', None), 'pgcode', None) == LOCK_NOT_AVAILABLE
+
+
+def in_autocommit(bind):
+    return bind.get_execution_options().get('isolation_level') == 'AUTOCOMMIT'
+
+
+def with_lock_retry(operation, *args, retries=None, **kwargs):
+    """Call operation, retrying with backoff when it times out waiting for a lock.
+    Inside the migration transaction each attempt runs in a savepoint, so a
+    timed-out attempt does not abort the whole revision."""
+    retries = LOCK_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        bind = op.get_bind()
+        savepoint = None
+        if bind.dialect.name == 'postgresql' and not in_autocommit(bind):
+            savepoint = bind.begin_nested()
+        try:
+            result = operation(*args, **kwargs)
+        except DBAPIError as e:
+            if savepoint is not None:
+                savepoint.rollback()
+            if not is_lock_timeout(e) or attempt == retries:
+                raise
+            delay = min(0.5 * 2 ** attempt, 30)
+            print(f"⏳ Lock not available, retry {attempt + 1}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+        else:
+            if savepoint is not None:
+                savepoint.commit()
+            return result
+
+
+def index_state(name):
+    """None if the index is missing, else whether it is valid (PostgreSQL)"""
+    return op.get_bind().execute(
+        sa.text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {'name': name}
+    ).scalar()
+
+
+def create_index_concurrently(name, table, columns, **kwargs):
+    """CREATE INDEX CONCURRENTLY on PostgreSQL: the table stays writable while it builds"""
+    if op.get_bind().dialect.name != 'postgresql':
+        op.create_index(name, table, columns, if_not_exists=True, **kwargs)
+        return
+
+    with op.get_context().autocommit_block(), no_statement_timeout():
+        valid = index_state(name)
+        if valid:
+            return
+        if valid is False:
+            # Left behind by a concurrent build that failed or was cancelled
+            print(f"🧹 Dropping invalid index {name} before rebuilding it")
+            with_lock_retry(op.drop_index, name, table_name=table, postgresql_concurrently=True)
+        with_lock_retry(op.create_index, name, table, columns, postgresql_concurrently=True, **kwargs)
+
+
+def drop_index_concurrently(name, table):
+    if op.get_bind().dialect.name != 'postgresql':
+        op.drop_index(name, table_name=table, if_exists=True)
+        return
+
+    with op.get_context().autocommit_block(), no_statement_timeout():
+        if index_state(name) is not None:
+            with_lock_retry(op.drop_index, name, table_name=table, postgresql_concurrently=True)
+
+
+def add_column(table, column, backfill=None, batch_size=BACKFILL_BATCH_SIZE):
+    """Add column unless it exists. With backfill, a SQL expression over the
+    row, the column is added nullable, filled in batches, then made NOT NULL
+    if column says so."""
+    existing = {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+    if backfill is None:
+        if column.name not in existing:
+            with_lock_retry(op.add_column, table, column)
+        return
+
+    added = column.name not in existing
+    if added:
+        with_lock_retry(op.add_column, table, sa.Column(column.name, column.type, nullable=True))
+    # A fresh column (e.g. after a downgrade) must not resume an old run's checkpoints
+    backfill_column(table, column.name, backfill, batch_size, restart=added)
+    if not column.nullable:
+        set_not_null(table, column.name)
+
+
+def backfill_column(table, column, expression, batch_size=BACKFILL_BATCH_SIZE, key='id', restart=False):
+    """SET column = expression where it is still NULL. On PostgreSQL each
+    primary-key batch commits on its own, so row locks are held briefly and
+    an interrupted upgrade resumes from the last checkpoint unless restart."""
+    update_in_batches(f'migration_{table}_{column}', table, f"{column} = {expression}", f"{column} IS NULL",
+                      batch_size, key=key, restart=restart)
+
+
+def update_in_batches(name, table, assignments, where, batch_size=BACKFILL_BATCH_SIZE, key='id', restart=False):
+    """UPDATE table SET assignments WHERE where. On PostgreSQL it runs as the
+    checkpointed batch_backfill.Backfill called name, resuming unless restart."""
+    if op.get_bind().dialect.name != 'postgresql':
+        op.execute(f"UPDATE {table} SET {assignments} WHERE {where}")
+        return
+
+    job = Backfill(name, table, assignments, where=where, key=key, batch_size=batch_size)
+    with op.get_context().autocommit_block():
+        # Batches commit on the backfill's own connections; hold nothing here
+        engine = op.get_bind().engine
+        if restart:
+            job.reset(engine)
+        job.run(engine)
+
+
+def add_check_constraint(table, name, condition):
+    """ADD CONSTRAINT ... NOT VALID, then VALIDATE in a separate transaction.
+    Only the brief ADD takes an exclusive lock; the full-table check runs
+    under a lock that lets reads and writes continue."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        exists = op.get_bind().execute(sa.text(
+            "SELECT 1 FROM pg_constraint WHERE conname = :name AND conrelid = to_regclass(:table)"
+        ), {'name': name, 'table': table}).scalar()
+        if not exists:
+            with_lock_retry(op.execute, f"ALTER TABLE {table} ADD CONSTRAINT {name} CHECK ({condition}) NOT VALID")
+        with no_statement_timeout():
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+
+
+def set_not_null(table, column):
+    """SET NOT NULL without scanning the table under an exclusive lock"""
+    bind = op.get_bind()
+    nullable = {c['name']: c['nullable'] for c in sa.inspect(bind).get_columns(table)}[column]
+    if not nullable:
+        return
+    if bind.dialect.name != 'postgresql':
+        # SQLite can only change nullability by rebuilding the table
+        print(f"⚠️ Leaving {table}.{column} nullable on this database")
+        return
+
+    constraint = f"{table}_{column}_not_null"
+    add_check_constraint(table, constraint, f"{column} IS NOT NULL")
+    with op.get_context().autocommit_block():
+        # PostgreSQL 12+ trusts the validated CHECK instead of scanning again
+        with_lock_retry(op.alter_column, table, column, nullable=False)
+        with_lock_retry(op.drop_constraint, constraint, table, type_='check')
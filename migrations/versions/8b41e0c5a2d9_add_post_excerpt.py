@@ -0,0 +1,30 @@
+"""Add posts.excerpt for list views
+
+Revision ID: 8b41e0c5a2d9
+Revises: 3f2a9c1d7e4b
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from online_migrations import add_column
+
+
+# revision identifiers, used by Alembic.
+revision = '8b41e0c5a2d9'
+down_revision = '3f2a9c1d7e4b'
+branch_labels = None
+depends_on = None
+
+# EXCERPT_LENGTH + 1 in api/index.py
+EXCERPT_COLUMN_LENGTH = 201
+
+
+def upgrade():
+    # Filled in committed batches rather than one UPDATE locking every post
+    add_column('posts', sa.Column('excerpt', sa.String(length=EXCERPT_COLUMN_LENGTH), nullable=True),
+               backfill=f"substr(content, 1, {EXCERPT_COLUMN_LENGTH})")
+
+
+def downgrade():
+    op.drop_column('posts', 'excerpt')
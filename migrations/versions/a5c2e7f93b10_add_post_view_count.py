@@ -0,0 +1,28 @@
+"""Add posts.view_count
+
+Revision ID: a5c2e7f93b10
+Revises: e1a6b8d4c092
+Create Date: 2026-10-19 12:00:00.000000
+
+The server default fills existing rows: a metadata-only change on
+Postgres 11+, no table rewrite.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from online_migrations import add_column
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5c2e7f93b10'
+down_revision = 'e1a6b8d4c092'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_column('posts', sa.Column('view_count', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('posts', 'view_count')
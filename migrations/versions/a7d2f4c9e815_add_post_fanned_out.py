@@ -0,0 +1,44 @@
+"""Add posts.fanned_out so timelines keep pulling posts that were never fanned out
+
+Revision ID: a7d2f4c9e815
+Revises: f3c1a8e5d270
+Create Date: 2026-10-19 20:00:00.000000
+
+Timelines used to pull only from authors over TIMELINE_FANOUT_MAX_FOLLOWERS
+at read time, so an author who dropped back under it lost the posts written
+in between. Existing posts of authors over the threshold now were pulled
+rather than fanned out; older pull-only posts of authors who have since
+dropped back under cannot be told apart and stay missing.
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+from online_migrations import add_column, create_index_concurrently, drop_index_concurrently, update_in_batches
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d2f4c9e815'
+down_revision = 'f3c1a8e5d270'
+branch_labels = None
+depends_on = None
+
+# TIMELINE_FANOUT_MAX_FOLLOWERS in api/index.py
+FANOUT_MAX_FOLLOWERS = int(os.environ.get('TIMELINE_FANOUT_MAX_FOLLOWERS', 10000))
+
+
+def upgrade():
+    # The server default fills existing rows without a rewrite on Postgres 11+
+    add_column('posts', sa.Column('fanned_out', sa.Boolean(), nullable=False, server_default=sa.true()))
+    # Idempotent, so a rerun may start over rather than trust old checkpoints
+    update_in_batches('migration_posts_fanned_out', 'posts', "fanned_out = false",
+                      f"fanned_out AND user_id IN (SELECT id FROM users WHERE follower_count >= {FANOUT_MAX_FOLLOWERS})",
+                      restart=True)
+    create_index_concurrently('ix_posts_pulled_user_id_created_at', 'posts', ['user_id', sa.text('created_at DESC')],
+                              postgresql_where=sa.text('NOT fanned_out'), sqlite_where=sa.text('NOT fanned_out'))
+
+
+def downgrade():
+    drop_index_concurrently('ix_posts_pulled_user_id_created_at', 'posts')
+    op.drop_column('posts', 'fanned_out')
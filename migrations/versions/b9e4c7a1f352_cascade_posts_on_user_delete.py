@@ -0,0 +1,64 @@
+"""Delete posts with their user (ON DELETE CASCADE on posts.user_id)
+
+Revision ID: b9e4c7a1f352
+Revises: d4f81b6a2c35
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from online_migrations import no_statement_timeout, with_lock_retry
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e4c7a1f352'
+down_revision = 'd4f81b6a2c35'
+branch_labels = None
+depends_on = None
+
+CONSTRAINT = 'posts_user_id_fkey'
+
+
+def user_foreign_key(bind):
+    """The reflected posts.user_id -> users.id foreign key, if any"""
+    for fk in sa.inspect(bind).get_foreign_keys('posts'):
+        if fk['constrained_columns'] == ['user_id'] and fk['referred_table'] == 'users':
+            return fk
+    return None
+
+
+def replace_foreign_key(ondelete):
+    bind = op.get_bind()
+    fk = user_foreign_key(bind)
+    current = ((fk or {}).get('options') or {}).get('ondelete')
+    if fk and (current or '').upper() == (ondelete or '').upper():
+        return
+
+    if bind.dialect.name != 'postgresql':
+        # SQLite can only change a foreign key by rebuilding the table, which
+        # would cascade into timeline_entries. Without it account deletion
+        # still works: posts are deleted explicitly before the user row.
+        print("⚠️ Skipping posts.user_id ON DELETE change on this database; "
+              "recreate a local database to pick it up")
+        return
+
+    # NOT VALID skips the full-table check while holding the ALTER's lock;
+    # VALIDATE then scans posts in its own transaction without blocking writes
+    drop = f"DROP CONSTRAINT {fk['name']}, " if fk else ""
+    on_delete = f" ON DELETE {ondelete}" if ondelete else ""
+    with op.get_context().autocommit_block():
+        with_lock_retry(
+            op.execute,
+            f"ALTER TABLE posts {drop}ADD CONSTRAINT {CONSTRAINT} "
+            f"FOREIGN KEY (user_id) REFERENCES users (id){on_delete} NOT VALID"
+        )
+        with no_statement_timeout():
+            op.execute(f"ALTER TABLE posts VALIDATE CONSTRAINT {CONSTRAINT}")
+
+
+def upgrade():
+    replace_foreign_key('CASCADE')
+
+
+def downgrade():
+    replace_foreign_key(None)
@@ -0,0 +1,33 @@
+"""Add ordering indexes for the post feeds
+
+Revision ID: c7d93a6f1b28
+Revises: 8b41e0c5a2d9
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+import sqlalchemy as sa
+from online_migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d93a6f1b28'
+down_revision = '8b41e0c5a2d9'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    # Post.query.order_by(Post.created_at.desc())
+    ('ix_posts_created_at_id', [sa.text('created_at DESC'), 'id']),
+    # Post.query.filter_by(user_id=...).order_by(Post.created_at.desc())
+    ('ix_posts_user_id_created_at', ['user_id', sa.text('created_at DESC')]),
+]
+
+
+def upgrade():
+    for name, columns in INDEXES:
+        create_index_concurrently(name, 'posts', columns)
+
+
+def downgrade():
+    for name, _ in INDEXES:
+        drop_index_concurrently(name, 'posts')
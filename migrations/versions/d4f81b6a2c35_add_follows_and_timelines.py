@@ -0,0 +1,57 @@
+"""Add follows, timeline_entries and users.follower_count
+
+Revision ID: d4f81b6a2c35
+Revises: a5c2e7f93b10
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from online_migrations import add_column
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f81b6a2c35'
+down_revision = 'a5c2e7f93b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = inspector.get_table_names()
+
+    add_column('users', sa.Column('follower_count', sa.Integer(), nullable=False, server_default='0'))
+
+    if 'follows' not in existing:
+        op.create_table('follows',
+            sa.Column('follower_id', sa.Integer(), nullable=False),
+            sa.Column('followed_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['follower_id'], ['users.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['followed_id'], ['users.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('follower_id', 'followed_id')
+        )
+        op.create_index('ix_follows_followed_id_follower_id', 'follows', ['followed_id', 'follower_id'])
+
+    if 'timeline_entries' not in existing:
+        op.create_table('timeline_entries',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('post_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('user_id', 'post_id')
+        )
+        op.create_index('ix_timeline_entries_user_id_created_at', 'timeline_entries',
+                        ['user_id', sa.text('created_at DESC'), sa.text('post_id DESC')])
+        op.create_index('ix_timeline_entries_post_id', 'timeline_entries', ['post_id'])
+
+
+def downgrade():
+    op.drop_index('ix_timeline_entries_post_id', table_name='timeline_entries', if_exists=True)
+    op.drop_index('ix_timeline_entries_user_id_created_at', table_name='timeline_entries')
+    op.drop_table('timeline_entries')
+    op.drop_index('ix_follows_followed_id_follower_id', table_name='follows')
+    op.drop_table('follows')
+    op.drop_column('users', 'follower_count')
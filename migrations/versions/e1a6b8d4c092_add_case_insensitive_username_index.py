@@ -0,0 +1,27 @@
+"""Add case-insensitive unique index on users.username
+
+Revision ID: e1a6b8d4c092
+Revises: c7d93a6f1b28
+Create Date: 2026-10-19 10:30:00.000000
+
+Fails if existing usernames differ only by case; rename those accounts
+before upgrading.
+
+"""
+import sqlalchemy as sa
+from online_migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a6b8d4c092'
+down_revision = 'c7d93a6f1b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_index_concurrently('ix_users_username_lower', 'users', [sa.text('lower(username)')], unique=True)
+
+
+def downgrade():
+    drop_index_concurrently('ix_users_username_lower', 'users')
@@ -0,0 +1,26 @@
+"""Index timeline_entries.post_id for ON DELETE CASCADE from posts
+
+Revision ID: f3c1a8e5d270
+Revises: b9e4c7a1f352
+Create Date: 2026-10-19 18:00:00.000000
+
+Databases created at d4f81b6a2c35 before the index was added there lack it;
+without it every deleted post scans the whole fan-out table.
+
+"""
+from online_migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c1a8e5d270'
+down_revision = 'b9e4c7a1f352'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_index_concurrently('ix_timeline_entries_post_id', 'timeline_entries', ['post_id'])
+
+
+def downgrade():
+    drop_index_concurrently('ix_timeline_entries_post_id', 'timeline_entries')
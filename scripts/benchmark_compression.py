@@ -0,0 +1,130 @@
+"""
+Benchmark response compression: CPU cost vs bytes saved
+Usage: python scripts/benchmark_compression.py [posts] [--repeat 50]
+
+Seeds a scratch SQLite database (snapshotted, so later runs with the same
+post count skip seeding), renders the heaviest responses
+(/api/posts and search with full content, /web/posts HTML) and compresses
+each body with every encoding and level the middleware can use, then
+times whole requests through the app with and without Accept-Encoding.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+# Never touch the configured database
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'benchmark_compression.db')}"
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_POSTS = 500
+PAGES = {
+    'posts JSON': '/api/posts?per_page=50',
+    'search JSON': '/api/posts/search?q=lorem&per_page=50',
+    'posts HTML': '/web/posts',
+}
+
+
+def seed(app, db, User, Post, count):
+    """Users and posts with realistic, partly repetitive text"""
+    words = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+             'tempor incididunt ut labore et dolore magna aliqua').split()
+    with app.app_context():
+        users = []
+        for i in range(20):
+            user = User(username=f'bench_{i}', email=f'bench_{i}@example.com')
+            user.set_password('password123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.flush()
+        for i in range(count):
+            content = ' '.join(words[(i * 7 + j) % len(words)] for j in range(150 + i % 300))
+            db.session.add(Post(title=f'Post {i} {words[i % len(words)]}', content=content,
+                                user_id=users[i % len(users)].id))
+        db.session.commit()
+
+
+def compressors():
+    """(label, encoding, factory) for every encoding and level worth comparing"""
+    from api.index import brotli
+
+    options = []
+    for level in (1, 6, 9):
+        options.append((f'gzip -{level}', 'gzip',
+                        lambda level=level: zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)))
+    options.append(('deflate -6', 'deflate', lambda: zlib.compressobj(6)))
+    if brotli:
+        for quality in (1, 4, 11):
+            options.append((f'br q{quality}', 'br',
+                            lambda quality=quality: brotli.Compressor(quality=quality)))
+    return options
+
+
+def compress(factory, body):
+    compressor = factory()
+    if hasattr(compressor, 'process'):
+        return compressor.process(body) + compressor.finish()
+    return compressor.compress(body) + compressor.flush()
+
+
+def benchmark_compression(posts=DEFAULT_POSTS, repeat=50):
+    """Compare compression settings on the app's own responses"""
+    try:
+        # Import after setting up the path and database
+        from api.index import app, db, User, Post
+        from snapshots import SnapshotStore
+
+        print("📊 Response Compression Benchmark")
+        print("=" * 50)
+        start = time.perf_counter()
+        restored = SnapshotStore(app, db).load(f'posts_{posts}', lambda: seed(app, db, User, Post, posts))
+        action = "Restored snapshot of" if restored else "Seeded and snapshotted"
+        print(f"🌱 {action} {posts:,} posts in {time.perf_counter() - start:.2f}s")
+        client = app.test_client()
+
+        for name, url in PAGES.items():
+            body = client.get(url).data
+            print(f"\n📋 {name} ({url}): {len(body):,} bytes")
+            print("-" * 50)
+            for label, _, factory in compressors():
+                start = time.process_time()
+                for _ in range(repeat):
+                    compressed = compress(factory, body)
+                cpu_ms = (time.process_time() - start) * 1000 / repeat
+                saved = 100 * (1 - len(compressed) / len(body))
+                print(f"{label:<11} {len(compressed):>9,} bytes  {saved:5.1f}% saved  "
+                      f"{cpu_ms:7.3f} ms CPU  {len(body) / 1024 / 1024 / (cpu_ms / 1000):7.1f} MB/s")
+
+        print(f"\n📈 Whole requests through the app, mean of {repeat}")
+        print("-" * 50)
+        print(f"Level {app.config['COMPRESSION_LEVEL']}, brotli quality {app.config['COMPRESSION_BROTLI_QUALITY']}")
+        encodings = ['identity'] + sorted({encoding for _, encoding, _ in compressors()})
+        for name, url in PAGES.items():
+            line = []
+            for encoding in encodings:
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    response = client.get(url, headers={'Accept-Encoding': encoding})
+                elapsed = (time.perf_counter() - start) * 1000 / repeat
+                line.append(f"{encoding} {elapsed:.2f} ms / {len(response.data):,} B")
+            print(f"{name}: " + ", ".join(line))
+
+    except Exception as e:
+        print(f"❌ Error running benchmark: {e}")
+        return False
+
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark response compression")
+    parser.add_argument('posts', nargs='?', type=int, default=DEFAULT_POSTS)
+    parser.add_argument('--repeat', type=int, default=50, help="runs per measurement (default 50)")
+    args = parser.parse_args()
+    success = benchmark_compression(args.posts, args.repeat)
+    if not success:
+        sys.exit(1)
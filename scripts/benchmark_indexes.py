@@ -0,0 +1,167 @@
+"""
+Benchmark the post feed indexes on a seeded table
+Usage: python scripts/benchmark_indexes.py [rows]
+
+Needs a PostgreSQL DATABASE_URL. Everything happens in a scratch schema
+that is dropped afterwards, so the real users/posts tables are untouched.
+"""
+import os
+import sys
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+# Load environment variables
+load_dotenv()
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEMA = 'bench_indexes'
+DEFAULT_ROWS = 1_000_000
+USER_COUNT = 10_000
+
+# Same shape as the ORM queries behind /api/posts and /web/profile
+QUERIES = {
+    'recent posts': "SELECT id, title, created_at FROM posts ORDER BY created_at DESC LIMIT 10",
+    'user posts': (
+        "SELECT id, title, created_at FROM posts WHERE user_id = 42 "
+        "ORDER BY created_at DESC LIMIT 10"
+    ),
+}
+
+# Mirrors migrations/versions/c7d93a6f1b28_add_post_ordering_indexes.py
+INDEXES = [
+    "CREATE INDEX ix_posts_created_at_id ON posts (created_at DESC, id)",
+    "CREATE INDEX ix_posts_user_id_created_at ON posts (user_id, created_at DESC)",
+]
+
+
+def seed(conn, rows):
+    """Create and fill the scratch tables"""
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"SET search_path TO {SCHEMA}"))
+
+    conn.execute(text("""
+        CREATE TABLE users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(50) NOT NULL
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE posts (
+            id SERIAL PRIMARY KEY,
+            title VARCHAR(200) NOT NULL,
+            content TEXT NOT NULL,
+            excerpt VARCHAR(201),
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            user_id INTEGER NOT NULL REFERENCES users (id)
+        )
+    """))
+
+    conn.execute(text(
+        "INSERT INTO users (username) SELECT 'user_' || g FROM generate_series(1, :n) g"
+    ), {'n': USER_COUNT})
+    # Random timestamps so the physical order doesn't match created_at
+    conn.execute(text("""
+        INSERT INTO posts (title, content, excerpt, created_at, updated_at, user_id)
+        SELECT 'Post ' || g,
+               repeat('lorem ipsum ', 40),
+               left(repeat('lorem ipsum ', 40), 201),
+               now() - random() * interval '365 days',
+               now(),
+               1 + (g % :users)
+        FROM generate_series(1, :n) g
+    """), {'n': rows, 'users': USER_COUNT})
+    conn.execute(text("ANALYZE users"))
+    conn.execute(text("ANALYZE posts"))
+    conn.commit()
+
+
+def explain(conn, sql):
+    """Return (plan lines, execution time in ms) for a query"""
+    plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")).scalar()
+    plan = plan[0]
+
+    lines = []
+
+    def walk(node, depth):
+        label = node['Node Type']
+        if node.get('Index Name'):
+            label += f" using {node['Index Name']}"
+        lines.append(f"{'  ' * depth}-> {label} (rows={node.get('Actual Rows')})")
+        for child in node.get('Plans', []):
+            walk(child, depth + 1)
+
+    walk(plan['Plan'], 0)
+    return lines, plan['Execution Time']
+
+
+def run_queries(conn, label):
+    """Explain every benchmark query and print the plans"""
+    print(f"\n📋 {label}")
+    print("-" * 50)
+    timings = {}
+    for name, sql in QUERIES.items():
+        lines, elapsed = explain(conn, sql)
+        timings[name] = elapsed
+        print(f"{name}: {elapsed:.2f} ms")
+        for line in lines:
+            print(f"   {line}")
+    return timings
+
+
+def benchmark_indexes(rows=DEFAULT_ROWS):
+    """Compare query plans before and after the feed indexes"""
+    try:
+        # Import after setting up the path
+        from api.index import app, db
+
+        with app.app_context():
+            if db.engine.dialect.name != 'postgresql':
+                print("❌ This benchmark needs a PostgreSQL DATABASE_URL")
+                return False
+
+            print("📊 Post Index Benchmark")
+            print("=" * 50)
+
+            with db.engine.connect() as conn:
+                try:
+                    print(f"🌱 Seeding {rows:,} posts in schema '{SCHEMA}'...")
+                    seed(conn, rows)
+
+                    before = run_queries(conn, "Without feed indexes")
+
+                    print("\n🔧 Creating feed indexes...")
+                    for statement in INDEXES:
+                        conn.execute(text(statement))
+                    conn.execute(text("ANALYZE posts"))
+                    conn.commit()
+
+                    after = run_queries(conn, "With feed indexes")
+
+                    print("\n📈 Summary")
+                    print("-" * 50)
+                    for name in QUERIES:
+                        speedup = before[name] / after[name] if after[name] else float('inf')
+                        print(f"{name}: {before[name]:.2f} ms -> {after[name]:.2f} ms ({speedup:.0f}x)")
+                finally:
+                    conn.rollback()
+                    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+                    conn.execute(text("RESET search_path"))
+                    conn.commit()
+                    print(f"\n🧹 Dropped schema '{SCHEMA}'")
+
+    except Exception as e:
+        print(f"❌ Error running benchmark: {e}")
+        return False
+
+    return True
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    success = benchmark_indexes(rows)
+    if not success:
+        sys.exit(1)
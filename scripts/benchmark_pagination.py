@@ -0,0 +1,152 @@
+"""
+Benchmark the pagination count modes (?count=exact|estimate|none)
+Usage: python scripts/benchmark_pagination.py [rows] [--repeat 20]
+
+Needs a PostgreSQL DATABASE_URL. Everything happens in a scratch schema
+that is dropped afterwards, so the real users/posts tables are untouched.
+For each list endpoint the page query is timed together with whatever the
+count mode adds: a COUNT(*) over the filtered rows (exact), an EXPLAIN
+(estimate) or nothing but one extra row (none).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+# Load environment variables
+load_dotenv()
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEMA = 'bench_pagination'
+DEFAULT_ROWS = 1_000_000
+USER_COUNT = 10_000
+PER_PAGE = 10
+PAGE = 5
+
+# FROM/WHERE/ORDER BY of the queries behind each endpoint
+ENDPOINTS = {
+    'get_users': ("users", "", "id"),
+    'get_posts': ("posts", "", "created_at DESC, id"),
+    'get_user_posts': ("posts", "WHERE user_id = 42", "created_at DESC, id DESC"),
+    'search_posts': ("posts", "WHERE title ILIKE '%7%' OR content ILIKE '%7%'", "created_at DESC"),
+}
+
+
+def seed(conn, rows):
+    """Create and fill the scratch tables with the app's indexes"""
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"SET search_path TO {SCHEMA}"))
+
+    conn.execute(text("""
+        CREATE TABLE users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(50) NOT NULL
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE posts (
+            id SERIAL PRIMARY KEY,
+            title VARCHAR(200) NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP,
+            user_id INTEGER NOT NULL REFERENCES users (id)
+        )
+    """))
+    conn.execute(text(
+        "INSERT INTO users (username) SELECT 'user_' || g FROM generate_series(1, :n) g"
+    ), {'n': USER_COUNT})
+    conn.execute(text("""
+        INSERT INTO posts (title, content, created_at, user_id)
+        SELECT 'Post ' || g,
+               repeat('lorem ipsum ', 40) || g,
+               now() - random() * interval '365 days',
+               1 + (g % :users)
+        FROM generate_series(1, :n) g
+    """), {'n': rows, 'users': USER_COUNT})
+    conn.execute(text("CREATE INDEX ix_posts_created_at_id ON posts (created_at DESC, id)"))
+    conn.execute(text("CREATE INDEX ix_posts_user_id_created_at ON posts (user_id, created_at DESC)"))
+    conn.execute(text("ANALYZE users"))
+    conn.execute(text("ANALYZE posts"))
+    conn.commit()
+
+
+def run_mode(conn, endpoint, mode):
+    """Run one page request's SQL under a count mode; return the total it reports"""
+    table, where, order = ENDPOINTS[endpoint]
+    offset = (PAGE - 1) * PER_PAGE
+    limit = PER_PAGE if mode == 'exact' else PER_PAGE + 1
+    conn.execute(text(f"SELECT * FROM {table} {where} ORDER BY {order} LIMIT {limit} OFFSET {offset}")).all()
+    if mode == 'exact':
+        return conn.execute(text(f"SELECT count(*) FROM {table} {where}")).scalar()
+    if mode == 'estimate':
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) SELECT * FROM {table} {where}")).scalar()
+        return int(plan[0]['Plan']['Plan Rows'])
+    return None
+
+
+def time_mode(conn, endpoint, mode, repeat):
+    """Median latency in ms over repeat runs, after one warm-up"""
+    total = run_mode(conn, endpoint, mode)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_mode(conn, endpoint, mode)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), total
+
+
+def benchmark_pagination(rows=DEFAULT_ROWS, repeat=20):
+    """Compare page latency under each count mode for every list endpoint"""
+    try:
+        # Import after setting up the path
+        from api.index import app, db, COUNT_MODES
+
+        with app.app_context():
+            if db.engine.dialect.name != 'postgresql':
+                print("❌ This benchmark needs a PostgreSQL DATABASE_URL")
+                return False
+
+            print("📊 Pagination Count Benchmark")
+            print("=" * 50)
+
+            with db.engine.connect() as conn:
+                try:
+                    print(f"🌱 Seeding {rows:,} posts in schema '{SCHEMA}'...")
+                    seed(conn, rows)
+
+                    print(f"\n📈 Page {PAGE} of {PER_PAGE}, median of {repeat} runs")
+                    print("-" * 50)
+                    for endpoint in ENDPOINTS:
+                        print(f"{endpoint}:")
+                        for mode in COUNT_MODES:
+                            elapsed, total = time_mode(conn, endpoint, mode, repeat)
+                            shown = '-' if total is None else f"{total:,}"
+                            print(f"   {mode:<9} {elapsed:8.2f} ms   total {shown}")
+                finally:
+                    conn.rollback()
+                    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+                    conn.execute(text("RESET search_path"))
+                    conn.commit()
+                    print(f"\n🧹 Dropped schema '{SCHEMA}'")
+
+    except Exception as e:
+        print(f"❌ Error running benchmark: {e}")
+        return False
+
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pagination count modes")
+    parser.add_argument('rows', nargs='?', type=int, default=DEFAULT_ROWS)
+    parser.add_argument('--repeat', type=int, default=20, help="timed runs per mode (default 20)")
+    args = parser.parse_args()
+    success = benchmark_pagination(args.rows, args.repeat)
+    if not success:
+        sys.exit(1)
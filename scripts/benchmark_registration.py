@@ -0,0 +1,139 @@
+"""
+Benchmark the database side of user registration
+Usage: python scripts/benchmark_registration.py [signups]
+
+Compares the old check-then-insert flow (two SELECTs, then INSERT) with the
+single INSERT that relies on the unique indexes. The password hash is
+computed once up front so only database time is measured. The users it
+creates are deleted afterwards, by id.
+
+Refuses to run unless the database name contains "test" or "bench".
+"""
+import os
+import sys
+import time
+import statistics
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+# Load environment variables
+load_dotenv()
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_SIGNUPS = 200
+PREFIX = 'bench_signup'
+
+
+def check_then_insert(db, User, username, email, password_hash):
+    """Registration as it was: look up username and email, then insert.
+    Returns the new user's id, None if taken"""
+    if User.query.filter_by(username=username).first():
+        return None
+    if User.query.filter_by(email=email).first():
+        return None
+    user = User(username=username, email=email, password_hash=password_hash)
+    db.session.add(user)
+    db.session.flush()
+    user_id = user.id
+    db.session.commit()
+    return user_id
+
+
+def single_insert(db, User, username, email, password_hash):
+    """Registration as it is now: insert and let the unique indexes object.
+    Returns the new user's id, None if taken"""
+    user = User(username=username, email=email, password_hash=password_hash)
+    db.session.add(user)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    user_id = user.id
+    db.session.commit()
+    return user_id
+
+
+def run(db, User, strategy, label, signups, password_hash, created):
+    """Time new signups followed by the same number of duplicate attempts,
+    adding the ids of users created to created"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    results = {}
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        for phase in ('new', 'duplicate'):
+            statements.clear()
+            timings = []
+            for i in range(signups):
+                start = time.perf_counter()
+                user_id = strategy(db, User, f'{PREFIX}_{label}_{i}', f'{PREFIX}_{label}_{i}@example.com', password_hash)
+                timings.append((time.perf_counter() - start) * 1000)
+                if user_id is not None:
+                    created.append(user_id)
+            results[phase] = {
+                'mean_ms': statistics.mean(timings),
+                'p95_ms': sorted(timings)[int(len(timings) * 0.95) - 1],
+                'statements': len(statements) / signups,
+            }
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return results
+
+
+def benchmark_registration(signups=DEFAULT_SIGNUPS):
+    """Compare both registration flows"""
+    try:
+        # Import after setting up the path
+        from api.index import app, db, User
+        from werkzeug.security import generate_password_hash
+
+        with app.app_context():
+            database = db.engine.url.database or ''
+            if not any(word in database for word in ('test', 'bench')):
+                print(f"❌ Refusing to benchmark '{database}': not a test or benchmark database")
+                return False
+
+            print("📊 Registration Benchmark")
+            print("=" * 50)
+            print(f"Database: {db.engine.dialect.name}, {signups} signups per flow")
+
+            password_hash = generate_password_hash('password123')
+            results = {}
+            created = []
+            try:
+                results['check-then-insert'] = run(db, User, check_then_insert, 'before', signups, password_hash, created)
+                results['single insert'] = run(db, User, single_insert, 'after', signups, password_hash, created)
+            finally:
+                # Only the rows this run inserted, never pre-existing users
+                db.session.rollback()
+                for start in range(0, len(created), 500):
+                    User.query.filter(User.id.in_(created[start:start + 500])).delete(synchronize_session=False)
+                db.session.commit()
+                print(f"🧹 Removed {len(created)} benchmark users")
+
+            for label, phases in results.items():
+                print(f"\n📋 {label}")
+                print("-" * 30)
+                for phase, r in phases.items():
+                    print(f"{phase:>9}: {r['mean_ms']:.2f} ms mean, {r['p95_ms']:.2f} ms p95, "
+                          f"{r['statements']:.1f} statements/signup")
+
+    except Exception as e:
+        print(f"❌ Error running benchmark: {e}")
+        return False
+
+    return True
+
+
+if __name__ == "__main__":
+    signups = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIGNUPS
+    success = benchmark_registration(signups)
+    if not success:
+        sys.exit(1)
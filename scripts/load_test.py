@@ -0,0 +1,136 @@
+"""
+Concurrent HTTP load generator for comparing the WSGI and ASGI servers
+Usage: python scripts/load_test.py <url> [--clients 500] [--duration 30]
+
+Examples:
+  python api/index.py                       # Flask dev server on :5000
+  python scripts/load_test.py http://localhost:5000/api/posts
+
+  uvicorn asgi:app --port 8000 --workers 4
+  python scripts/load_test.py http://localhost:8000/api/posts --clients 500
+
+Each client holds one keep-alive connection and sends requests back to
+back. Plain HTTP only; raise the open-file limit (ulimit -n) for many clients.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+class Stats:
+    """Latencies and status codes collected by all clients"""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = Counter()
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; return (status, keep_alive)"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip().lower()
+
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)  # chunk plus CRLF
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        return status, False
+
+    return status, headers.get('connection') != 'close'
+
+
+async def run_client(host, port, request, deadline, stats):
+    """Send requests over one connection until the deadline"""
+    writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+            stats.latencies.append(time.perf_counter() - start)
+            stats.statuses[status] += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            stats.errors[type(e).__name__] += 1
+            if writer is not None:
+                writer.close()
+                writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def load_test(url, clients, duration):
+    parts = urlsplit(url)
+    if parts.scheme != 'http':
+        raise ValueError("Only http:// URLs are supported")
+    host, port = parts.hostname, parts.port or 80
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    request = f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: keep-alive\r\n\r\n".encode()
+
+    stats = Stats()
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(run_client(host, port, request, deadline, stats) for _ in range(clients)))
+    return stats, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent HTTP load generator")
+    parser.add_argument('url')
+    parser.add_argument('--clients', type=int, default=500, help="concurrent connections (default 500)")
+    parser.add_argument('--duration', type=float, default=30, help="seconds to run (default 30)")
+    args = parser.parse_args()
+
+    print("🚦 Load Test")
+    print("=" * 50)
+    print(f"URL: {args.url}")
+    print(f"Clients: {args.clients}, duration: {args.duration:.0f}s")
+
+    stats, elapsed = asyncio.run(load_test(args.url, args.clients, args.duration))
+
+    print("\n📈 Results")
+    print("-" * 30)
+    completed = len(stats.latencies)
+    print(f"Requests:   {completed}")
+    print(f"Throughput: {completed / elapsed:.1f} req/s")
+    if completed:
+        latencies = sorted(stats.latencies)
+        print(f"Latency:    mean {statistics.mean(latencies) * 1000:.1f} ms, "
+              f"p50 {percentile(latencies, 0.50) * 1000:.1f} ms, "
+              f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+              f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+    print(f"Statuses:   {dict(stats.statuses)}")
+    if stats.errors:
+        print(f"⚠️ Errors:  {dict(stats.errors)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ load_dotenv()
 
 # Add the parent directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations'))
 
 def manual_upgrade():
     """Manually upgrade database"""
@@ -18,6 +19,7 @@ def manual_upgrade():
         # Import after setting up the path
         from api.index import app, db
         from flask_migrate import upgrade, current, heads
+        from online_migrations import LOCK_TIMEOUT_MS, STATEMENT_TIMEOUT_MS, LOCK_RETRIES, is_lock_timeout
         
         with app.app_context():
             print("🔧 Manual Database Migration")
@@ -38,6 +40,10 @@ def manual_upgrade():
                 return True
             
             print("\n⚠️ This will upgrade your database schema.")
+            if db.engine.dialect.name == 'postgresql':
+                print(f"🔒 Each statement waits at most {LOCK_TIMEOUT_MS} ms for a lock "
+                      f"({LOCK_RETRIES} retries) and runs at most {STATEMENT_TIMEOUT_MS} ms; "
+                      "concurrent index builds and constraint checks are not time-limited")
             confirm = input("Continue? (y/N): ").strip().lower()
             
             if confirm != 'y':
@@ -58,6 +64,13 @@ def manual_upgrade():
                 
             except Exception as e:
                 print(f"❌ Migration failed: {e}")
+                # Revisions run in their own transactions: earlier ones stay applied
+                print("Stopped at revision:")
+                current()
+                if is_lock_timeout(e):
+                    print("\n🔒 Gave up waiting for a table lock. Find the long-running transaction")
+                    print("   holding it (pg_stat_activity), or retry at a quieter time or with a")
+                    print("   larger MIGRATION_LOCK_TIMEOUT_MS; completed steps are not repeated.")
                 print("\n🔧 Troubleshooting:")
                 print("  1. Check database connection")
                 print("  2. Verify migration files")
@@ -1,9 +1,17 @@
 """
 Check migration status and database information
+Usage: python scripts/migration_status.py [--json]
+
+On PostgreSQL the report also covers table/index sizes, index usage,
+unused and duplicate indexes, dead-tuple bloat, cache hit ratios, the top
+statements from pg_stat_statements and index suggestions.
 """
 import os
 import sys
+import json
+import contextlib
 from dotenv import load_dotenv
+from sqlalchemy import text
 
 # Load environment variables
 load_dotenv()
@@ -11,84 +19,363 @@ load_dotenv()
 # Add the parent directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def check_migration_status():
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# Thresholds for the health checks
+BLOAT_DEAD_RATIO = 0.2          # flag tables with more than 20% dead tuples
+CACHE_HIT_WARNING = 0.99        # hit ratios below this usually mean too little memory
+SEQ_SCAN_MIN_ROWS = 10000       # small tables are cheaper to scan than to index
+TOP_STATEMENTS = 10
+
+TABLES_SQL = """
+    SELECT s.relname AS table,
+           c.reltuples::bigint AS row_estimate,
+           s.n_live_tup AS live_rows,
+           s.n_dead_tup AS dead_rows,
+           pg_total_relation_size(s.relid) AS total_bytes,
+           pg_relation_size(s.relid) AS table_bytes,
+           pg_indexes_size(s.relid) AS index_bytes,
+           s.seq_scan,
+           s.seq_tup_read,
+           COALESCE(s.idx_scan, 0) AS idx_scan,
+           GREATEST(s.last_vacuum, s.last_autovacuum) AS last_vacuum
+    FROM pg_stat_user_tables s
+    JOIN pg_class c ON c.oid = s.relid
+    ORDER BY pg_total_relation_size(s.relid) DESC
+"""
+
+INDEXES_SQL = """
+    SELECT s.relname AS table,
+           s.indexrelname AS index,
+           pg_relation_size(s.indexrelid) AS bytes,
+           s.idx_scan AS scans,
+           s.idx_tup_read AS tuples_read,
+           i.indisunique AS is_unique,
+           i.indisprimary AS is_primary,
+           pg_get_indexdef(s.indexrelid) AS definition
+    FROM pg_stat_user_indexes s
+    JOIN pg_index i ON i.indexrelid = s.indexrelid
+    ORDER BY pg_relation_size(s.indexrelid) DESC
+"""
+
+# Same table, columns, operator classes, sort options, expressions and predicate
+DUPLICATE_INDEXES_SQL = """
+    SELECT i.indrelid::regclass::text AS table,
+           array_agg(i.indexrelid::regclass::text ORDER BY i.indexrelid::regclass::text) AS indexes,
+           sum(pg_relation_size(i.indexrelid)) AS bytes
+    FROM pg_index i
+    JOIN pg_stat_user_tables t ON t.relid = i.indrelid
+    GROUP BY i.indrelid, i.indkey::text, i.indclass::text, i.indoption::text,
+             COALESCE(i.indexprs::text, ''), COALESCE(i.indpred::text, '')
+    HAVING count(*) > 1
+"""
+
+CACHE_HIT_SQL = """
+    SELECT sum(heap_blks_hit)::float / NULLIF(sum(heap_blks_hit) + sum(heap_blks_read), 0) AS tables,
+           sum(idx_blks_hit)::float / NULLIF(sum(idx_blks_hit) + sum(idx_blks_read), 0) AS indexes
+    FROM pg_statio_user_tables
+"""
+
+# Foreign keys whose first column does not lead any index
+UNINDEXED_FOREIGN_KEYS_SQL = """
+    SELECT c.conrelid::regclass::text AS table,
+           a.attname AS column
+    FROM pg_constraint c
+    JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+    WHERE c.contype = 'f'
+      AND NOT EXISTS (
+          SELECT 1 FROM pg_index i
+          WHERE i.indrelid = c.conrelid AND i.indkey[0] = c.conkey[1]
+      )
+"""
+
+# pg_stat_statements renamed its timing columns in PostgreSQL 13
+STATEMENTS_SQL = [
+    """
+    SELECT query, calls, total_exec_time AS total_ms, mean_exec_time AS mean_ms, rows
+    FROM pg_stat_statements ORDER BY total_exec_time DESC LIMIT :limit
+    """,
+    """
+    SELECT query, calls, total_time AS total_ms, mean_time AS mean_ms, rows
+    FROM pg_stat_statements ORDER BY total_time DESC LIMIT :limit
+    """,
+]
+
+
+def fetch_all(conn, sql, **params):
+    """Run a query and return its rows as dictionaries"""
+    return [dict(row) for row in conn.execute(text(sql), params).mappings()]
+
+
+def format_bytes(size):
+    """Human readable byte count"""
+    for unit in ['B', 'kB', 'MB', 'GB']:
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def collect_migration_status(db):
+    """Current/head revisions, tables and migration files"""
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    status = {}
+
+    try:
+        with db.engine.connect() as conn:
+            status['current_revision'] = MigrationContext.configure(conn).get_current_revision()
+    except Exception as e:
+        status['current_revision_error'] = str(e)
+
+    try:
+        heads = ScriptDirectory(MIGRATIONS_DIR).get_heads()
+        status['head_revision'] = heads[0] if len(heads) == 1 else heads
+    except Exception as e:
+        status['head_revision_error'] = str(e)
+
+    if 'current_revision' in status and 'head_revision' in status:
+        status['up_to_date'] = status['current_revision'] == status['head_revision']
+
+    try:
+        inspector = db.inspect(db.engine)
+        status['tables'] = {
+            table: [{'name': col['name'], 'type': str(col['type'])} for col in inspector.get_columns(table)]
+            for table in sorted(inspector.get_table_names())
+        }
+    except Exception as e:
+        status['tables_error'] = str(e)
+
+    versions_dir = os.path.join(MIGRATIONS_DIR, 'versions')
+    if os.path.exists(versions_dir):
+        status['migration_files'] = sorted(f for f in os.listdir(versions_dir) if f.endswith('.py'))
+
+    return status
+
+
+def collect_top_statements(conn):
+    """Top statements by total time, or None without pg_stat_statements"""
+    installed = conn.execute(text(
+        "SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'"
+    )).first()
+    if not installed:
+        return None
+
+    for sql in STATEMENTS_SQL:
+        try:
+            return fetch_all(conn, sql, limit=TOP_STATEMENTS)
+        except Exception:
+            # Wrong column names for this server version, or the library is not preloaded
+            conn.rollback()
+    return None
+
+
+def suggest_indexes(tables, unindexed_foreign_keys):
+    """Index suggestions for tables that are mostly read by sequential scans"""
+    suggestions = []
+    for table in tables:
+        rows = max(table['row_estimate'] or 0, table['live_rows'] or 0)
+        if rows < SEQ_SCAN_MIN_ROWS or table['seq_scan'] <= table['idx_scan']:
+            continue
+
+        suggestion = {
+            'table': table['table'],
+            'reason': (f"{table['seq_scan']} sequential scans reading {table['seq_tup_read']} rows "
+                       f"vs {table['idx_scan']} index scans on ~{rows} rows"),
+            'statements': [
+                f"CREATE INDEX CONCURRENTLY ix_{fk['table']}_{fk['column']} ON {fk['table']} ({fk['column']})"
+                for fk in unindexed_foreign_keys if fk['table'] == table['table']
+            ],
+        }
+        if not suggestion['statements']:
+            suggestion['hint'] = "Check the filtered columns of the top statements for this table"
+        suggestions.append(suggestion)
+    return suggestions
+
+
+def collect_performance_report(db):
+    """Size, usage and health statistics (PostgreSQL only)"""
+    if db.engine.dialect.name != 'postgresql':
+        return {'skipped': f"performance report needs PostgreSQL, not {db.engine.dialect.name}"}
+
+    report = {}
+    with db.engine.connect() as conn:
+        tables = fetch_all(conn, TABLES_SQL)
+        indexes = fetch_all(conn, INDEXES_SQL)
+
+        for table in tables:
+            live, dead = table['live_rows'] or 0, table['dead_rows'] or 0
+            table['dead_ratio'] = dead / (live + dead) if live + dead else 0.0
+
+        report['tables'] = tables
+        report['indexes'] = indexes
+        report['unused_indexes'] = [
+            ix for ix in indexes if ix['scans'] == 0 and not ix['is_unique'] and not ix['is_primary']
+        ]
+        report['duplicate_indexes'] = fetch_all(conn, DUPLICATE_INDEXES_SQL)
+        report['bloated_tables'] = [
+            {'table': t['table'], 'dead_rows': t['dead_rows'], 'dead_ratio': t['dead_ratio'],
+             'last_vacuum': t['last_vacuum']}
+            for t in tables if t['dead_ratio'] > BLOAT_DEAD_RATIO
+        ]
+        report['cache_hit_ratio'] = fetch_all(conn, CACHE_HIT_SQL)[0]
+        report['top_statements'] = collect_top_statements(conn)
+        report['index_suggestions'] = suggest_indexes(tables, fetch_all(conn, UNINDEXED_FOREIGN_KEYS_SQL))
+
+    return report
+
+
+def print_migration_status(status):
+    """Human readable migration section"""
+    print("📊 Migration Status Report")
+    print("=" * 50)
+
+    print(f"Current revision: {status.get('current_revision') or status.get('current_revision_error') or 'None'}")
+    print(f"Latest revision:  {status.get('head_revision') or status.get('head_revision_error') or 'None'}")
+    if 'up_to_date' not in status:
+        print("Status: ❓ Unable to determine")
+    elif status['up_to_date']:
+        print("Status: ✅ Database is up to date")
+    else:
+        print("Status: ⚠️ Database needs migration")
+
+    print("\n📋 Database Tables:")
+    print("-" * 30)
+    if 'tables_error' in status:
+        print(f"Error listing tables: {status['tables_error']}")
+    elif status.get('tables'):
+        for table, columns in status['tables'].items():
+            print(f"📄 {table} ({len(columns)} columns)")
+            for col in columns[:3]:  # Show first 3 columns
+                print(f"   - {col['name']} ({col['type']})")
+            if len(columns) > 3:
+                print(f"   ... and {len(columns) - 3} more")
+    else:
+        print("No tables found")
+
+    print("\n📁 Migration Files:")
+    print("-" * 30)
+    migration_files = status.get('migration_files')
+    if migration_files is None:
+        print("Migrations directory not found")
+    elif migration_files:
+        for i, file in enumerate(migration_files[-5:], 1):  # Show last 5
+            print(f"{i}. {file}")
+        if len(migration_files) > 5:
+            print(f"... and {len(migration_files) - 5} more")
+    else:
+        print("No migration files found")
+
+
+def print_performance_report(report):
+    """Human readable performance section"""
+    print("\n🚀 Performance Report")
+    print("=" * 50)
+
+    if 'skipped' in report:
+        print(f"Skipped: {report['skipped']}")
+        return
+
+    print("\n📦 Tables (estimated rows, total / table / index size):")
+    print("-" * 30)
+    for t in report['tables']:
+        print(f"📄 {t['table']}: ~{max(t['row_estimate'], t['live_rows'] or 0):,} rows, "
+              f"{format_bytes(t['total_bytes'])} / {format_bytes(t['table_bytes'])} / {format_bytes(t['index_bytes'])}, "
+              f"{t['seq_scan']} seq scans, {t['idx_scan']} index scans")
+
+    print("\n🗂️ Indexes (size, scans):")
+    print("-" * 30)
+    for ix in report['indexes']:
+        print(f"   {ix['table']}.{ix['index']}: {format_bytes(ix['bytes'])}, {ix['scans']} scans")
+
+    print("\n💤 Unused Indexes:")
+    print("-" * 30)
+    if report['unused_indexes']:
+        for ix in report['unused_indexes']:
+            print(f"⚠️ {ix['index']} on {ix['table']} ({format_bytes(ix['bytes'])}) has never been scanned")
+    else:
+        print("✅ None")
+
+    print("\n👯 Duplicate Indexes:")
+    print("-" * 30)
+    if report['duplicate_indexes']:
+        for dup in report['duplicate_indexes']:
+            print(f"⚠️ {dup['table']}: {', '.join(dup['indexes'])} ({format_bytes(dup['bytes'])})")
+    else:
+        print("✅ None")
+
+    print(f"\n🧟 Dead Tuple Bloat (> {BLOAT_DEAD_RATIO:.0%} dead):")
+    print("-" * 30)
+    if report['bloated_tables']:
+        for t in report['bloated_tables']:
+            print(f"⚠️ {t['table']}: {t['dead_rows']:,} dead rows ({t['dead_ratio']:.0%}), "
+                  f"last vacuum {t['last_vacuum'] or 'never'}")
+    else:
+        print("✅ None")
+
+    print("\n🎯 Cache Hit Ratios:")
+    print("-" * 30)
+    for name, ratio in report['cache_hit_ratio'].items():
+        if ratio is None:
+            print(f"   {name}: no reads yet")
+        else:
+            marker = "✅" if ratio >= CACHE_HIT_WARNING else "⚠️"
+            print(f"{marker} {name}: {ratio:.2%}")
+
+    print("\n🐢 Top Statements (pg_stat_statements):")
+    print("-" * 30)
+    if report['top_statements'] is None:
+        print("pg_stat_statements is not available")
+    else:
+        for i, stmt in enumerate(report['top_statements'], 1):
+            query = ' '.join(stmt['query'].split())
+            print(f"{i}. {stmt['total_ms']:.1f} ms total, {stmt['mean_ms']:.2f} ms mean, "
+                  f"{stmt['calls']} calls: {query[:100]}")
+
+    print("\n💡 Index Suggestions:")
+    print("-" * 30)
+    if report['index_suggestions']:
+        for suggestion in report['index_suggestions']:
+            print(f"📄 {suggestion['table']}: {suggestion['reason']}")
+            for statement in suggestion['statements']:
+                print(f"   {statement};")
+            if suggestion.get('hint'):
+                print(f"   {suggestion['hint']}")
+    else:
+        print("✅ No sequential-scan-heavy tables")
+
+
+def check_migration_status(as_json=False):
     """Check current migration status"""
     try:
-        # Import after setting up the path
-        from api.index import app, db
-        from flask_migrate import current, heads
-        
+        # Import after setting up the path; startup messages would corrupt JSON output
+        with contextlib.redirect_stdout(sys.stderr if as_json else sys.stdout):
+            from api.index import app, db
+
         with app.app_context():
-            print("📊 Migration Status Report")
-            print("=" * 50)
-            
-            # Get current revision
+            status = collect_migration_status(db)
             try:
-                current_rev = current()
-                print(f"Current revision: {current_rev or 'None'}")
+                performance = collect_performance_report(db)
             except Exception as e:
-                print(f"Current revision: Error - {e}")
-            
-            # Get latest revision
-            try:
-                latest_rev = heads()
-                print(f"Latest revision:  {latest_rev or 'None'}")
-            except Exception as e:
-                print(f"Latest revision:  Error - {e}")
-            
-            # Check if up to date
-            try:
-                if current_rev == latest_rev:
-                    print("Status: ✅ Database is up to date")
-                else:
-                    print("Status: ⚠️ Database needs migration")
-            except:
-                print("Status: ❓ Unable to determine")
-            
-            print("\n📋 Database Tables:")
-            print("-" * 30)
-            
-            # List tables
-            try:
-                inspector = db.inspect(db.engine)
-                tables = inspector.get_table_names()
-                
-                if tables:
-                    for table in sorted(tables):
-                        columns = inspector.get_columns(table)
-                        print(f"📄 {table} ({len(columns)} columns)")
-                        for col in columns[:3]:  # Show first 3 columns
-                            print(f"   - {col['name']} ({col['type']})")
-                        if len(columns) > 3:
-                            print(f"   ... and {len(columns) - 3} more")
-                else:
-                    print("No tables found")
-                    
-            except Exception as e:
-                print(f"Error listing tables: {e}")
-            
-            # Migration files
-            print("\n📁 Migration Files:")
-            print("-" * 30)
-            
-            migrations_dir = os.path.join(os.path.dirname(__file__), '..', 'migrations', 'versions')
-            if os.path.exists(migrations_dir):
-                migration_files = [f for f in os.listdir(migrations_dir) if f.endswith('.py')]
-                if migration_files:
-                    for i, file in enumerate(sorted(migration_files)[-5:], 1):  # Show last 5
-                        print(f"{i}. {file}")
-                    if len(migration_files) > 5:
-                        print(f"... and {len(migration_files) - 5} more")
-                else:
-                    print("No migration files found")
+                performance = {'error': str(e)}
+
+        if as_json:
+            print(json.dumps({'migrations': status, 'performance': performance}, indent=2, default=str))
+        else:
+            print_migration_status(status)
+            if 'error' in performance:
+                print(f"\n❌ Error building performance report: {performance['error']}")
             else:
-                print("Migrations directory not found")
-            
+                print_performance_report(performance)
+
     except Exception as e:
         print(f"❌ Error checking migration status: {e}")
         return False
-    
+
     return True
 
 if __name__ == "__main__":
-    check_migration_status()
+    success = check_migration_status(as_json='--json' in sys.argv[1:])
+    if not success:
+        sys.exit(1)
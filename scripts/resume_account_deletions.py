@@ -0,0 +1,46 @@
+"""
+Finish account deletions that were interrupted
+Usage: python scripts/resume_account_deletions.py
+
+Accounts with more posts than ACCOUNT_DELETE_CHUNK_SIZE are locked by
+DELETE /api/profile and deleted on an in-memory background queue. If the
+process dies first (crash, SIGKILL, a frozen serverless instance) the
+account stays locked with its posts still visible. This deletes every such
+account, one chunk of posts per transaction. Safe to run again, e.g. after
+a deploy or from cron.
+"""
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def resume():
+    """Delete every account left locked for deletion"""
+    try:
+        # Import after setting up the path
+        from api.index import app, resume_account_deletions
+
+        with app.app_context():
+            user_ids = resume_account_deletions()
+        if user_ids:
+            print(f"✅ Deleted {len(user_ids)} account(s): {', '.join(map(str, user_ids))}")
+        else:
+            print("✅ No interrupted account deletions")
+
+    except Exception as e:
+        print(f"❌ Resuming account deletions failed: {e}")
+        print("Deleted chunks are committed; run again to continue")
+        return False
+
+    return True
+
+
+if __name__ == "__main__":
+    if not resume():
+        sys.exit(1)
@@ -0,0 +1,105 @@
+"""
+Run, resume or inspect a data backfill
+Usage: python scripts/run_backfill.py <job> [--workers 4] [--batch-size 1000]
+                                            [--rows-per-second 5000] [--max-lag 5] [--restart]
+       python scripts/run_backfill.py --status
+
+Walks the table in primary-key batches, checkpointing each one to the
+backfill_progress table. Stop it at any time (Ctrl-C) and run the same
+command again to continue where it left off.
+"""
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the parent directory and the migration helpers to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations'))
+
+
+def jobs():
+    """Known backfills by name"""
+    from api.index import EXCERPT_LENGTH
+    from batch_backfill import Backfill
+
+    return {
+        # Posts written before excerpts existed
+        'post_excerpts': lambda batch_size: Backfill(
+            'post_excerpts', 'posts', f"excerpt = substr(content, 1, {EXCERPT_LENGTH + 1})",
+            where="excerpt IS NULL", batch_size=batch_size),
+        # Recount followers after drift (e.g. rows deleted by hand)
+        'user_follower_counts': lambda batch_size: Backfill(
+            'user_follower_counts', 'users',
+            "follower_count = (SELECT count(*) FROM follows WHERE follows.followed_id = users.id)",
+            where="follower_count <> (SELECT count(*) FROM follows WHERE follows.followed_id = users.id)",
+            batch_size=batch_size),
+    }
+
+
+def show_status():
+    from api.index import app, db
+    from batch_backfill import status
+
+    with app.app_context():
+        backfills = status(db.engine)
+    if not backfills:
+        print("No backfills have run yet")
+        return
+    print("📊 Backfills")
+    print("=" * 50)
+    for name, job in backfills.items():
+        state = "✅ finished" if job['finished'] else "⏸️ incomplete"
+        print(f"{name} ({job['table']}): {state}, {100 * job['keys_done'] / job['keys']:.1f}% of "
+              f"{job['keys']:,} keys in {job['slices']} slice(s), {job['rows_updated']:,} rows updated, "
+              f"last batch {job['updated_at'] or 'never'}")
+
+
+def run_backfill(name, workers, batch_size, rows_per_second, max_lag, restart):
+    """Run or resume one backfill"""
+    try:
+        # Import after setting up the path
+        from api.index import app, db
+
+        known = jobs()
+        if name not in known:
+            print(f"❌ Unknown backfill '{name}'. Known: {', '.join(known)}")
+            return False
+
+        job = known[name](batch_size)
+        with app.app_context():
+            if restart:
+                job.reset(db.engine)
+                print(f"🔄 Cleared checkpoints for {name}")
+            job.run(db.engine, workers=workers, rows_per_second=rows_per_second, max_lag_seconds=max_lag)
+
+    except Exception as e:
+        print(f"❌ Backfill failed: {e}")
+        print("Completed batches are checkpointed; run again to resume")
+        return False
+
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a resumable, throttled backfill")
+    parser.add_argument('job', nargs='?', help="backfill to run")
+    parser.add_argument('--status', action='store_true', help="show progress of all backfills")
+    parser.add_argument('--workers', type=int, default=1, help="parallel workers (PostgreSQL only)")
+    parser.add_argument('--batch-size', type=int, default=1000, help="keys per committed batch")
+    parser.add_argument('--rows-per-second', type=int, help="cap on rows updated per second, all workers")
+    parser.add_argument('--max-lag', type=float, help="pause while replica lag exceeds this many seconds")
+    parser.add_argument('--restart', action='store_true', help="discard checkpoints and start over")
+    args = parser.parse_args()
+
+    if args.status:
+        show_status()
+        sys.exit(0)
+    if not args.job:
+        parser.error("name a backfill to run, or pass --status")
+    success = run_backfill(args.job, args.workers, args.batch_size, args.rows_per_second, args.max_lag, args.restart)
+    if not success:
+        sys.exit(1)
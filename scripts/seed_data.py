@@ -1,4 +1,5 @@
 from app import app, db, User, Post
+from snapshots import reset_database
 from werkzeug.security import generate_password_hash
 
 def seed_database():
@@ -6,10 +7,8 @@ def seed_database():
     with app.app_context():
         print("🌱 Seeding database with sample data...")
         
-        # Clear existing data
-        Post.query.delete()
-        User.query.delete()
-        db.session.commit()
+        # Clear existing data: one TRUNCATE on Postgres, ids start again at 1
+        reset_database(db)
         
         # Create sample users
         users_data = [
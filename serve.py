@@ -0,0 +1,310 @@
+"""
+Production launcher: preload the app once, then fork worker processes
+Usage: python serve.py [--workers 4] [--port 8000] [--max-requests 10000] [--max-rss-mb 512]
+
+- The Flask app, models and templates are imported and compiled once in the
+  master, then the garbage collector is frozen so forked workers keep
+  sharing those pages instead of copying them on the first collection.
+- Database connections are never shared across fork: the master's pool is
+  disposed before forking and each worker starts with an empty one.
+- Workers are recycled after --max-requests requests (with jitter) or once
+  their RSS passes --max-rss-mb.
+- SIGHUP replaces workers one at a time (rolling restart); SIGTERM/SIGINT
+  drain in-flight requests and stop. Code changes need a full restart,
+  since workers fork from the preloaded master.
+- Every --stats-interval seconds the master prints RSS and requests/sec
+  per worker.
+"""
+import argparse
+import gc
+import logging
+import os
+import random
+import resource
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from multiprocessing.sharedctypes import RawArray
+from dotenv import load_dotenv
+from werkzeug.serving import make_server
+from werkzeug.wsgi import ClosingIterator
+
+load_dotenv()
+
+# Shared stats slots: [requests served, RSS in kB] per worker
+STAT_FIELDS = 2
+
+
+def current_rss_kb():
+    """Resident set size of this process in kB"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() // 1024
+    except OSError:
+        # Peak rather than current RSS, but the best portable figure
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def preload():
+    """Import the app and warm everything workers would otherwise build lazily"""
+    from sqlalchemy.orm import configure_mappers
+    from api.index import app, db
+
+    configure_mappers()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+    # Connections opened during startup (migrations) must not leak into workers
+    with app.app_context():
+        db.engine.dispose()
+
+    gc.collect()
+    gc.freeze()
+    return app, db
+
+
+class Worker:
+    """Serve requests from the shared listening socket until told to stop"""
+
+    def __init__(self, app, db, sock, args, stats, slot):
+        self.app = app
+        self.db = db
+        self.sock = sock
+        self.args = args
+        self.stats = stats
+        self.slot = slot
+        self.running = True
+        self.requests = 0
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        jitter = random.randint(0, args.max_requests_jitter) if args.max_requests else 0
+        self.max_requests = args.max_requests + jitter if args.max_requests else 0
+
+    def counting_app(self, environ, start_response):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+        try:
+            app_iter = self.app(environ, start_response)
+        except BaseException:
+            self.finished()
+            raise
+        # The server closes the iterator once the body has been written
+        return ClosingIterator(app_iter, self.finished)
+
+    def finished(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def drain(self):
+        """Wait for requests already inside the app; idle keep-alive connections are dropped"""
+        deadline = time.monotonic() + self.args.graceful_timeout
+        while self.in_flight and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def stop(self, signum, frame):
+        self.running = False
+
+    def should_recycle(self):
+        if self.max_requests and self.requests >= self.max_requests:
+            return f"served {self.requests} requests"
+        if self.args.max_rss_mb and self.stats[self.slot * STAT_FIELDS + 1] > self.args.max_rss_mb * 1024:
+            return f"RSS above {self.args.max_rss_mb} MB"
+        return None
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        # Drop the pool inherited from the master without touching its sockets
+        with self.app.app_context():
+            self.db.engine.dispose(close=False)
+
+        server = make_server(self.args.host, self.args.port, self.counting_app,
+                             threaded=self.args.threaded, fd=self.sock.fileno())
+        server.timeout = 1.0
+
+        reason = None
+        while self.running:
+            server.handle_request()
+            self.stats[self.slot * STAT_FIELDS] = self.requests
+            self.stats[self.slot * STAT_FIELDS + 1] = current_rss_kb()
+            reason = self.should_recycle()
+            if reason:
+                break
+
+        server.server_close()
+        self.drain()
+        if reason:
+            print(f"♻️ Worker {os.getpid()} recycling: {reason}", flush=True)
+        self.flush()
+        os._exit(0)
+
+    def flush(self):
+        """Finish the work the app buffers in memory; os._exit skips its atexit hooks"""
+        from api.index import account_deletions, fanout, view_counter
+
+        for jobs in (fanout, account_deletions):
+            jobs.drain()
+            # Waits for a job the queue's own thread is still running
+            jobs.join()
+        view_counter.flush()
+
+
+class Master:
+    """Fork, supervise, recycle and report on workers"""
+
+    def __init__(self, args):
+        self.args = args
+        self.workers = {}          # pid -> slot
+        self.retiring = set()      # pids asked to stop during a rolling restart
+        self.pending_restart = []  # pids still to be replaced
+        self.running = True
+        self.stats = RawArray('q', args.workers * STAT_FIELDS)
+        self.last_counts = {}
+
+    def bind(self):
+        sock = socket.socket(socket.AF_INET6 if ':' in self.args.host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.args.host, self.args.port))
+        sock.listen(self.args.backlog)
+        # Idle workers must not block in accept() when another worker won the race
+        sock.setblocking(False)
+        return sock
+
+    def free_slot(self):
+        used = set(self.workers.values())
+        return next(slot for slot in range(self.args.workers) if slot not in used)
+
+    def spawn(self):
+        slot = self.free_slot()
+        self.stats[slot * STAT_FIELDS] = 0
+        self.stats[slot * STAT_FIELDS + 1] = 0
+        pid = os.fork()
+        if pid == 0:
+            # The child must never return into the master's loop, even on an error
+            code = 1
+            try:
+                Worker(self.app, self.db, self.sock, self.args, self.stats, slot).run()
+                code = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.workers[pid] = slot
+        self.last_counts[pid] = (0, time.monotonic())
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid not in self.workers:
+                continue
+            del self.workers[pid]
+            self.last_counts.pop(pid, None)
+            self.retiring.discard(pid)
+            if os.waitstatus_to_exitcode(status) != 0 and self.running:
+                print(f"⚠️ Worker {pid} died unexpectedly, replacing", flush=True)
+                time.sleep(0.5)
+            if self.running:
+                self.spawn()
+
+    def rolling_restart(self):
+        """Retire the next worker once the previous one has been replaced"""
+        if self.retiring or not self.pending_restart:
+            return
+        pid = self.pending_restart.pop(0)
+        if pid in self.workers:
+            self.retiring.add(pid)
+            os.kill(pid, signal.SIGTERM)
+
+    def report(self):
+        now = time.monotonic()
+        lines = []
+        for pid, slot in sorted(self.workers.items(), key=lambda item: item[1]):
+            served = self.stats[slot * STAT_FIELDS]
+            rss_mb = self.stats[slot * STAT_FIELDS + 1] / 1024
+            previous, since = self.last_counts.get(pid, (0, now))
+            rate = (served - previous) / (now - since) if now > since else 0.0
+            self.last_counts[pid] = (served, now)
+            lines.append(f"   worker {pid}: {rss_mb:.1f} MB RSS, {rate:.1f} req/s, {served} served")
+        print("📊 Workers\n" + "\n".join(lines), flush=True)
+
+    def on_hup(self, signum, frame):
+        print("🔄 Rolling restart requested", flush=True)
+        self.pending_restart = list(self.workers)
+
+    def on_stop(self, signum, frame):
+        self.running = False
+
+    def run(self):
+        self.app, self.db = preload()
+        self.sock = self.bind()
+
+        signal.signal(signal.SIGHUP, self.on_hup)
+        signal.signal(signal.SIGTERM, self.on_stop)
+        signal.signal(signal.SIGINT, self.on_stop)
+
+        print(f"🚀 Serving on http://{self.args.host}:{self.args.port} with {self.args.workers} workers "
+              f"(master {os.getpid()})", flush=True)
+        for _ in range(self.args.workers):
+            self.spawn()
+
+        next_report = time.monotonic() + self.args.stats_interval
+        while self.running:
+            self.reap()
+            self.rolling_restart()
+            if self.args.stats_interval and time.monotonic() >= next_report:
+                self.report()
+                next_report = time.monotonic() + self.args.stats_interval
+            time.sleep(0.2)
+
+        print("🛑 Shutting down, draining workers...", flush=True)
+        for pid in list(self.workers):
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.args.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            os.kill(pid, signal.SIGKILL)
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-forking production launcher for api/index.py")
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 2)))
+    parser.add_argument('--no-threads', dest='threaded', action='store_false',
+                        help="handle one request at a time per worker")
+    parser.add_argument('--max-requests', type=int, default=10000, help="recycle a worker after this many requests (0 = never)")
+    parser.add_argument('--max-requests-jitter', type=int, default=1000, help="random extra requests so workers don't recycle together")
+    parser.add_argument('--max-rss-mb', type=int, default=512, help="recycle a worker above this RSS (0 = never)")
+    parser.add_argument('--graceful-timeout', type=float, default=30, help="seconds to wait for workers on shutdown")
+    parser.add_argument('--stats-interval', type=float, default=60, help="seconds between worker reports (0 = off)")
+    parser.add_argument('--backlog', type=int, default=2048)
+    parser.add_argument('--access-log', action='store_true', help="log every request")
+    args = parser.parse_args()
+
+    if not args.access_log:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    # Add the current directory to Python path
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    Master(args).run()
+
+
+if __name__ == '__main__':
+    main()
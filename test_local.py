@@ -0,0 +1,1160 @@
+"""
+In-process tests for api/index.py against a throwaway SQLite database.
+Unlike test_api.py and test_vercel_api.py these need no running server:
+    python -m pytest test_local.py
+"""
+import gzip
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+
+# A file rather than :memory: so the ASGI app's async engine sees the same data
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test_local.db')}"
+
+import pytest
+from sqlalchemy import event
+
+from api.index import app, db, User, Post, BloomFilter, username_filter, user_cache, view_counter, trending, fanout, TimelineEntry, recent_posts, \
+    invalidation_bus, FileChannel, PostgresChannel, post_cache, PostCache, Follow, account_deletions, \
+    explain_statement, TrendingPosts, SingleFlightCache, resume_account_deletions
+from snapshots import SnapshotStore, reset_database
+from migrations import online_migrations
+from migrations.batch_backfill import Backfill, status
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    username_filter['bloom'] = None
+    user_cache.clear()
+    view_counter.counts.clear()
+    trending.scores.clear()
+    trending.computed_at = None
+    recent_posts.invalidate()
+    post_cache.clear()
+    post_cache.counts.update(hits=0, stale_hits=0, loads=0, coalesced=0)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    with app.test_client() as client:
+        yield client
+    fanout.join()
+    account_deletions.join()
+    with app.app_context():
+        db.session.remove()
+
+
+@contextmanager
+def count_statements(all_threads=False):
+    """Collect every SQL statement this thread sends to the database; unless
+    all_threads, background work (fanout, cache reloads) is not counted"""
+    statements = []
+    thread = threading.get_ident()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if all_threads or threading.get_ident() == thread:
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def loads_content(statements):
+    """Whether any row-fetching statement selects posts.content"""
+    # Pagination COUNTs wrap the query in a subquery, the planner drops the column
+    return any('posts.content' in statement for statement in statements
+               if not statement.startswith('SELECT count('))
+
+
+def make_user(username, password='password123'):
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com')
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def make_posts(user_id, count):
+    with app.app_context():
+        for i in range(count):
+            db.session.add(Post(title=f'Post {i}', content=f'Content {i} ' * 50, user_id=user_id))
+        db.session.commit()
+
+
+def login(client, username, password='password123'):
+    response = client.post('/api/login', json={'username': username, 'password': password})
+    assert response.status_code == 200
+
+
+def test_dashboard_statement_count(client):
+    authors = [make_user(f'author{i}') for i in range(6)]
+    for author_id in authors:
+        make_posts(author_id, 3)
+    login(client, 'author0')
+    client.get('/web/dashboard')
+
+    with count_statements() as statements:
+        response = client.get('/web/dashboard')
+
+    assert response.status_code == 200
+    # own recent posts only: the user was cached at login, community posts
+    # come from the recent posts cache
+    assert len(statements) == 1
+
+
+def test_profile_is_paginated(client):
+    user_id = make_user('prolific')
+    make_posts(user_id, 25)
+    login(client, 'prolific')
+
+    with count_statements() as statements:
+        response = client.get('/web/profile')
+
+    assert response.status_code == 200
+    # post statistics, one page of posts; the user was cached at login
+    assert len(statements) == 2
+    html = response.get_data(as_text=True)
+    assert html.count('onclick="deletePost(') == 10
+    assert '/web/profile?page=3' in html
+
+    response = client.get('/web/profile?page=3')
+    assert response.get_data(as_text=True).count('onclick="deletePost(') == 5
+
+
+def test_posts_page_preloads_authors(client):
+    for i in range(5):
+        make_posts(make_user(f'writer{i}'), 2)
+
+    with count_statements() as statements:
+        response = client.get('/web/posts')
+
+    assert response.status_code == 200
+    # page of posts with authors joined, plus the pagination count
+    assert len(statements) == 2
+
+
+def test_navigation_rendered_from_session(client):
+    user_id = make_user('navuser')
+    make_posts(user_id, 1)
+
+    response = client.get('/web/posts')
+    html = response.get_data(as_text=True)
+    assert 'href="/web/login"' in html
+    assert 'API_BASE}/profile' not in html
+
+    login(client, 'navuser')
+    with count_statements() as statements:
+        response = client.get('/web')
+    html = response.get_data(as_text=True)
+    assert 'navuser' in html
+    assert 'href="/web/dashboard"' in html
+    assert 'API_BASE}/profile' not in html
+    assert statements == []
+
+
+def test_post_actions_only_for_owner(client):
+    owner_id = make_user('owner')
+    make_user('visitor')
+    make_posts(owner_id, 1)
+
+    login(client, 'visitor')
+    assert 'id="post-actions"' not in client.get('/web/posts/1').get_data(as_text=True)
+
+    login(client, 'owner')
+    assert 'id="post-actions"' in client.get('/web/posts/1').get_data(as_text=True)
+
+
+def test_excerpt_maintained_on_write(client):
+    make_user('editor')
+    login(client, 'editor')
+
+    response = client.post('/api/posts', json={'title': 'Long', 'content': 'x' * 500})
+    post_id = response.get_json()['post']['id']
+    client.put(f'/api/posts/{post_id}', json={'title': 'Short', 'content': 'brief'})
+
+    with app.app_context():
+        assert db.session.get(Post, post_id).excerpt == 'brief'
+
+
+def test_summary_view_skips_content(client, monkeypatch):
+    # Keep the page deeper than the recent posts cache so it hits the database
+    monkeypatch.setitem(app.config, 'RECENT_POSTS_CACHE_SIZE', 1)
+    make_posts(make_user('summarizer'), 3)
+    client.get('/api/posts')
+
+    with count_statements() as statements:
+        response = client.get('/api/posts?view=summary')
+
+    posts = response.get_json()['posts']
+    assert len(posts) == 3
+    assert all('content' not in post and post['excerpt'].endswith('...') for post in posts)
+    assert statements and not loads_content(statements)
+
+    full = client.get('/api/posts').get_json()['posts']
+    assert all('content' in post for post in full)
+
+
+def test_list_pages_skip_content(client):
+    make_posts(make_user('lister'), 3)
+    login(client, 'lister')
+
+    for url in ('/web/posts', '/web/dashboard', '/web/profile'):
+        # The first dashboard load fills the recent posts cache, content included
+        client.get(url)
+        with count_statements() as statements:
+            response = client.get(url)
+        assert response.status_code == 200
+        assert not loads_content(statements), url
+
+
+def test_register_single_insert_and_conflicts(client):
+    payload = {'username': 'Signup', 'email': 'signup@example.com', 'password': 'password123'}
+
+    with count_statements() as statements:
+        response = client.post('/api/register', json=payload)
+    assert response.status_code == 201
+    assert [s.split()[0] for s in statements] == ['INSERT']
+
+    response = client.post('/api/register', json={**payload, 'username': 'SIGNUP', 'email': 'other@example.com'})
+    assert response.status_code == 409
+    assert response.get_json()['error'] == 'Username already exists'
+
+    response = client.post('/api/register', json={**payload, 'username': 'another'})
+    assert response.status_code == 409
+    assert response.get_json()['error'] == 'Email already exists'
+
+    login(client, 'signup')
+
+
+def test_update_profile_email_conflict(client):
+    make_user('first')
+    make_user('second')
+    login(client, 'second')
+
+    response = client.put('/api/profile', json={'email': 'first@example.com'})
+    assert response.status_code == 409
+    assert response.get_json()['error'] == 'Email already exists'
+
+    response = client.put('/api/profile', json={'email': 'second-new@example.com'})
+    assert response.status_code == 200
+    assert response.get_json()['user']['email'] == 'second-new@example.com'
+
+
+def test_user_cache(client, monkeypatch):
+    make_user('cached')
+    login(client, 'cached')
+
+    with count_statements() as statements:
+        assert client.get('/api/profile').get_json()['user']['username'] == 'cached'
+        response = client.post('/api/posts', json={'title': 'Hello', 'content': 'World'})
+    assert response.status_code == 201
+    assert response.get_json()['post']['author'] == 'cached'
+    # Only the INSERT: the user came from the cache, the post was serialized before commit
+    assert [s.split()[0] for s in statements] == ['INSERT']
+
+    # Updating the profile invalidates the cached row
+    assert client.put('/api/profile', json={'email': 'cached-new@example.com'}).status_code == 200
+    assert client.get('/api/profile').get_json()['user']['email'] == 'cached-new@example.com'
+
+    monkeypatch.setitem(app.config, 'USER_CACHE_TTL_SECONDS', 0)
+    user_cache.clear()
+    with count_statements() as statements:
+        assert client.get('/api/profile').status_code == 200
+    assert len(statements) == 1
+
+
+def test_view_counts_batched(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'POST_VIEW_FLUSH_SECONDS', 3600)
+    make_posts(make_user('viewed'), 3)
+
+    for expected in (1, 2, 3):
+        assert client.get('/api/posts/1').get_json()['post']['view_count'] == expected
+    assert b'4 views' in client.get('/web/posts/1').data
+    client.get('/api/posts/2')
+
+    with app.app_context():
+        assert db.session.get(Post, 1).view_count == 0
+    with count_statements() as statements:
+        assert view_counter.flush() == 2
+    assert len(statements) == 1 and statements[0].startswith('UPDATE posts')
+    with app.app_context():
+        assert db.session.get(Post, 1).view_count == 4
+        assert db.session.get(Post, 2).view_count == 1
+    assert client.get('/api/posts/1').get_json()['post']['view_count'] == 5
+
+    # Reaching the pending bound flushes without waiting for the interval
+    monkeypatch.setitem(app.config, 'POST_VIEW_MAX_PENDING', 2)
+    client.get('/api/posts/3')
+    assert view_counter.pending(1) == 0 and view_counter.pending(3) == 0
+    with app.app_context():
+        assert db.session.get(Post, 3).view_count == 1
+
+
+def test_trending_posts(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'POST_VIEW_FLUSH_SECONDS', 3600)
+    # One post per chunk, so the rebuild pages through the index
+    monkeypatch.setattr(trending, 'CHUNK_SIZE', 1)
+    author = make_user('trendsetter')
+    now = datetime.utcnow()
+    with app.app_context():
+        for title, age, views in (('fresh', timedelta(hours=1), 0), ('popular', timedelta(days=1), 40),
+                                  ('stale', timedelta(days=3), 5), ('ancient', timedelta(days=30), 1000)):
+            db.session.add(Post(title=title, content=title, user_id=author, created_at=now - age, view_count=views))
+        db.session.commit()
+
+    # Built from the database in the background on first use; the cold
+    # request is not held up. Posts outside the window are ignored
+    assert client.get('/api/posts/trending').get_json()['posts'] == []
+    deadline = time.time() + 5
+    while trending.computed_at is None and time.time() < deadline:
+        time.sleep(0.01)
+    titles = [post['title'] for post in client.get('/api/posts/trending').get_json()['posts']]
+    assert titles == ['popular', 'fresh', 'stale']
+
+    # Views and new posts update the ranking without a rebuild
+    for _ in range(20):
+        client.get('/api/posts/1')
+    login(client, 'trendsetter')
+    created = client.post('/api/posts', json={'title': 'brand new', 'content': 'x'}).get_json()['post']
+    fanout.join()
+    with count_statements() as statements:
+        response = client.get('/api/posts/trending?limit=2&view=summary')
+    assert len(statements) == 1
+    assert [post['title'] for post in response.get_json()['posts']] == ['fresh', 'popular']
+    assert 'excerpt' in response.get_json()['posts'][0]
+
+    client.delete('/api/posts/1')
+    titles = [post['title'] for post in client.get('/api/posts/trending').get_json()['posts']]
+    assert titles == ['popular', 'brand new', 'stale']
+    assert created['title'] == 'brand new'
+
+
+def test_trending_epoch_rebase(monkeypatch):
+    monkeypatch.setitem(app.config, 'TRENDING_HALF_LIFE_HOURS', 1)
+    ranking = TrendingPosts()
+    now = datetime.utcnow()
+    ranking.epoch = now - timedelta(hours=40)
+    # A view an hour ago, scored against the old epoch
+    ranking.scores = {1: 2.0 ** 39}
+    ranking.record_view(2)
+    assert now <= ranking.epoch
+    assert ranking.scores[1] == pytest.approx(0.5, rel=1e-3)
+    assert ranking.scores[2] == pytest.approx(1.0, rel=1e-3)
+
+    # Weeks of uptime with a short half-life: 2^1440 would overflow
+    ranking.epoch = now - timedelta(days=60)
+    ranking.record_view(3)
+    assert ranking.scores[3] == pytest.approx(1.0, rel=1e-3) and ranking.scores[2] == 0.0
+
+
+def timeline_titles(client, **params):
+    response = client.get('/api/timeline', query_string=params)
+    assert response.status_code == 200
+    return [post['title'] for post in response.get_json()['posts']], response.get_json()['next_cursor']
+
+
+def test_timeline_fan_out(client):
+    author = make_user('author')
+    for name in ('reader', 'other'):
+        make_user(name)
+        login(client, name)
+        assert client.post(f'/api/users/{author}/follow').status_code == 201
+    assert client.post(f'/api/users/{author}/follow').get_json()['message'] == 'Already following'
+    assert client.post('/api/users/999/follow').status_code == 404
+
+    login(client, 'author')
+    for i in range(3):
+        client.post('/api/posts', json={'title': f'post {i}', 'content': 'x'})
+    fanout.join()
+
+    login(client, 'reader')
+    with count_statements() as statements:
+        titles, cursor = timeline_titles(client, limit=2)
+    assert len(statements) == 1
+    assert titles == ['post 2', 'post 1']
+    assert timeline_titles(client, limit=2, cursor=cursor) == (['post 0'], None)
+
+    # Unfollowing prunes the timeline, following again backfills it
+    client.delete(f'/api/users/{author}/follow')
+    fanout.join()
+    assert timeline_titles(client) == ([], None)
+    client.post(f'/api/users/{author}/follow')
+    fanout.join()
+    assert timeline_titles(client)[0] == ['post 2', 'post 1', 'post 0']
+
+
+def test_account_deletion(client, monkeypatch):
+    leaving = make_user('leaving')
+    friend = make_user('friend')
+    login(client, 'friend')
+    client.post(f'/api/users/{leaving}/follow')
+    login(client, 'leaving')
+    client.post(f'/api/users/{friend}/follow')
+    for i in range(3):
+        client.post('/api/posts', json={'title': f'goodbye {i}', 'content': 'x'})
+    fanout.join()
+    assert client.get('/api/posts').get_json()['pagination']['total'] == 3
+
+    assert client.delete('/api/profile', json={'password': 'wrong'}).status_code == 403
+    # A delete that fails leaves the user logged in
+    def fail(user_id):
+        raise RuntimeError('database unavailable')
+    with monkeypatch.context() as patch:
+        patch.setattr('api.index.delete_account', fail)
+        assert client.delete('/api/profile', json={'password': 'password123'}).status_code == 500
+    assert client.get('/api/profile').status_code == 200
+    with count_statements() as statements:
+        response = client.delete('/api/profile', json={'password': 'password123'})
+    assert response.status_code == 200
+    # Posts, follows and timeline rows go with ON DELETE CASCADE, never loaded
+    assert not loads_content(statements)
+    assert client.get('/api/profile').status_code == 401
+    assert client.get('/api/posts').get_json()['pagination']['total'] == 0
+    assert client.get('/api/posts/1').status_code == 404
+    with app.app_context():
+        assert db.session.get(User, leaving) is None
+        assert Follow.query.count() == 0 and TimelineEntry.query.count() == 0
+        assert db.session.get(User, friend).follower_count == 0
+
+    # Bigger accounts are locked at once and deleted a chunk at a time
+    monkeypatch.setitem(app.config, 'ACCOUNT_DELETE_CHUNK_SIZE', 2)
+    monkeypatch.setitem(app.config, 'ACCOUNT_DELETE_PAUSE_SECONDS', 0)
+    make_posts(friend, 5)
+    login(client, 'friend')
+    response = client.delete('/api/profile', json={'password': 'password123'})
+    assert response.status_code == 202 and response.get_json()['posts'] == 5
+    assert client.post('/api/login', json={'username': 'friend', 'password': 'password123'}).status_code == 401
+    account_deletions.join()
+    with app.app_context():
+        assert db.session.get(User, friend) is None and Post.query.count() == 0
+
+    # A full chunk goes to the background, so the request never pauses
+    monkeypatch.setitem(app.config, 'ACCOUNT_DELETE_PAUSE_SECONDS', 60)
+    exact = make_user('exact')
+    make_posts(exact, 2)
+    login(client, 'exact')
+    monkeypatch.setattr(account_deletions, 'submit', lambda job, *args: None)
+    response = client.delete('/api/profile', json={'password': 'password123'})
+    assert response.status_code == 202
+
+    # The queued job was lost (a crash); the sweep finishes the locked account
+    monkeypatch.setitem(app.config, 'ACCOUNT_DELETE_PAUSE_SECONDS', 0)
+    with app.app_context():
+        assert resume_account_deletions() == [exact]
+        assert db.session.get(User, exact) is None and Post.query.count() == 0
+        assert resume_account_deletions() == []
+
+
+def test_dataset_snapshots(client):
+    store = SnapshotStore(app, db)
+    seeded = []
+
+    def seed():
+        seeded.append(True)
+        make_posts(make_user('seeded'), 3)
+
+    try:
+        assert store.load('three_posts', seed) is False
+        with app.app_context():
+            db.session.delete(db.session.get(Post, 2))
+            db.session.add(User(username='extra', email='extra@example.com', password_hash='x'))
+            db.session.commit()
+
+        # The second load restores the copy instead of seeding again
+        assert store.load('three_posts', seed) is True
+        assert seeded == [True]
+        with app.app_context():
+            assert [post.id for post in Post.query.order_by(Post.id)] == [1, 2, 3]
+            assert [user.username for user in User.query] == ['seeded']
+
+        clone = store.clone('three_posts', 'test_clone.db')
+        path = clone[len('sqlite:///'):]
+        assert os.path.exists(path)
+        os.remove(path)
+    finally:
+        store.drop('three_posts')
+    assert not store.exists('three_posts')
+
+    with app.app_context():
+        reset_database(db)
+        assert Post.query.count() == 0
+    # Ids start again at 1
+    assert make_user('after_reset') == 1
+
+
+def test_online_migration_helpers(client, monkeypatch):
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    from sqlalchemy.exc import OperationalError
+
+    with app.app_context(), db.engine.connect() as conn:
+        conn.execute(db.text("CREATE TABLE scratch (id INTEGER PRIMARY KEY, title TEXT)"))
+        conn.execute(db.text("INSERT INTO scratch (title) VALUES ('one'), ('three')"))
+        with Operations.context(MigrationContext.configure(conn)):
+            # Adding twice is a no-op, so an interrupted revision can be rerun
+            for _ in range(2):
+                online_migrations.add_column('scratch', db.Column('title_length', db.Integer(), nullable=False),
+                                             backfill='length(title)')
+                online_migrations.create_index_concurrently('ix_scratch_title', 'scratch', ['title'])
+            assert conn.execute(db.text("SELECT title_length FROM scratch ORDER BY id")).scalars().all() == [3, 5]
+            assert 'ix_scratch_title' in {ix['name'] for ix in db.inspect(conn).get_indexes('scratch')}
+            online_migrations.drop_index_concurrently('ix_scratch_title', 'scratch')
+            online_migrations.drop_index_concurrently('ix_scratch_title', 'scratch')
+
+            class LockNotAvailable(Exception):
+                pgcode = online_migrations.LOCK_NOT_AVAILABLE
+
+            attempts = []
+
+            def contended():
+                attempts.append(True)
+                if len(attempts) < 3:
+                    raise OperationalError('ALTER TABLE scratch ...', {}, LockNotAvailable())
+                return 'done'
+
+            monkeypatch.setattr(online_migrations.time, 'sleep', lambda seconds: None)
+            assert online_migrations.with_lock_retry(contended) == 'done'
+            assert len(attempts) == 3
+            attempts.clear()
+            with pytest.raises(OperationalError):
+                online_migrations.with_lock_retry(contended, retries=0)
+            assert len(attempts) == 1
+
+            def broken():
+                attempts.append(True)
+                conn.execute(db.text("SELECT missing FROM scratch"))
+
+            # Other errors are not retried
+            attempts.clear()
+            with pytest.raises(OperationalError):
+                online_migrations.with_lock_retry(broken)
+            assert len(attempts) == 1
+        conn.rollback()
+        conn.execute(db.text("DROP TABLE scratch"))
+        conn.commit()
+
+
+def test_batch_backfill_resumes(client):
+    make_posts(make_user('backfilled'), 10)
+    with app.app_context():
+        db.session.execute(db.text("UPDATE posts SET excerpt = NULL WHERE id <> 4"))
+        db.session.commit()
+        engine = db.engine
+    job = Backfill('test_excerpts', 'posts', "excerpt = substr(content, 1, 201)", where="excerpt IS NULL", batch_size=3)
+    job.reset(engine)
+    batches = []
+
+    def crash_on_third_batch(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE posts'):
+            batches.append(parameters)
+            if len(batches) == 3:
+                raise RuntimeError("worker died")
+
+    event.listen(engine, 'before_cursor_execute', crash_on_third_batch)
+    try:
+        with pytest.raises(RuntimeError):
+            job.run(engine, rows_per_second=10000)
+    finally:
+        event.remove(engine, 'before_cursor_execute', crash_on_third_batch)
+    # The failed batch rolled back with its checkpoint
+    progress = status(engine)['test_excerpts']
+    assert (progress['keys'], progress['keys_done'], progress['rows_updated']) == (10, 6, 5)
+    assert not progress['finished']
+
+    with count_statements(all_threads=True) as statements:
+        assert job.run(engine) is True
+    assert len([statement for statement in statements if statement.startswith('UPDATE posts')]) == 2
+    with app.app_context():
+        assert Post.query.filter(Post.excerpt.is_(None)).count() == 0
+    assert status(engine)['test_excerpts']['rows_updated'] == 9
+    assert job.run(engine) is True
+    job.reset(engine)
+
+    # Reporting is read-only: no progress table, no backfills, nothing created
+    with engine.begin() as conn:
+        conn.execute(db.text("DROP TABLE backfill_progress"))
+    assert status(engine) == {}
+    assert not db.inspect(engine).has_table('backfill_progress')
+
+
+def test_timeline_pulls_prolific_authors(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'TIMELINE_FANOUT_MAX_FOLLOWERS', 2)
+    celebrity = make_user('celebrity')
+    for name in ('fan1', 'fan2'):
+        make_user(name)
+        login(client, name)
+        client.post(f'/api/users/{celebrity}/follow')
+    client.post('/api/posts', json={'title': 'fan post', 'content': 'x'})
+
+    login(client, 'celebrity')
+    client.post('/api/posts', json={'title': 'announcement', 'content': 'x'})
+    fanout.join()
+
+    with app.app_context():
+        # Only the author's own timeline row was written
+        assert TimelineEntry.query.filter_by(post_id=2).count() == 1
+
+    login(client, 'fan1')
+    with count_statements() as statements:
+        titles, _ = timeline_titles(client)
+    assert len(statements) == 1
+    assert titles == ['announcement']
+    login(client, 'fan2')
+    assert timeline_titles(client)[0] == ['announcement', 'fan post']
+
+    # Back under the threshold: new posts fan out, the pulled one stays visible
+    client.delete(f'/api/users/{celebrity}/follow')
+    login(client, 'celebrity')
+    client.post('/api/posts', json={'title': 'comeback', 'content': 'x'})
+    fanout.join()
+    login(client, 'fan1')
+    assert timeline_titles(client)[0] == ['comeback', 'announcement']
+    with app.app_context():
+        assert [post.fanned_out for post in Post.query.order_by(Post.id)] == [True, False, True]
+
+
+def test_recent_posts_cache(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'RECENT_POSTS_CACHE_SIZE', 6)
+    author = make_user('cacher')
+    now = datetime.utcnow()
+    with app.app_context():
+        # Post 1 is the newest
+        for i in range(8):
+            db.session.add(Post(title=f'Post {i}', content='x', user_id=author, created_at=now - timedelta(minutes=i)))
+        db.session.commit()
+    login(client, 'cacher')
+    first_page = client.get('/api/posts?per_page=5').get_json()
+
+    with count_statements() as statements:
+        assert client.get('/api/posts?per_page=5').get_json() == first_page
+        summary = client.get('/api/posts?per_page=3&page=2&view=summary').get_json()
+    assert statements == []
+    assert [post['id'] for post in summary['posts']] == [4, 5, 6]
+    assert summary['pagination']['total'] == 8 and 'content' not in summary['posts'][0]
+
+    # Cached pages report the count mode asked for, or the endpoint's default
+    with count_statements() as statements:
+        uncounted = client.get('/api/posts?per_page=5&count=none').get_json()['pagination']
+        estimated = client.get('/api/posts?per_page=5&count=estimate').get_json()['pagination']
+        monkeypatch.setitem(app.config['PAGINATION_COUNT'], 'get_posts', 'none')
+        default = client.get('/api/posts?per_page=5').get_json()['pagination']
+        monkeypatch.setitem(app.config['PAGINATION_COUNT'], 'get_posts', 'exact')
+    assert statements == []
+    assert (uncounted['total'], uncounted['pages'], uncounted['has_next'], uncounted['count']) == (None, None, True, 'none')
+    assert (estimated['total'], estimated['count']) == (8, 'estimate')
+    assert default['count'] == 'none'
+
+    # Writes go through to the cache
+    created = client.post('/api/posts', json={'title': 'newest', 'content': 'fresh'}).get_json()['post']
+    client.put('/api/posts/2', json={'title': 'edited', 'content': 'changed'})
+    client.delete('/api/posts/3')
+    client.get('/api/posts/4')
+    fanout.join()
+    with count_statements() as statements:
+        posts = client.get('/api/posts?per_page=5').get_json()
+    assert statements == []
+    assert [post['id'] for post in posts['posts']] == [created['id'], 1, 2, 4, 5]
+    assert posts['posts'][2]['title'] == 'edited'
+    assert posts['posts'][3]['view_count'] == 1
+    assert posts['pagination']['total'] == 8
+
+    # Past the cached depth the database answers, in the same order
+    with count_statements() as statements:
+        deep = client.get('/api/posts?per_page=5&page=2').get_json()
+    assert statements
+    assert [post['id'] for post in deep['posts']] == [6, 7, 8]
+
+    # A post created while a reload runs is counted by the reload, not again by its replay
+    entry_for = recent_posts.entry_for
+    during_reload = []
+
+    def create_during_reload(post):
+        if not during_reload:
+            # Created like POST /api/posts, committing between the reload's two queries
+            with app.app_context():
+                racing = Post(title='racing', content='x', user_id=author)
+                db.session.add(racing)
+                db.session.flush()
+                entry = entry_for(racing)
+                db.session.commit()
+                recent_posts.add(entry)
+                during_reload.append(entry['id'])
+        return entry_for(post)
+
+    monkeypatch.setattr(recent_posts, 'entry_for', create_during_reload)
+    with app.app_context():
+        recent_posts.reload()
+        assert len(during_reload) == 1
+        assert recent_posts.total == Post.query.count() == 9
+        assert recent_posts.entries[0]['id'] == during_reload[0]
+
+
+def bus_worker(ready, received):
+    """A forked worker that reports every invalidation it hears about"""
+    invalidation_bus.handlers = {
+        kind: [lambda object_id, op, kind=kind: received.put((os.getpid(), kind, object_id, op, time.time()))]
+        for kind in ('post', 'user')
+    }
+    invalidation_bus.start()
+    time.sleep(0.2)  # let the listener note the current end of the channel
+    ready.release()
+    time.sleep(10)
+
+
+def test_invalidation_bus_across_processes(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(invalidation_bus, 'channel', FileChannel(str(tmp_path / 'bus.log')))
+    monkeypatch.setattr(invalidation_bus, 'listener_pid', None)
+    context = multiprocessing.get_context('fork')
+    ready, received = context.Semaphore(0), context.Queue()
+    workers = [context.Process(target=bus_worker, args=(ready, received), daemon=True) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    try:
+        for _ in workers:
+            assert ready.acquire(timeout=5)
+
+        user_id = make_user('publisher')
+        login(client, 'publisher')
+        sent = time.time()
+        post = client.post('/api/posts', json={'title': 'hello', 'content': 'world'}).get_json()['post']
+        client.put('/api/profile', json={'email': 'publisher-new@example.com'})
+        # Rejected before anything was written: nothing to publish
+        client.put('/api/profile', json={'email': 'not-an-email'})
+
+        events = [received.get(timeout=5) for _ in range(4)]
+        assert sorted(event[1:4] for event in events) == sorted(
+            [('post', post['id'], 'create'), ('user', user_id, 'update')] * 2
+        )
+        assert {event[0] for event in events} == {worker.pid for worker in workers}
+        assert max(event[4] for event in events) - sent < 2
+        time.sleep(0.2)
+        assert received.empty()
+    finally:
+        for worker in workers:
+            worker.terminate()
+
+
+def test_remote_invalidation_evicts_caches(client):
+    make_posts(make_user('remote'), 3)
+    login(client, 'remote')
+    client.get('/api/posts')
+    client.get('/api/profile')
+    assert 1 in user_cache
+
+    def remote(kind, object_id, op):
+        invalidation_bus.deliver(json.dumps({'kind': kind, 'id': object_id, 'op': op, 'origin': 'elsewhere'}))
+
+    remote('user', 1, 'update')
+    assert 1 not in user_cache
+
+    with app.app_context():
+        db.session.delete(db.session.get(Post, 3))
+        db.session.commit()
+    remote('post', 3, 'delete')
+    with count_statements() as statements:
+        posts = client.get('/api/posts').get_json()
+    assert statements == []
+    assert [post['id'] for post in posts['posts']] == [2, 1] and posts['pagination']['total'] == 2
+
+    # Posts created or edited elsewhere are fetched by id, the table is not recounted
+    with app.app_context():
+        created = Post(title='From elsewhere', content='x', user_id=1)
+        db.session.add(created)
+        db.session.get(Post, 1).title = 'Edited elsewhere'
+        db.session.commit()
+        created_id = created.id
+    with count_statements() as statements:
+        remote('post', created_id, 'create')
+        remote('post', 1, 'update')
+    assert len(statements) == 2 and not any('count(' in statement for statement in statements)
+    with count_statements() as statements:
+        posts = client.get('/api/posts').get_json()
+    assert statements == []
+    assert [post['title'] for post in posts['posts']] == ['From elsewhere', 'Post 1', 'Edited elsewhere']
+    assert posts['pagination']['total'] == 3
+
+
+@pytest.mark.skipif(not os.environ.get('TEST_POSTGRES_URL'), reason="set TEST_POSTGRES_URL to a scratch database")
+def test_postgres_invalidation_channel():
+    from sqlalchemy import create_engine
+    from sqlalchemy.engine import make_url
+
+    url = os.environ['TEST_POSTGRES_URL']
+    channel = PostgresChannel(make_url(url))
+    received = []
+    threading.Thread(target=channel.listen, args=(received.append,), daemon=True).start()
+    deadline = time.time() + 5
+    while None not in received and time.time() < deadline:
+        time.sleep(0.01)
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        conn.execute(db.text("SELECT pg_notify(:channel, 'rolled back')"), {'channel': channel.CHANNEL})
+        conn.rollback()
+        conn.execute(db.text("SELECT pg_notify(:channel, 'committed')"), {'channel': channel.CHANNEL})
+        conn.commit()
+    while 'committed' not in received and time.time() < deadline:
+        time.sleep(0.01)
+    assert received == [None, 'committed']
+
+
+def test_concurrent_post_reads_share_one_load(client, monkeypatch):
+    make_posts(make_user('linked'), 1)
+    load_post = PostCache.load_post
+    calls = []
+
+    def slow_load(post_id):
+        calls.append(post_id)
+        time.sleep(0.3)
+        return load_post(post_id)
+
+    monkeypatch.setattr(PostCache, 'load_post', staticmethod(slow_load))
+    responses = []
+
+    def read(url):
+        responses.append(app.test_client().get(url).status_code)
+
+    threads = [threading.Thread(target=read, args=(url,))
+               for url in ['/api/posts/1', '/web/posts/1'] * 10]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert responses == [200] * 20
+    assert calls == [1]
+    stats = client.get('/api/health').get_json()['post_cache']
+    assert stats['loads'] == 1 and stats['coalesced'] == 19
+
+
+def test_post_cache_serves_stale_while_revalidating(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'POST_CACHE_TTL_SECONDS', 0)
+    make_posts(make_user('stale'), 1)
+    assert client.get('/api/posts/1').get_json()['post']['title'] == 'Post 0'
+
+    with app.app_context():
+        db.session.get(Post, 1).title = 'Edited elsewhere'
+        db.session.commit()
+    # Served from the stale entry while one refresh runs in the background
+    assert client.get('/api/posts/1').get_json()['post']['title'] == 'Post 0'
+    deadline = time.time() + 5
+    while post_cache.stats()['loads'] < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert client.get('/api/posts/1').get_json()['post']['title'] == 'Edited elsewhere'
+
+    # Local writes invalidate immediately
+    monkeypatch.setitem(app.config, 'POST_CACHE_TTL_SECONDS', 60)
+    login(client, 'stale')
+    client.put('/api/posts/1', json={'title': 'Edited here', 'content': 'x'})
+    assert client.get('/api/posts/1').get_json()['post']['title'] == 'Edited here'
+    assert client.get('/api/posts/2').status_code == 404
+    assert b'Edited here' in client.get('/web/posts/1').data
+
+
+def test_stale_refresh_survives_invalidation(monkeypatch):
+    monkeypatch.setitem(app.config, 'POST_CACHE_TTL_SECONDS', 0)
+    cache = SingleFlightCache('POST_CACHE_TTL_SECONDS', 'POST_CACHE_STALE_SECONDS', 'POST_CACHE_MAX_ENTRIES')
+    assert cache.get('k', lambda: 'first') == 'first'
+    gate, refreshing = threading.Event(), threading.Event()
+
+    def slow_refresh():
+        refreshing.set()
+        gate.wait(5)
+        return 'stale refresh'
+
+    assert cache.get('k', slow_refresh) == 'first'
+    assert refreshing.wait(5)
+    # Invalidated mid-refresh, then a new leader loads the key
+    cache.invalidate('k')
+    leader = threading.Thread(target=cache.get, args=('k', lambda: gate.wait(5) and 'current'))
+    leader.start()
+    deadline = time.time() + 5
+    while 'k' not in cache.in_flight and time.time() < deadline:
+        time.sleep(0.01)
+    flight = cache.in_flight['k']
+    gate.set()
+    leader.join(5)
+    assert flight.value == 'current' and flight.error is None
+    deadline = time.time() + 5
+    while cache.stats()['loads'] < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    # The older refresh neither finished the new flight nor overwrote its value
+    assert cache.entries['k'][0] == 'current'
+
+
+def test_pagination_count_modes(client, monkeypatch):
+    for i in range(5):
+        make_posts(make_user(f'counted{i}'), 1 if i else 7)
+
+    with count_statements() as statements:
+        users = client.get('/api/users?per_page=2&count=none').get_json()
+    # has_next comes from one extra row, nothing is counted
+    assert len(statements) == 1
+    assert users['pagination'] == {'page': 1, 'per_page': 2, 'total': None, 'pages': None,
+                                   'has_next': True, 'has_prev': False, 'count': 'none'}
+    assert len(users['users']) == 2
+    assert client.get('/api/users?per_page=2&page=3&count=none').get_json()['pagination']['has_next'] is False
+
+    # The last page knows its total without a COUNT
+    with count_statements() as statements:
+        last = client.get('/api/users?per_page=2&page=3&count=estimate').get_json()['pagination']
+    assert len(statements) == 1
+    assert (last['total'], last['pages'], last['count']) == (5, 3, 'estimate')
+    # SQLite keeps no planner statistics, so other pages count exactly
+    first = client.get('/api/users?per_page=2&count=estimate').get_json()['pagination']
+    assert (first['total'], first['count']) == (5, 'exact')
+
+    monkeypatch.setitem(app.config['PAGINATION_COUNT'], 'get_users', 'none')
+    assert client.get('/api/users').get_json()['pagination']['count'] == 'none'
+    assert client.get('/api/users?count=exact').get_json()['pagination']['total'] == 5
+    assert client.get('/api/users?count=roughly').status_code == 400
+
+    posts = client.get('/api/users/1/posts?per_page=5&count=none').get_json()
+    assert posts['user']['username'] == 'counted0'
+    assert [post['id'] for post in posts['posts']] == [7, 6, 5, 4, 3]
+    assert posts['pagination']['has_next'] is True
+    assert client.get('/api/users/1/posts?per_page=5').get_json()['pagination']['total'] == 7
+    assert client.get('/api/users/99/posts').status_code == 404
+
+    search = client.get('/api/posts/search?q=Post&per_page=20').get_json()['pagination']
+    assert (search['total'], search['count']) == (11, 'estimate')
+
+    # Out-of-range page and per_page are clamped, and the clamped values reported
+    for url in ('/api/users?count=exact&', '/api/posts?', '/api/users/1/posts?', '/api/posts/search?q=Post&count=exact&'):
+        pagination = client.get(url + 'per_page=0').get_json()['pagination']
+        assert (pagination['page'], pagination['per_page']) == (1, 1)
+        assert pagination['pages'] == pagination['total']
+        pagination = client.get(url + 'page=-1&per_page=-5').get_json()['pagination']
+        assert (pagination['page'], pagination['per_page'], pagination['has_prev']) == (1, 1, False)
+
+
+def test_explain_binds_parameters_per_driver():
+    from sqlalchemy import or_, select
+    from sqlalchemy.dialects.postgresql import asyncpg, psycopg2
+
+    statement = select(Post).where(or_(Post.title.ilike('%lorem%'), Post.content.ilike('%ipsum%')),
+                                   Post.id.in_([1, 2])).order_by(Post.created_at.desc())
+    sql, params = explain_statement(statement, asyncpg.dialect())
+    # asyncpg takes $n values positionally, in the order they appear
+    assert sql.startswith('EXPLAIN (FORMAT JSON) SELECT') and '$4' in sql and 'ORDER BY' not in sql
+    assert params == ('%lorem%', '%ipsum%', 1, 2)
+    sql, params = explain_statement(statement, psycopg2.dialect())
+    assert '%(title_1)s' in sql and params['title_1'] == '%lorem%' and params['id_1_2'] == 2
+
+
+def test_multi_get(client):
+    author = make_user('multi')
+    make_user('other')
+    make_posts(author, 5)
+    client.get('/api/posts/4')
+
+    with count_statements() as statements:
+        response = client.get('/api/posts?ids=3,99,1,4,3')
+    # Post 4 was cached by the single read, 1 and 3 come from one IN query
+    assert len(statements) == 1
+    posts = response.get_json()
+    assert [post['id'] for post in posts['posts']] == [3, 1, 4]
+    assert posts['missing'] == [99]
+    assert posts['posts'][2]['view_count'] == 1
+    assert posts['posts'][0] == client.get('/api/posts/3').get_json()['post'] | {'view_count': 0}
+
+    with count_statements() as statements:
+        summary = client.get('/api/posts?ids=1&ids=3&view=summary').get_json()['posts']
+    assert statements == []
+    assert 'content' not in summary[0] and summary[0]['excerpt'].endswith('...')
+
+    with count_statements() as statements:
+        users = client.get('/api/users?ids=2,1,7').get_json()
+    assert len(statements) == 1
+    assert [user['username'] for user in users['users']] == ['other', 'multi']
+    assert users['missing'] == [7] and 'email' not in users['users'][0]
+    with count_statements() as statements:
+        assert client.get('/api/users?ids=1,2').get_json()['missing'] == []
+    assert statements == []
+
+    assert client.get('/api/posts?ids=1,x').status_code == 400
+    assert client.get('/api/users?ids=').status_code == 400
+    too_many = ','.join(str(i) for i in range(app.config['MULTI_GET_MAX_IDS'] + 1))
+    assert client.get(f'/api/posts?ids={too_many}').status_code == 400
+
+
+def test_sparse_fieldsets(client, monkeypatch):
+    make_posts(make_user('sparse'), 4)
+    monkeypatch.setitem(app.config, 'RECENT_POSTS_CACHE_SIZE', 1)
+    client.get('/api/posts')
+
+    with count_statements() as statements:
+        deep = client.get('/api/posts?page=2&per_page=2&fields=id,title,author').get_json()
+    assert deep['posts'] == [{'id': 2, 'title': 'Post 1', 'author': 'sparse'},
+                             {'id': 1, 'title': 'Post 0', 'author': 'sparse'}]
+    # Neither the row fetch nor the joined author selects unrequested columns
+    rows = [statement for statement in statements if 'LIMIT' in statement]
+    assert rows and not loads_content(rows)
+    assert 'users.email' not in rows[-1] and 'posts.updated_at' not in rows[-1]
+
+    # Cached paths trim the same way
+    first = client.get('/api/posts?per_page=1&fields=id,excerpt').get_json()['posts']
+    assert set(first[0]) == {'id', 'excerpt'} and first[0]['excerpt'].endswith('...')
+    post = client.get('/api/posts/2?fields=title,view_count').get_json()['post']
+    assert post == {'title': 'Post 1', 'view_count': 1}
+    assert client.get('/api/posts?ids=2,3&fields=id').get_json()['posts'] == [{'id': 2}, {'id': 3}]
+
+    users = client.get('/api/users?fields=username').get_json()['users']
+    assert users == [{'username': 'sparse'}]
+    login(client, 'sparse')
+    assert client.get('/api/profile?fields=email').get_json()['user'] == {'email': 'sparse@example.com'}
+
+    assert client.get('/api/posts?fields=id,password_hash').status_code == 400
+    assert client.get('/api/users?fields=email').status_code == 400
+
+
+def test_response_compression(client, monkeypatch):
+    make_posts(make_user('squeezed'), 20)
+    plain = client.get('/api/posts?per_page=20')
+    assert 'Content-Encoding' not in plain.headers
+
+    response = client.get('/api/posts?per_page=20', headers={'Accept-Encoding': 'deflate;q=0.5, gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert int(response.headers['Content-Length']) < len(plain.data) / 5
+    assert gzip.decompress(response.data) == plain.data
+
+    deflated = client.get('/web/posts', headers={'Accept-Encoding': 'deflate'})
+    assert deflated.headers['Content-Encoding'] == 'deflate'
+    assert zlib.decompress(deflated.data) == client.get('/web/posts').data
+
+    # Small bodies and refused encodings go out as-is
+    assert 'Content-Encoding' not in client.get('/api/users?fields=id', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in client.get('/api/posts', headers={'Accept-Encoding': 'gzip;q=0, br'}).headers
+
+    # Past the stream threshold the body is compressed chunk by chunk, unsized
+    monkeypatch.setitem(app.config, 'COMPRESSION_STREAM_BYTES', 1024)
+    streamed = client.get('/api/posts?per_page=20', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Length' not in streamed.headers
+    assert gzip.decompress(streamed.data) == plain.data
+
+
+def test_bloom_filter_sizing():
+    bloom = BloomFilter(capacity=10000, fp_rate=0.01, max_bytes=1024 * 1024)
+    for i in range(10000):
+        bloom.add(f'user{i}')
+    assert all(f'user{i}' in bloom for i in range(10000))
+    false_positives = sum(f'other{i}' in bloom for i in range(10000))
+    assert false_positives < 300
+    assert bloom.stats()['bytes'] < 13000
+
+    capped = BloomFilter(capacity=10000, fp_rate=0.0001, max_bytes=1024)
+    assert len(capped.bits) == 1024
+
+
+def test_username_available(client, monkeypatch):
+    make_user('taken')
+
+    with count_statements() as statements:
+        response = client.get('/api/users/available?username=brandnew')
+    assert response.get_json() == {'username': 'brandnew', 'available': True, 'checked': 'filter'}
+    # count + usernames to build the filter, nothing per check afterwards
+    assert len(statements) == 2
+
+    with count_statements() as statements:
+        response = client.get('/api/users/available?username=TAKEN')
+    assert response.get_json()['available'] is False
+    assert response.get_json()['checked'] == 'database'
+    assert len(statements) == 1
+
+    client.post('/api/register', json={'username': 'fresh', 'email': 'fresh@example.com', 'password': 'password123'})
+    response = client.get('/api/users/available?username=fresh')
+    assert response.get_json()['available'] is False
+
+    # Another worker's user with a lower id than a later local registration
+    # is still pulled in by the next refresh
+    monkeypatch.setitem(app.config, 'USERNAME_BLOOM_REFRESH_SECONDS', 0)
+    monkeypatch.setitem(app.config, 'USERNAME_BLOOM_REFRESH_OVERLAP', 0)
+    with app.app_context():
+        db.session.add(User(id=100, username='spacer', email='spacer@example.com', password_hash='x'))
+        db.session.commit()
+    client.post('/api/register', json={'username': 'local', 'email': 'local@example.com', 'password': 'password123'})
+    with app.app_context():
+        db.session.add(User(id=50, username='elsewhere', email='elsewhere@example.com', password_hash='x'))
+        db.session.commit()
+    response = client.get('/api/users/available?username=elsewhere')
+    assert response.get_json()['available'] is False
+
+    assert client.get('/api/users/available?username=ab').status_code == 400
+
+
+def test_session_key_rotation(client, monkeypatch):
+    make_user('rotating')
+    monkeypatch.setitem(app.config, 'SECRET_KEY', 'old-key')
+    monkeypatch.setitem(app.config, 'SECRET_KEY_FALLBACKS', [])
+    login(client, 'rotating')
+
+    # Cookies signed with the previous key keep working while it is a fallback
+    monkeypatch.setitem(app.config, 'SECRET_KEY', 'new-key')
+    monkeypatch.setitem(app.config, 'SECRET_KEY_FALLBACKS', ['old-key'])
+    assert client.get('/api/profile').status_code == 200
+
+    # New sessions are signed with the newest key only
+    login(client, 'rotating')
+    monkeypatch.setitem(app.config, 'SECRET_KEY_FALLBACKS', [])
+    assert client.get('/api/profile').status_code == 200
+
+    monkeypatch.setitem(app.config, 'SECRET_KEY', 'unrelated-key')
+    assert client.get('/api/profile').status_code == 401
+
+
+def test_asgi_routes_match_flask(client):
+    pytest.importorskip('aiosqlite')
+    pytest.importorskip('httpx')
+    from starlette.testclient import TestClient
+    import asgi
+
+    for i in range(3):
+        make_posts(make_user(f'async{i}'), 4)
+
+    with TestClient(asgi.app) as async_client:
+        for url in ('/api/posts?per_page=5&page=2', '/api/posts?view=summary',
+                    '/api/posts/search?q=Content%201', '/api/users?per_page=2',
+                    '/api/users?per_page=2&page=2&count=none', '/api/posts?count=none', '/api/posts?ids=2,99,1',
+                    '/api/users?ids=3,1', '/api/posts?per_page=3&fields=id,author,excerpt',
+                    '/api/posts/search?q=Post&fields=title', '/api/users?fields=id,follower_count'):
+            response = async_client.get(url)
+            assert response.status_code == 200, url
+            assert response.json() == client.get(url).get_json(), url
+
+        # Both servers count the view
+        async_post = async_client.get('/api/posts/3').json()['post']
+        flask_post = client.get('/api/posts/3').get_json()['post']
+        assert flask_post['view_count'] == async_post['view_count'] + 1
+        assert {**async_post, 'view_count': 0} == {**flask_post, 'view_count': 0}
+
+        # Warm entries in the shared caches keep both engines idle
+        async_statements = []
+
+        def record(conn, cursor, statement, *args):
+            async_statements.append(statement)
+
+        event.listen(asgi.engine.sync_engine, 'before_cursor_execute', record)
+        try:
+            with count_statements() as statements:
+                assert async_client.get('/api/posts').json() == client.get('/api/posts').get_json()
+                assert async_client.get('/api/posts/3').json()['post']['title'] == async_post['title']
+        finally:
+            event.remove(asgi.engine.sync_engine, 'before_cursor_execute', record)
+        assert statements == [] and async_statements == []
+
+        assert async_client.get('/api/posts/999').status_code == 404
+        # Routes without an async handler fall through to Flask
+        assert async_client.get('/api/users/available?username=async0').json()['available'] is False